@@ -0,0 +1,420 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+# Add standard import path for shared modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from scripts.features.char_ngrams import CharNgramCounter
+from scripts.features.ngrams import build_analyzer, count_vocab
+from scripts.features.stylometry_core import StylometryFeaturizer
+
+# Fast cold-start artifact format / compiled scoring table
+# --------------------------------------------------------
+# `model.joblib` unpickles two TfidfVectorizer vocabularies, the idf arrays, the fitted
+# scalers and the regressor, and needs all of sklearn imported to do so. The fast
+# format stores the fitted numbers as plain .npy files (memory-mapped on load) plus one
+# UTF-8 blob per vocabulary, described by a JSON manifest:
+#
+#   fast/manifest.json
+#   fast/<branch>.vocab.txt          terms in column order, concatenated
+#   fast/<branch>.vocab_offsets.npy  int64 end offset of each term (in characters)
+#   fast/<branch>.idf.npy            idf (only needed for the row norm)
+#   fast/<branch>.weights.npy        transformer_weight * coef * idf per column
+#   fast/stylometry.{scaler_mean,scaler_scale,lambdas}.npy
+#   fast/stylometry.weights.npy      transformer_weight * coef / power_scale
+#   fast/intercept.npy               regressor intercept + folded power_mean offsets
+#
+# Since the model is linear after the features, the regressor coefficients and the
+# FeatureUnion weights are folded into per-column weights at export time, so a TF-IDF
+# branch scores as  sum_j tf'_j * weights_j / ||tf' * idf||  straight from the n-gram
+# counts (tf' = 1 + log(tf) with sublinear_tf), and the stylometry branch as a 10-term
+# dot product after Yeo-Johnson. FastPipeline evaluates this with numpy only.
+#
+# Format 3 is a compacted export (scripts/training/compact.py): pruned vocabularies,
+# optionally quantized idf / weights (the branch spec's `encoding` gives dtype, scale
+# and offset of each array) and, for char branches, the packed sorted n-gram keys of
+# CharNgramCounter, so neither the vocabulary dict nor the keys are built on load.
+
+FAST_FORMAT_VERSION = 2
+COMPACT_FORMAT_VERSION = 3
+SUPPORTED_FORMAT_VERSIONS = (FAST_FORMAT_VERSION, COMPACT_FORMAT_VERSION)
+FAST_DIR = 'fast'
+# Maximum |fast - pipeline.predict| accepted by export_fast_artifacts(check_texts=...)
+AGREEMENT_TOL = 1e-9
+
+
+def _json_safe(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+# --- VOCABULARY BLOBS ---
+def save_vocabulary(vocabulary, path_prefix):
+    """Writes a term -> column dict as a concatenated blob plus end offsets."""
+    terms = [None] * len(vocabulary)
+    for term, idx in vocabulary.items():
+        terms[idx] = term
+    offsets = np.cumsum([len(t) for t in terms], dtype=np.int64)
+    with open(path_prefix + '.vocab.txt', 'w', encoding='utf-8', errors='surrogatepass', newline='') as f:
+        f.write(''.join(terms))
+    np.save(path_prefix + '.vocab_offsets.npy', offsets)
+
+
+def load_terms(path_prefix):
+    with open(path_prefix + '.vocab.txt', 'r', encoding='utf-8', errors='surrogatepass', newline='') as f:
+        blob = f.read()
+    ends = np.load(path_prefix + '.vocab_offsets.npy').tolist()
+    starts = [0] + ends[:-1]
+    return [blob[a:b] for a, b in zip(starts, ends)]
+
+
+def load_vocabulary(path_prefix):
+    terms = load_terms(path_prefix)
+    return dict(zip(terms, range(len(terms))))
+
+
+# --- COLUMN ARRAYS ---
+def encode_array(values, dtype):
+    """(stored array, encoding spec or None) of a float64 column array."""
+    values = np.asarray(values, dtype=np.float64)
+    if dtype == 'float64':
+        return values, None
+    if dtype == 'float16':
+        return values.astype(np.float16), {'dtype': 'float16'}
+    if dtype == 'int8':
+        # Affine over the array's range: value = offset + scale * q, q in [-127, 127]
+        lo, hi = (float(values.min()), float(values.max())) if len(values) else (0.0, 0.0)
+        offset = (lo + hi) / 2.0
+        scale = (hi - lo) / 254.0 or 1.0
+        q = np.clip(np.rint((values - offset) / scale), -127, 127).astype(np.int8)
+        return q, {'dtype': 'int8', 'scale': scale, 'offset': offset}
+    raise ValueError(f"Unsupported column dtype: {dtype}")
+
+
+def load_array(path, encoding=None):
+    """A stored column array as float64 (memory-mapped when stored unencoded)."""
+    if encoding is None:
+        return np.load(path, mmap_mode='r')
+    values = np.load(path).astype(np.float64)
+    if encoding['dtype'] == 'int8':
+        values = values * encoding['scale'] + encoding['offset']
+    return values
+
+
+# --- EXPORT ---
+def _export_tfidf(name, vec, weight, coef, out_dir):
+    params = vec.get_params()
+    unsupported = {
+        'input': 'content', 'preprocessor': None, 'tokenizer': None, 'strip_accents': None,
+        'binary': False, 'use_idf': True, 'norm': 'l2'
+    }
+    for key, expected in unsupported.items():
+        if params.get(key) != expected:
+            raise ValueError(f"{name}: {key}={params.get(key)!r} is not supported by the fast format")
+    if params['analyzer'] not in ('word', 'char'):
+        raise ValueError(f"{name}: analyzer={params['analyzer']!r} is not supported by the fast format")
+
+    idf = np.asarray(vec.idf_, dtype=np.float64)
+    save_vocabulary(vec.vocabulary_, os.path.join(out_dir, name))
+    np.save(os.path.join(out_dir, f"{name}.idf.npy"), idf)
+    np.save(os.path.join(out_dir, f"{name}.weights.npy"), weight * coef * idf)
+    stop_words = vec.get_stop_words()
+    return {
+        'name': name,
+        'kind': 'tfidf',
+        'n_features': len(vec.vocabulary_),
+        'analyzer': params['analyzer'],
+        'ngram_range': list(params['ngram_range']),
+        'lowercase': bool(params['lowercase']),
+        'token_pattern': params['token_pattern'],
+        'stop_words': sorted(stop_words) if stop_words else None,
+        'sublinear_tf': bool(params['sublinear_tf'])
+    }, 0.0
+
+
+def _export_stylometry(name, branch, weight, coef, out_dir):
+    steps = dict(branch.steps)
+    scaler = steps.get('scaler')
+    normalizer = steps.get('normalizer')
+    if set(steps) != {'extractor', 'scaler', 'normalizer'} or normalizer.method != 'yeo-johnson':
+        raise ValueError(f"{name}: expected extractor -> scaler -> yeo-johnson normalizer")
+
+    prefix = os.path.join(out_dir, 'stylometry')
+    n = len(normalizer.lambdas_)
+    np.save(prefix + '.scaler_mean.npy', np.asarray(scaler.mean_ if scaler.with_mean else np.zeros(n), dtype=np.float64))
+    np.save(prefix + '.scaler_scale.npy', np.asarray(scaler.scale_ if scaler.with_std else np.ones(n), dtype=np.float64))
+    np.save(prefix + '.lambdas.npy', np.asarray(normalizer.lambdas_, dtype=np.float64))
+
+    # weight * coef . (yj - power_mean) / power_scale
+    #   = (weight * coef / power_scale) . yj  -  weight * coef . power_mean / power_scale
+    weights = weight * coef
+    offset = 0.0
+    if normalizer.standardize:
+        weights = weights / np.asarray(normalizer._scaler.scale_, dtype=np.float64)
+        offset = -float(weights @ np.asarray(normalizer._scaler.mean_, dtype=np.float64))
+    np.save(prefix + '.weights.npy', weights)
+    return {
+        'name': name,
+        'kind': 'stylometry',
+        'n_features': n
+    }, offset
+
+
+def export_fast_artifacts(pipeline, output_dir, metadata, check_texts=None):
+    """
+    Writes `<output_dir>/fast/` from a fitted detector pipeline
+    (FeatureUnion of TF-IDF / stylometry branches -> linear regressor).
+    With `check_texts`, the compiled table is scored against `pipeline.predict` first
+    and the export is abandoned (no manifest) if they differ by more than AGREEMENT_TOL.
+    Raises ValueError for pipeline shapes the fast format cannot reproduce.
+    """
+    union = pipeline.named_steps['features']
+    regressor = pipeline.named_steps['regressor']
+    weights = union.transformer_weights or {}
+    coef = np.asarray(regressor.coef_, dtype=np.float64).ravel()
+
+    out_dir = os.path.join(output_dir, FAST_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    # An interrupted re-export must not leave an old manifest describing new arrays
+    if os.path.exists(os.path.join(out_dir, 'manifest.json')):
+        os.remove(os.path.join(out_dir, 'manifest.json'))
+
+    branches = []
+    intercept = float(np.asarray(regressor.intercept_, dtype=np.float64).ravel()[0])
+    start = 0
+    for name, trans in union.transformer_list:
+        weight = float(weights.get(name, 1.0))
+        if type(trans).__name__ == 'TfidfVectorizer':
+            export = _export_tfidf
+            n = len(trans.vocabulary_)
+        elif hasattr(trans, 'steps') and isinstance(trans.steps[0][1], StylometryFeaturizer):
+            export = _export_stylometry
+            n = len(trans.steps[-1][1].lambdas_)
+        else:
+            raise ValueError(f"{name}: {type(trans).__name__} is not supported by the fast format")
+        spec, offset = export(name, trans, weight, coef[start:start + n], out_dir)
+        branches.append(spec)
+        intercept += offset
+        start += n
+    if start != len(coef):
+        raise ValueError(f"Branches produce {start} features but the regressor has {len(coef)} coefficients")
+    np.save(os.path.join(out_dir, 'intercept.npy'), np.array([intercept], dtype=np.float64))
+
+    manifest = {
+        'format_version': FAST_FORMAT_VERSION,
+        'source': {k: _json_safe(metadata.get(k)) for k in ('model_version', 'stylometry_version', 'trained_at')},
+        'branches': branches
+    }
+    if check_texts is not None:
+        check_texts = list(check_texts)
+        diff = np.max(np.abs(FastPipeline(out_dir, manifest).predict(check_texts) - pipeline.predict(check_texts)),
+                      initial=0.0)
+        if diff > AGREEMENT_TOL:
+            raise ValueError(f"Fast scoring table disagrees with the pipeline by {diff:.3g} (> {AGREEMENT_TOL})")
+        manifest['max_abs_diff'] = float(diff)
+        manifest['checked_texts'] = len(check_texts)
+
+    # Manifest last: its presence marks a complete export
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return out_dir
+
+
+# --- LOAD ---
+def _yeo_johnson(x, lmbda):
+    # Same formula as scipy.stats.yeojohnson(x, lmbda) without importing scipy.stats
+    eps = np.finfo(np.float64).eps
+    out = np.zeros_like(x, dtype=np.float64)
+    pos = x >= 0
+    if abs(lmbda) < eps:
+        out[pos] = np.log1p(x[pos])
+    else:
+        out[pos] = np.expm1(lmbda * np.log1p(x[pos])) / lmbda
+    if abs(lmbda - 2) > eps:
+        out[~pos] = -np.expm1((2 - lmbda) * np.log1p(-x[~pos])) / (2 - lmbda)
+    else:
+        out[~pos] = -np.log1p(-x[~pos])
+    return out
+
+
+class _TfidfBranch:
+    def __init__(self, spec, fast_dir):
+        self.spec = spec
+        self.name = spec['name']
+        self.n_features = spec['n_features']
+        self.sublinear_tf = spec['sublinear_tf']
+        self.analyze = build_analyzer(
+            spec['analyzer'], spec['ngram_range'], spec['lowercase'],
+            spec['token_pattern'], spec['stop_words']
+        )
+        self._prefix = os.path.join(fast_dir, spec['name'])
+        self._vocabulary = None
+        # Vectorized char n-gram matching (None: word analyzer or too wide an alphabet)
+        self.char_counter = None
+        if spec.get('char_keys'):
+            self.char_counter = CharNgramCounter(
+                np.load(self._prefix + '.char_alphabet.npy'), np.load(self._prefix + '.char_keys.npy'),
+                np.load(self._prefix + '.char_columns.npy').astype(np.int64), spec['ngram_range'], spec['lowercase']
+            )
+        elif spec['analyzer'] == 'char':
+            self.char_counter = CharNgramCounter.build(self.vocabulary, spec['ngram_range'], spec['lowercase'])
+        encoding = spec.get('encoding', {})
+        self.idf = load_array(self._prefix + '.idf.npy', encoding.get('idf'))
+        self.weights = load_array(self._prefix + '.weights.npy', encoding.get('weights'))
+
+    @property
+    def vocabulary(self):
+        # Loaded on first use: compacted char branches score from their packed keys
+        if self._vocabulary is None:
+            self._vocabulary = load_vocabulary(self._prefix)
+        return self._vocabulary
+
+    def counts(self, text):
+        """{column: raw count} of the text's in-vocabulary n-grams."""
+        if self.char_counter is not None:
+            return self.char_counter.counts(text)
+        return count_vocab(self.analyze(text), self.vocabulary)
+
+    def count_arrays(self, text):
+        """(columns, raw counts) int64 arrays of the text's in-vocabulary n-grams."""
+        if self.char_counter is not None:
+            return self.char_counter.count_arrays(text)
+        counts = count_vocab(self.analyze(text), self.vocabulary)
+        return (np.fromiter(counts.keys(), dtype=np.int64, count=len(counts)),
+                np.fromiter(counts.values(), dtype=np.int64, count=len(counts)))
+
+    def decision(self, texts):
+        """Per-text branch contribution to the score, straight from the n-gram counts."""
+        parts = [self.count_arrays(text) for text in texts]
+        rows = np.repeat(np.arange(len(parts), dtype=np.int64), [len(cols) for cols, _ in parts])
+        cols = np.concatenate([cols for cols, _ in parts]) if parts else np.empty(0, dtype=np.int64)
+        tf = np.concatenate([counts for _, counts in parts]).astype(np.float64) if parts else np.empty(0)
+        # Ascending columns within each row (sklearn's sorted CSR indices), so the sums
+        # do not depend on the order n-grams were met in
+        order = np.lexsort((cols, rows))
+        return self._score(rows[order], cols[order], tf[order], len(texts))
+
+    def _score(self, rows, cols, tf, n):
+        if self.sublinear_tf:
+            np.log(tf, tf)
+            tf += 1.0
+        tfidf = tf * self.idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=tfidf * tfidf, minlength=n))
+        norms[norms == 0.0] = 1.0
+        return np.bincount(rows, weights=tf * self.weights[cols], minlength=n) / norms
+
+
+class _StylometryBranch:
+    def __init__(self, spec, fast_dir, extractor):
+        prefix = os.path.join(fast_dir, 'stylometry')
+        self.name = spec['name']
+        self.n_features = spec['n_features']
+        self.extractor = extractor
+        self.mean = np.load(prefix + '.scaler_mean.npy', mmap_mode='r')
+        self.scale = np.load(prefix + '.scaler_scale.npy', mmap_mode='r')
+        self.lambdas = np.load(prefix + '.lambdas.npy', mmap_mode='r')
+        self.weights = np.load(prefix + '.weights.npy', mmap_mode='r')
+
+    def decision(self, texts):
+        return self.decision_features(self.extractor.transform(texts))
+
+    def decision_features(self, X):
+        """Branch contribution from raw StylometryFeaturizer rows (n, 10)."""
+        X = (X - self.mean) / self.scale
+        for i, lmbda in enumerate(self.lambdas):
+            X[:, i] = _yeo_johnson(X[:, i], float(lmbda))
+        return X @ self.weights
+
+
+class FastPipeline:
+    """
+    Drop-in for the fitted sklearn Pipeline's `predict`, evaluated from the compiled
+    scoring table: score = intercept + sum of the branch contributions.
+    """
+    def __init__(self, fast_dir, manifest=None):
+        if manifest is None:
+            with open(os.path.join(fast_dir, 'manifest.json')) as f:
+                manifest = json.load(f)
+        self.manifest = manifest
+        if self.manifest.get('format_version') not in SUPPORTED_FORMAT_VERSIONS:
+            raise ValueError(f"Unsupported fast artifact format: {self.manifest.get('format_version')}")
+
+        self.extractor = StylometryFeaturizer()
+        self.branches = []
+        for spec in self.manifest['branches']:
+            if spec['kind'] == 'tfidf':
+                self.branches.append(_TfidfBranch(spec, fast_dir))
+            else:
+                self.branches.append(_StylometryBranch(spec, fast_dir, self.extractor))
+        self.intercept = float(np.load(os.path.join(fast_dir, 'intercept.npy'))[0])
+
+    @property
+    def source(self):
+        return self.manifest.get('source', {})
+
+    def predict(self, texts, timer=None):
+        """
+        timer: optional StageTimer; each branch is then recorded under its name
+        (features plus its share of the regressor dot product).
+        """
+        texts = list(texts)
+        scores = np.full(len(texts), self.intercept, dtype=np.float64)
+        size = sum(len(t) for t in texts) if timer is not None else None
+        for branch in self.branches:
+            if timer is None:
+                scores += branch.decision(texts)
+            else:
+                with timer.stage(branch.name, size):
+                    scores += branch.decision(texts)
+        return scores
+
+
+def load_fast_pipeline(artifacts_dir, metadata=None):
+    """
+    FastPipeline for `artifacts_dir`, or None when no (matching) export exists.
+    With `metadata`, an export written for a different training run is ignored.
+    """
+    fast_dir = os.path.join(artifacts_dir, FAST_DIR)
+    manifest_path = os.path.join(fast_dir, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') not in SUPPORTED_FORMAT_VERSIONS:
+        print(f"Ignoring fast artifacts in format {manifest.get('format_version')} (expected {FAST_FORMAT_VERSION});"
+              " re-export with `python3 scripts/api/artifact_store.py`", file=sys.stderr)
+        return None
+    fast = FastPipeline(fast_dir, manifest)
+    if metadata is not None:
+        for key, value in fast.source.items():
+            if _json_safe(metadata.get(key)) != value:
+                print(f"Ignoring stale fast artifacts ({key} mismatch); using model.joblib", file=sys.stderr)
+                return None
+    return fast
+
+
+# Export CLI for artifacts trained before the fast format (or this format version) existed
+if __name__ == "__main__":
+    import argparse
+    import glob
+    import joblib
+
+    parser = argparse.ArgumentParser(description='Export the fast scoring table from model.joblib')
+    parser.add_argument('artifacts_dir', nargs='?', default='scripts/artifacts')
+    parser.add_argument('--check-dir', default=os.path.join(os.path.dirname(__file__), '..', '..', 'data'),
+                        help='Paragraphs of the .txt files under this directory are scored by both paths')
+    args = parser.parse_args()
+
+    check_texts = []
+    for path in sorted(glob.glob(os.path.join(args.check_dir, '**', '*.txt'), recursive=True)):
+        with open(path, encoding='utf-8', errors='replace') as f:
+            check_texts.extend(p for p in f.read().split('\n\n') if p.strip())
+
+    pipeline = joblib.load(os.path.join(args.artifacts_dir, 'model.joblib'))
+    metadata = joblib.load(os.path.join(args.artifacts_dir, 'metadata.pkl'))
+    out_dir = export_fast_artifacts(pipeline, args.artifacts_dir, metadata, check_texts=check_texts or None)
+    print(f"Fast artifacts written to {out_dir}/ (checked against pipeline.predict on {len(check_texts)} texts)")
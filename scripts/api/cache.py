@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Runs of 2+ whitespace characters collapse to one space. This is exactly the
+# normalization the char TF-IDF analyzer applies, and the word analyzer, stylometry
+# and the word-count gate are all insensitive to it, so every text sharing a
+# normalized form gets the same result.
+_WHITESPACE_RUNS_RE = re.compile(r'\s\s+')
+
+
+def normalize_text(text):
+    return _WHITESPACE_RUNS_RE.sub(' ', text)
+
+
+def artifact_fingerprint(paths):
+    """Cheap identity of a set of artifact files (path, size, mtime); changes on retrain."""
+    h = hashlib.sha1()
+    for path in paths:
+        try:
+            st = os.stat(path)
+            h.update(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns};".encode('utf-8'))
+        except OSError:
+            h.update(f"{os.path.basename(path)}:missing;".encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+class ResultCache:
+    """
+    Content-addressed cache of detector results.
+
+    Keys hash the normalized text, the domain hint, the model version and the artifact
+    fingerprint, so retraining invalidates every entry automatically. Two tiers:
+    - memory: bounded LRU (max_entries)
+    - disk:   optional SQLite file (db_path), evicting least recently used rows once
+              the stored payloads exceed max_db_bytes
+    Values are stored as JSON strings, so callers always receive a fresh dict.
+    """
+    def __init__(self, max_entries=1024, db_path=None, max_db_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.max_db_bytes = max_db_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if db_path:
+            self._open_db()
+
+    def _open_db(self):
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " fingerprint TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_lru ON results (last_access)")
+        self._db.commit()
+        self._db_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def bind(self, fingerprint):
+        """Drops persisted entries written by other artifacts (e.g. before a retrain)."""
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute("DELETE FROM results WHERE fingerprint != ?", (fingerprint,))
+            self._db.commit()
+            self._db_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    @staticmethod
+    def make_key(text, domain, model_version, fingerprint):
+        h = hashlib.sha256()
+        h.update(f"{model_version}\x00{fingerprint}\x00{domain}\x00".encode('utf-8'))
+        h.update(normalize_text(text).encode('utf-8', 'surrogatepass'))
+        return h.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return json.loads(payload)
+
+            if self._db is not None:
+                row = self._db.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+                    self._db.commit()
+                    self._remember(key, row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return json.loads(row[0])
+
+            self.misses += 1
+            return None
+
+    def put(self, key, result, fingerprint=''):
+        payload = json.dumps(result)
+        with self._lock:
+            self._remember(key, payload)
+            if self._db is not None:
+                self._store(key, payload, fingerprint)
+
+    def _remember(self, key, payload):
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = payload
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _store(self, key, payload, fingerprint):
+        size = len(payload)
+        old = self._db.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+        self._db.execute(
+            "INSERT OR REPLACE INTO results (key, fingerprint, payload, size, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, fingerprint, payload, size, time.time())
+        )
+        self._db_bytes += size - (old[0] if old else 0)
+
+        # Size-based eviction down to 90% of the budget, least recently used first
+        if self._db_bytes > self.max_db_bytes:
+            target = int(self.max_db_bytes * 0.9)
+            for old_key, old_size in self._db.execute(
+                    "SELECT key, size FROM results ORDER BY last_access ASC").fetchall():
+                if self._db_bytes <= target:
+                    break
+                self._db.execute("DELETE FROM results WHERE key = ?", (old_key,))
+                self._db_bytes -= old_size
+                self.evictions += 1
+        self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+                self._db_bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'memory_entries': len(self._memory),
+            'max_entries': self.max_entries,
+            'db_bytes': self._db_bytes if self._db is not None else None,
+            'max_db_bytes': self.max_db_bytes if self._db is not None else None
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
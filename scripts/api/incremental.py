@@ -0,0 +1,264 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from scripts.features.ngrams import DEFAULT_TOKEN_PATTERN, char_ngrams, count_vocab, word_ngrams
+from scripts.features.stylometry_core import (
+    DEFAULT_FEATURES, FEATURE_NAMES, _ADVERB_RE, _NONSPACE_RE, _PASSIVE_RE, _SENTENCE_SPLIT_RE,
+    _WORD_RE, TextScan, chunk_stat, scan_rows
+)
+
+# Incremental re-scoring for the live editor
+# ------------------------------------------
+# A document is split into paragraphs, each ending with the blank-line whitespace run
+# that follows it, so the next paragraph starts on a non-space character. No token,
+# whitespace run or sentence separator then crosses a paragraph boundary, and every
+# feature of the document is an exact aggregate of per-paragraph contributions:
+#   - TF-IDF branches: the paragraph's in-vocabulary n-gram counts, plus the few
+#     n-grams spanning a boundary, rebuilt from the first / last max_n - 1 tokens
+#     (or normalized characters) of each paragraph
+#   - stylometry: the paragraph's words, its sentence pieces (a sentence left open at
+#     the end of a paragraph continues into the next one) and its punctuation counts
+#     (passive constructions can span a boundary and are checked there)
+# Contributions are cached by paragraph hash, so a new version of the document only
+# rescans the paragraphs that changed. Re-aggregation is numpy work over the cached
+# arrays; the 50-word chunk statistics follow the global word offsets and are
+# memoized per chunk instead. Scores are identical to FastPipeline.predict on the
+# whole text (both sum the TF-IDF terms in column order).
+
+_PARAGRAPH_BREAK_RE = re.compile(r'\s*\n\s*\n\s*')
+_LEAD_WORD_RE = re.compile(r'\w+')
+_TRAIL_WORD_RE = re.compile(r'\w+\Z')
+
+
+def split_paragraphs(text):
+    """Paragraphs of `text`, each with its trailing blank-line run: ''.join(...) == text."""
+    paragraphs = []
+    pos = 0
+    for m in _PARAGRAPH_BREAK_RE.finditer(text):
+        if m.end() > pos:
+            paragraphs.append(text[pos:m.end()])
+            pos = m.end()
+    if pos < len(text):
+        paragraphs.append(text[pos:])
+    return paragraphs
+
+
+def _boundary_grams(tail, head, ngram_range, join):
+    """N-grams that start in `tail` (end of the preceding text) and end in `head`."""
+    seq = tail + head
+    grams = []
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        for i in range(max(len(tail) - n + 1, 0), len(tail)):
+            if i + n <= len(seq):
+                grams.append(join(seq[i:i + n]))
+    return grams
+
+
+class _BranchPart:
+    """One paragraph's contribution to a TF-IDF branch."""
+    __slots__ = ('cols', 'counts', 'head', 'tail', 'length')
+
+    def __init__(self, items, cols, counts, context):
+        self.cols = cols
+        self.counts = counts
+        self.head = items[:context]
+        self.tail = items[max(len(items) - context, 0):] if context else items[:0]
+        self.length = len(items)
+
+
+class _Paragraph:
+    __slots__ = ('branches', 'words', 'pieces', 'n_em_dash', 'n_struct_punct', 'n_passive', 'n_adverbs',
+                 'lead_word', 'trail_passive')
+
+    def __init__(self, text, tfidf_branches):
+        self.branches = [self._branch_part(branch, text) for branch in tfidf_branches]
+        lower = text.lower()
+        self.words = []
+        self.pieces = [] # (n_words, length of the first token or None when blank) per sentence piece
+        for piece in _SENTENCE_SPLIT_RE.split(lower):
+            piece_words = _WORD_RE.findall(piece)
+            self.words += piece_words
+            first = _NONSPACE_RE.search(piece)
+            self.pieces.append((len(piece_words), len(first.group()) if first else None))
+        self.n_em_dash = lower.count('—') + lower.count('--')
+        self.n_struct_punct = lower.count(';') + lower.count(':')
+        self.n_passive = len(_PASSIVE_RE.findall(lower))
+        self.n_adverbs = len(_ADVERB_RE.findall(lower))
+        # "was\n\nfinished": the auxiliary ending this paragraph plus its whitespace, and
+        # the word starting it, for passives spanning a boundary
+        lead = _LEAD_WORD_RE.match(lower)
+        self.lead_word = lead.group() if lead else ''
+        stripped = lower.rstrip()
+        trail = _TRAIL_WORD_RE.search(stripped) if len(stripped) < len(lower) else None
+        self.trail_passive = trail.group() + lower[len(stripped):] if trail else ''
+
+    @staticmethod
+    def _branch_part(branch, text):
+        spec = branch.spec
+        source = text.lower() if spec['lowercase'] else text
+        ngram_range = tuple(spec['ngram_range'])
+        context = ngram_range[1] - 1
+        if spec['analyzer'] == 'char':
+            items = re.sub(r'\s\s+', ' ', source)
+            if branch.char_counter is not None:
+                return _BranchPart(items, *branch.char_counter.count_arrays(items, normalized=True), context)
+            grams = char_ngrams(items, ngram_range)
+        else:
+            stop_words = frozenset(spec['stop_words'] or ())
+            items = [t for t in re.findall(spec['token_pattern'] or DEFAULT_TOKEN_PATTERN, source)
+                     if t not in stop_words]
+            grams = word_ngrams(items, ngram_range)
+        counts = count_vocab(grams, branch.vocabulary)
+        return _BranchPart(items, np.fromiter(counts.keys(), dtype=np.int64, count=len(counts)),
+                           np.fromiter(counts.values(), dtype=np.int64, count=len(counts)), context)
+
+
+class IncrementalScorer:
+    """
+    Scores successive versions of documents against a FastPipeline, rescanning only
+    paragraphs it has not seen. Contributions are kept for the `max_paragraphs` most
+    recently used paragraphs (shared by all documents).
+    """
+    def __init__(self, fast_pipeline, max_paragraphs=4096, max_chunks=16384):
+        self.fast = fast_pipeline
+        self.tfidf_branches = [b for b in fast_pipeline.branches if hasattr(b, 'vocabulary')]
+        self.max_paragraphs = max_paragraphs
+        self.max_chunks = max_chunks
+        self._paragraphs = OrderedDict()
+        self._chunks = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def supports(text):
+        # Stylometry falls back to its multi-pass path when lowercasing changes the length
+        return len(text.lower()) == len(text)
+
+    @staticmethod
+    def _key(paragraph_text):
+        return hashlib.blake2b(paragraph_text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+    def _paragraph(self, text):
+        """(contribution, True when it came from the cache) of one paragraph."""
+        key = self._key(text)
+        with self._lock:
+            paragraph = self._paragraphs.get(key)
+            if paragraph is not None:
+                self._paragraphs.move_to_end(key)
+                self.hits += 1
+                return paragraph, True
+        paragraph = _Paragraph(text, self.tfidf_branches)
+        with self._lock:
+            self.misses += 1
+            self._paragraphs[key] = paragraph
+            while len(self._paragraphs) > self.max_paragraphs:
+                self._paragraphs.popitem(last=False)
+        return paragraph, False
+
+    def cached(self, text):
+        """Number of the paragraphs of `text` currently in the cache (no scan, no LRU update)."""
+        keys = [self._key(p) for p in split_paragraphs(text)]
+        with self._lock:
+            return sum(key in self._paragraphs for key in keys)
+
+    def _chunk_stat(self, chunk):
+        key = tuple(chunk)
+        with self._lock:
+            stat = self._chunks.get(key)
+            if stat is not None:
+                self._chunks.move_to_end(key)
+                return stat
+        stat = chunk_stat(chunk)
+        with self._lock:
+            self._chunks[key] = stat
+            while len(self._chunks) > self.max_chunks:
+                self._chunks.popitem(last=False)
+        return stat
+
+    def score(self, text):
+        """(raw model score, raw stylometry row) of `text`; requires `supports(text)`."""
+        return self.score_counted(text)[:2]
+
+    def score_counted(self, text):
+        """`score` plus the number of paragraphs served from the cache (not rescanned)."""
+        looked_up = [self._paragraph(p) for p in split_paragraphs(text)]
+        paragraphs = [paragraph for paragraph, _ in looked_up]
+        reused = sum(hit for _, hit in looked_up)
+        score = self.fast.intercept
+        row = self._stylometry_row(paragraphs, text)
+        tfidf_index = 0
+        for branch in self.fast.branches:
+            if hasattr(branch, 'vocabulary'):
+                score += self._tfidf_decision(branch, [p.branches[tfidf_index] for p in paragraphs])
+                tfidf_index += 1
+            else:
+                score += branch.decision_features(row[np.newaxis].copy())[0]
+        return float(score), row, reused
+
+    def stats(self):
+        with self._lock:
+            return {'paragraphs': len(self._paragraphs), 'hits': self.hits, 'misses': self.misses}
+
+    # --- aggregation ---
+    @staticmethod
+    def _tfidf_decision(branch, parts):
+        ngram_range = tuple(branch.spec['ngram_range'])
+        context = ngram_range[1] - 1
+        join = ''.join if branch.spec['analyzer'] == 'char' else ' '.join
+        cols = [np.empty(0, dtype=np.int64)] + [part.cols for part in parts]
+        counts = [np.empty(0, dtype=np.int64)] + [part.counts for part in parts]
+        if context:
+            boundary = []
+            tail = parts[0].tail if parts else []
+            for part in parts[1:]:
+                boundary += _boundary_grams(tail, part.head, ngram_range, join)
+                # Stream tail after this paragraph (short paragraphs extend the previous one)
+                if part.length >= context:
+                    tail = part.tail
+                else:
+                    tail = tail + part.head
+                    tail = tail[max(len(tail) - context, 0):]
+            boundary_counts = count_vocab(boundary, branch.vocabulary)
+            cols.append(np.fromiter(boundary_counts.keys(), dtype=np.int64, count=len(boundary_counts)))
+            counts.append(np.fromiter(boundary_counts.values(), dtype=np.int64, count=len(boundary_counts)))
+
+        cols, inverse = np.unique(np.concatenate(cols), return_inverse=True)
+        tf = np.bincount(inverse.ravel(), weights=np.concatenate(counts), minlength=len(cols)).astype(np.float64)
+        return branch._score(np.zeros(len(cols), dtype=np.int64), cols, tf, 1)[0]
+
+    def _stylometry_row(self, paragraphs, text):
+        default_row = np.array([DEFAULT_FEATURES[name] for name in FEATURE_NAMES])
+        if not text.strip():
+            return default_row
+
+        scan = TextScan()
+        open_piece = None # sentence piece continuing into the next paragraph
+        for i, p in enumerate(paragraphs):
+            scan.words += p.words
+            pieces = p.pieces
+            if open_piece is not None:
+                n_words, first_len = pieces[0]
+                pieces = [(open_piece[0] + n_words, open_piece[1] if open_piece[1] is not None else first_len)] + pieces[1:]
+            for n_words, first_len in pieces[:-1]:
+                if first_len is not None: # blank pieces are dropped
+                    scan.sent_lens.append(n_words)
+                    scan.first_lens.append(first_len)
+            open_piece = pieces[-1]
+            scan.n_em_dash += p.n_em_dash
+            scan.n_struct_punct += p.n_struct_punct
+            scan.n_passive += p.n_passive
+            scan.n_adverbs += p.n_adverbs
+            if i and paragraphs[i - 1].trail_passive and p.lead_word:
+                scan.n_passive += len(_PASSIVE_RE.findall(paragraphs[i - 1].trail_passive + p.lead_word))
+        if open_piece is not None and open_piece[1] is not None:
+            scan.sent_lens.append(open_piece[0])
+            scan.first_lens.append(open_piece[1])
+
+        if len(scan.words) < 5:
+            return default_row
+        return scan_rows([scan], self._chunk_stat)[0]
@@ -0,0 +1,228 @@
+import glob
+import os
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+
+from scripts.api.timing import BUCKETS_MS, StageHistograms
+
+# Service metrics and readiness
+# -----------------------------
+# ServiceMetrics counts what the scoring process serves, from each protocol request and
+# its response (so the stdio worker, the micro-batching service and the pool parent all
+# report the same way):
+#   - requests and errors per op, and request latency histograms per op
+#   - outcomes of scored texts: short-text rejections, "Cannot Determine", labels
+#   - scoring batch sizes (micro-batches and predict_batch requests)
+# Cache hit counts, queue depth and the like are read at snapshot time: the detector's
+# cache and any gauges the server registers (`add_gauge`). `snapshot` is the JSON form
+# (the `metrics` op), `prometheus_text` the Prometheus exposition format.
+#
+# `warm_up` scores a few paragraphs from data/ right after loading (memory-mapped tables
+# paged in, first-call allocations and imports done) without touching the result cache
+# or the counters; `health` reports ready once that has run.
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data'))
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+SHORT_TEXT_REASON = 'Text too short'
+NEAR_DUPLICATE_COUNTERS = ('lookups', 'reused', 'incremental', 'full_runs_avoided', 'entries')
+OPS = ('predict', 'predict_batch', 'ping', 'stats', 'timings', 'metrics', 'health')
+
+
+def rss_bytes():
+    """(current, peak) resident set size of this process in bytes (current is None off Linux)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = peak if sys.platform == 'darwin' else peak * 1024
+    try:
+        with open('/proc/self/statm') as f:
+            current = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        current = None
+    return current, peak
+
+
+def warmup_texts(data_dir=DATA_DIR, n_texts=4, min_words=60):
+    """Up to n_texts paragraphs from the bundled corpora, alternating human and AI files."""
+    groups = [sorted(glob.glob(os.path.join(data_dir, sub, '*', '*.txt'))) for sub in ('human_mass', 'ai')]
+    texts = []
+    for path in (p for paths in zip(*groups) for p in paths):
+        if len(texts) >= n_texts:
+            break
+        with open(path, encoding='utf-8', errors='replace') as f:
+            paragraph = next((p for p in f.read().split('\n\n') if len(p.split()) >= min_words), None)
+        if paragraph is not None:
+            texts.append(paragraph)
+    return texts
+
+
+class ServiceMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = Counter() # op -> requests
+        self.errors = Counter() # op -> failed requests
+        self.outcomes = Counter() # scored texts: 'short_text', 'cannot_determine', 'likely_human', ...
+        self.batch_sizes = Counter()
+        self.latency = StageHistograms() # per op
+        self.gauges = {}
+        self.warmup = None # {'texts', 'ms'} once warm_up has run
+
+    def add_gauge(self, name, fn):
+        """Registers a callable read at snapshot time (e.g. queue depth)."""
+        self.gauges[name] = fn
+
+    def observe(self, request, response, seconds):
+        op = request.get('op', 'predict') if isinstance(request, dict) else 'invalid'
+        if op not in OPS and op != 'invalid':
+            op = 'unknown' # client-chosen strings must not become label values
+        results = []
+        if response.get('ok'):
+            result = response.get('result')
+            results = result if op == 'predict_batch' else [result] if op == 'predict' else []
+        with self._lock:
+            self.requests[op] += 1
+            if not response.get('ok'):
+                self.errors[op] += 1
+            for result in results:
+                if not isinstance(result, dict):
+                    continue
+                if 'error' in result:
+                    self.outcomes['error'] += 1
+                elif str(result.get('reason', '')).startswith(SHORT_TEXT_REASON):
+                    self.outcomes['short_text'] += 1
+                else:
+                    label = str(result.get('classification', 'unknown'))
+                    self.outcomes[label.lower().replace(' ', '_')] += 1
+            if op == 'predict_batch' and results:
+                self.batch_sizes[len(results)] += 1
+        self.latency.observe({op: {'ms': seconds * 1000.0, 'size': 1}})
+
+    def observe_batch(self, size):
+        with self._lock:
+            self.batch_sizes[size] += 1
+
+    def warm_up(self, detector, texts=None):
+        """Scores warm-up texts as a batch and with segments; returns the wall time (ms)."""
+        if detector.pipeline is None:
+            return None
+        texts = warmup_texts() if texts is None else texts
+        start = time.perf_counter()
+        # Results stay out of the caches and the stage histograms
+        saved = detector.cache, detector.near_duplicates, detector.stage_stats
+        detector.cache = detector.near_duplicates = detector.stage_stats = None
+        try:
+            if texts:
+                detector.predict_batch(texts)
+                for text in texts:
+                    detector.predict_segments(text)
+        finally:
+            detector.cache, detector.near_duplicates, detector.stage_stats = saved
+        ms = (time.perf_counter() - start) * 1000.0
+        self.warmup = {'texts': len(texts), 'ms': ms}
+        return ms
+
+    def health(self, detector):
+        loaded = detector.pipeline is not None
+        return {
+            'ready': loaded and self.warmup is not None,
+            'loaded': loaded,
+            'warmup': self.warmup,
+            'version': (detector.metadata or {}).get('model_version'),
+            'format': detector.artifact_format,
+            'uptime_s': time.time() - self.started,
+            'pid': os.getpid()
+        }
+
+    def snapshot(self, detector):
+        current, peak = rss_bytes()
+        with self._lock:
+            out = {
+                'requests': dict(self.requests),
+                'errors': dict(self.errors),
+                'outcomes': dict(self.outcomes),
+                'batch_sizes': {str(size): n for size, n in sorted(self.batch_sizes.items())}
+            }
+        gauges = {}
+        for name, fn in self.gauges.items():
+            try:
+                gauges[name] = fn()
+            except Exception:
+                gauges[name] = None
+        cache = detector.cache.stats() if detector.cache is not None else None
+        near = detector.near_duplicates.stats() if detector.near_duplicates is not None else None
+        out.update({
+            'cache': {'hits': cache['hits'], 'misses': cache['misses'], 'hit_rate': cache['hit_rate']} if cache else None,
+            'near_duplicates': {k: near[k] for k in NEAR_DUPLICATE_COUNTERS} if near else None,
+            'gauges': gauges,
+            'latency': self.latency.snapshot(),
+            'rss_bytes': current,
+            'peak_rss_bytes': peak,
+            'health': self.health(detector)
+        })
+        return out
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{str(v)}"' for k, v in labels.items()) + '}' if labels else ''
+
+
+def prometheus_text(snapshot):
+    """Prometheus text exposition (version 0.0.4) of a ServiceMetrics snapshot."""
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{_labels(**labels)} {value}")
+
+    metric('detector_requests_total', 'counter', 'Protocol requests served, by op',
+           [({'op': op}, n) for op, n in sorted(snapshot['requests'].items())])
+    metric('detector_request_errors_total', 'counter', 'Protocol requests that failed, by op',
+           [({'op': op}, n) for op, n in sorted(snapshot['errors'].items())])
+    metric('detector_outcomes_total', 'counter', 'Scored texts by outcome (short_text, cannot_determine, labels)',
+           [({'outcome': k}, n) for k, n in sorted(snapshot['outcomes'].items())])
+    cache = snapshot['cache'] or {}
+    metric('detector_cache_hits_total', 'counter', 'Result cache hits', [({}, cache.get('hits', 0))])
+    metric('detector_cache_misses_total', 'counter', 'Result cache misses', [({}, cache.get('misses', 0))])
+    near = snapshot['near_duplicates']
+    if near is not None:
+        metric('detector_near_duplicate_lookups_total', 'counter', 'Near-duplicate index lookups',
+               [({}, near['lookups'])])
+        metric('detector_near_duplicate_hits_total', 'counter', 'Near-duplicates served without a full pipeline run',
+               [({'mode': 'reuse'}, near['reused']), ({'mode': 'incremental'}, near['incremental'])])
+        metric('detector_near_duplicate_entries', 'gauge', 'Texts in the near-duplicate index', [({}, near['entries'])])
+
+    sizes = {int(k): n for k, n in snapshot['batch_sizes'].items()}
+    samples = [({'le': bound}, sum(n for s, n in sizes.items() if s <= bound)) for bound in BATCH_BUCKETS]
+    samples.append(({'le': '+Inf'}, sum(sizes.values())))
+    lines.append("# HELP detector_batch_size Texts per scoring batch")
+    lines.append("# TYPE detector_batch_size histogram")
+    lines.extend(f"detector_batch_size_bucket{_labels(**labels)} {n}" for labels, n in samples)
+    lines.append(f"detector_batch_size_sum {sum(s * n for s, n in sizes.items())}")
+    lines.append(f"detector_batch_size_count {sum(sizes.values())}")
+
+    lines.append("# HELP detector_request_duration_ms Request latency by op")
+    lines.append("# TYPE detector_request_duration_ms histogram")
+    for op, stage in sorted(snapshot['latency']['stages'].items()):
+        cumulative = 0
+        for bound, n in zip(list(BUCKETS_MS) + ['+Inf'], stage['buckets_ms'].values()):
+            cumulative += n
+            lines.append(f"detector_request_duration_ms_bucket{_labels(op=op, le=bound)} {cumulative}")
+        lines.append(f"detector_request_duration_ms_sum{_labels(op=op)} {stage['mean_ms'] * stage['count']}")
+        lines.append(f"detector_request_duration_ms_count{_labels(op=op)} {stage['count']}")
+
+    for name, value in sorted(snapshot['gauges'].items()):
+        if isinstance(value, (int, float)):
+            metric(f"detector_{name}", 'gauge', f"{name.replace('_', ' ').capitalize()}", [({}, value)])
+    if snapshot['rss_bytes'] is not None:
+        metric('detector_rss_bytes', 'gauge', 'Resident set size', [({}, snapshot['rss_bytes'])])
+    metric('detector_peak_rss_bytes', 'gauge', 'Peak resident set size', [({}, snapshot['peak_rss_bytes'])])
+    health = snapshot['health']
+    metric('detector_ready', 'gauge', 'Model loaded and warmed up', [({}, int(health['ready']))])
+    metric('detector_uptime_seconds', 'gauge', 'Seconds since the process started', [({}, round(health['uptime_s'], 3))])
+    metric('detector_model_info', 'gauge', 'Loaded model',
+           [({'version': health['version'], 'format': health['format']}, 1)])
+    return '\n'.join(lines) + '\n'
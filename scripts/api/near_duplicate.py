@@ -0,0 +1,135 @@
+import json
+import threading
+from collections import OrderedDict
+
+from scripts.features.minhash import MinHasher, lsh_bands
+
+# Near-duplicate submission index
+# -------------------------------
+# The result cache only serves byte-identical (whitespace-normalized) re-submissions.
+# Lightly edited copies (a fixed typo, a swapped sentence, a re-pasted draft) miss it
+# and pay a full pipeline run. This index keeps the MinHash signature (see
+# scripts/features/minhash.py) and the result of every text the detector scored, in
+# an LSH table. A new text whose estimated Jaccard similarity to a stored one (same
+# domain hint, same artifacts) is at least `threshold` is a near-duplicate; the
+# detector then, by `mode`:
+#   'reuse'        returns the stored result (meta.near_duplicate gives the similarity)
+#   'incremental'  scores it with predict_incremental, which rescans only paragraphs
+#                  the incremental scorer has not seen (results are exact); a match
+#                  none of whose paragraphs are still cached is scored with the rest
+#                  of the batch, and only matches that reused paragraphs are counted
+# The index is bounded to max_entries signatures, evicting the least recently matched.
+
+MODES = ('reuse', 'incremental')
+
+
+class NearDuplicateIndex:
+    """
+    LSH index of scored texts keyed by MinHash signature.
+    threshold: lowest estimated Jaccard similarity treated as a near-duplicate
+    max_entries: stored texts (least recently used evicted first)
+    """
+    def __init__(self, threshold=0.9, max_entries=4096, mode='reuse', num_perm=128, shingle_size=5):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("threshold must be in (0, 1]")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.mode = mode
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.bands, self.rows = lsh_bands(num_perm, threshold)
+        self.fingerprint = None
+        self._entries = OrderedDict() # id -> (signature, band keys, domain, result JSON)
+        self._tables = [{} for _ in range(self.bands)] # band key -> [ids]
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.reused = 0
+        self.incremental = 0
+        self.evictions = 0
+
+    def bind(self, fingerprint):
+        """Drops every entry when the artifacts change (results of another model)."""
+        with self._lock:
+            if fingerprint != self.fingerprint:
+                self._entries.clear()
+                for table in self._tables:
+                    table.clear()
+                self.fingerprint = fingerprint
+
+    def signature(self, text):
+        return self.hasher.signature(text)
+
+    def _band_keys(self, sig):
+        return [sig[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def lookup(self, sig, domain):
+        """(result dict, similarity) of the most similar stored near-duplicate, or None."""
+        keys = self._band_keys(sig)
+        with self._lock:
+            self.lookups += 1
+            candidates = set()
+            for table, key in zip(self._tables, keys):
+                candidates.update(table.get(key, ()))
+            best, best_sim = None, self.threshold
+            for entry_id in candidates:
+                stored, _, stored_domain, _ = self._entries[entry_id]
+                if stored_domain != domain:
+                    continue
+                sim = MinHasher.similarity(sig, stored)
+                if sim >= best_sim:
+                    best, best_sim = entry_id, sim
+            if best is None:
+                return None
+            self._entries.move_to_end(best)
+            return json.loads(self._entries[best][3]), best_sim
+
+    def add(self, sig, domain, result):
+        keys = self._band_keys(sig)
+        payload = json.dumps(result)
+        with self._lock:
+            if self.max_entries <= 0:
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (sig, keys, domain, payload)
+            for table, key in zip(self._tables, keys):
+                table.setdefault(key, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        entry_id, (_, keys, _, _) = self._entries.popitem(last=False)
+        for table, key in zip(self._tables, keys):
+            ids = table[key]
+            ids.remove(entry_id)
+            if not ids:
+                del table[key]
+        self.evictions += 1
+
+    def record(self, mode):
+        """Counts a near-duplicate served by `mode` without a full rescan (a full pipeline run avoided)."""
+        with self._lock:
+            if mode == 'reuse':
+                self.reused += 1
+            else:
+                self.incremental += 1
+
+    def stats(self):
+        with self._lock:
+            avoided = self.reused + self.incremental
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'threshold': self.threshold,
+                'mode': self.mode,
+                'bands': self.bands,
+                'rows': self.rows,
+                'lookups': self.lookups,
+                'reused': self.reused,
+                'incremental': self.incremental,
+                'full_runs_avoided': avoided,
+                'hit_rate': avoided / self.lookups if self.lookups else 0.0,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,382 @@
+import asyncio
+import gc
+import itertools
+import multiprocessing
+import os
+import pickle
+import signal
+import socket
+import struct
+import sys
+import time
+from collections import deque
+
+# Add standard import path for shared modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from scripts.api.cache import ResultCache
+from scripts.api.metrics import NEAR_DUPLICATE_COUNTERS, ServiceMetrics, prometheus_text, warmup_texts
+from scripts.api.near_duplicate import NearDuplicateIndex
+from scripts.api.predict import CommercialDetector, handle_request
+from scripts.api.service import LineServer
+
+# Pre-forked worker pool
+# ----------------------
+# Stylometry and n-gram analysis are pure Python, so one process scores on one core.
+# The pool loads the artifacts once in the parent, freezes the heap (gc.freeze(), so
+# the children's collector never writes to the inherited objects) and forks N workers.
+# The memory-mapped scoring tables and the unpickled vocabularies are then shared
+# copy-on-write instead of being loaded N times.
+#
+# The parent speaks the worker line protocol (stdio / Unix socket / TCP, see
+# service.py) and routes each request to the least-loaded worker over a socket pair
+# (length-prefixed pickles; the parent end is an asyncio stream, so a large message or
+# a busy worker never blocks the event loop):
+#   - at most max_inflight requests are outstanding per worker; further requests wait
+#     in the parent, at most max_queue of them, beyond which they are rejected
+#   - each connection stops reading once pool capacity is in flight (backpressure)
+#   - a worker that dies fails its in-flight requests and is re-forked from the parent
+# The `stats` op reports per-worker utilization, restarts and memory (RSS / PSS).
+# `metrics` and `health` are answered by the parent, which sees every request; cache
+# and near-duplicate counters are summed over the workers. The model is warmed up
+# before forking.
+
+
+class PoolBusy(Exception):
+    pass
+
+
+def _memory_mb(pid):
+    """(rss, pss) of a process in MB from /proc (Linux only), else (None, None)."""
+    try:
+        fields = {}
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[0].endswith(':'):
+                    fields[parts[0][:-1]] = int(parts[1])
+        return fields['Rss'] / 1024.0, fields['Pss'] / 1024.0
+    except (OSError, ValueError, KeyError):
+        return None, None
+
+
+_HEADER = struct.Struct('!Q')
+
+
+def _frame(message):
+    payload = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    return _HEADER.pack(len(payload)) + payload
+
+
+def _worker_main(detector, sock, inherited):
+    # Forked child: serves (seq, request) messages until the parent closes the socket
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for other in inherited:
+        other.close()
+    stream = sock.makefile('rb')
+    while True:
+        try:
+            header = stream.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            message = pickle.loads(stream.read(_HEADER.unpack(header)[0]))
+        except (EOFError, OSError, pickle.UnpicklingError):
+            return
+        if message is None:
+            return
+        seq, request = message
+        start = time.perf_counter()
+        response = handle_request(detector, request)
+        try:
+            sock.sendall(_frame((seq, response, time.perf_counter() - start)))
+        except OSError:
+            return
+
+
+class _Worker:
+    def __init__(self, slot, process, sock):
+        self.slot = slot
+        self.process = process
+        self.sock = sock
+        self.writer = None # asyncio.StreamWriter once connected
+        self.inflight = {} # seq -> future
+        self.started = time.perf_counter()
+        self.busy_s = 0.0
+        self.served = 0
+
+
+class WorkerPool:
+    """
+    n_workers forked children serving `detector` (default: one per CPU).
+    max_inflight: outstanding requests per worker
+    max_queue: requests allowed to wait for a free worker before PoolBusy is raised
+    """
+    def __init__(self, detector, n_workers=None, max_inflight=2, max_queue=256):
+        self.detector = detector
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.workers = [None] * self.n_workers
+        self.restarts = [0] * self.n_workers
+        self.rejected = 0
+        self._ctx = multiprocessing.get_context('fork')
+        self._seq = itertools.count()
+        self._waiters = deque()
+        self._loop = None
+        self._closing = False
+
+    @property
+    def capacity(self):
+        return self.n_workers * self.max_inflight
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        # Everything allocated so far (the model) moves to the permanent generation
+        gc.collect()
+        gc.freeze()
+        for slot in range(self.n_workers):
+            self._spawn(slot)
+
+    def _spawn(self, slot):
+        if self._closing:
+            return
+        parent_sock, child_sock = socket.socketpair()
+        inherited = [w.sock for w in self.workers if w is not None]
+        process = self._ctx.Process(target=_worker_main, args=(self.detector, child_sock, inherited),
+                                    name=f"detector-worker-{slot}", daemon=True)
+        process.start()
+        child_sock.close()
+        worker = _Worker(slot, process, parent_sock)
+        self.workers[slot] = worker
+        self._loop.create_task(self._serve(worker))
+
+    async def _serve(self, worker):
+        # Reads the worker's responses until its socket closes; the worker takes requests
+        # once its writer is set
+        try:
+            reader, worker.writer = await asyncio.open_connection(sock=worker.sock)
+            self._wake()
+            while True:
+                header = await reader.readexactly(_HEADER.size)
+                seq, response, busy_s = pickle.loads(await reader.readexactly(_HEADER.unpack(header)[0]))
+                worker.busy_s += busy_s
+                worker.served += 1
+                future = worker.inflight.pop(seq, None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+                self._wake()
+        except (asyncio.IncompleteReadError, OSError, pickle.UnpicklingError):
+            pass
+        self._on_exit(worker)
+
+    def _send(self, worker, message):
+        # Buffered by the transport and flushed as the socket drains; at most
+        # max_inflight requests (plus call_each's) are outstanding per worker
+        worker.writer.write(_frame(message))
+
+    def _on_exit(self, worker):
+        if worker.writer is not None:
+            worker.writer.close()
+        else:
+            worker.sock.close()
+        self.workers[worker.slot] = None
+        if not self._closing:
+            worker.process.join(timeout=1.0)
+        for future in worker.inflight.values():
+            if not future.done():
+                future.set_exception(RuntimeError(f"Worker {worker.slot} exited (code {worker.process.exitcode})"))
+        worker.inflight.clear()
+        if self._closing:
+            return
+        self.restarts[worker.slot] += 1
+        print(f"Worker {worker.slot} (pid {worker.process.pid}) exited with code {worker.process.exitcode};"
+              " restarting", file=sys.stderr)
+        # Back off when a slot keeps crashing (e.g. a worker that dies on startup)
+        recent = time.perf_counter() - worker.started
+        delay = 0.0 if recent > 10.0 else min(0.1 * 2 ** self.restarts[worker.slot], 5.0)
+        self._loop.call_later(delay, self._spawn, worker.slot)
+
+    def _pick(self):
+        free = [w for w in self.workers
+                if w is not None and w.writer is not None and len(w.inflight) < self.max_inflight]
+        return min(free, key=lambda w: len(w.inflight)) if free else None
+
+    def _wake(self):
+        free = sum(self.max_inflight - len(w.inflight) for w in self.workers if w is not None and w.writer is not None)
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def submit(self, request):
+        """Response dict of `handle_request(detector, request)`, computed by a worker."""
+        worker = self._pick()
+        if worker is None:
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise PoolBusy(f"Pool is saturated ({self.max_queue} requests waiting)")
+            while worker is None:
+                waiter = self._loop.create_future()
+                self._waiters.append(waiter)
+                await waiter
+                worker = self._pick()
+        seq = next(self._seq)
+        future = self._loop.create_future()
+        worker.inflight[seq] = future
+        self._send(worker, (seq, request))
+        return await future
+
+    async def call_each(self, request):
+        """Responses of every live worker to `request` (sent regardless of max_inflight)."""
+        futures = []
+        for worker in self.workers:
+            if worker is None or worker.writer is None:
+                continue
+            seq = next(self._seq)
+            future = self._loop.create_future()
+            worker.inflight[seq] = future
+            self._send(worker, (seq, request))
+            futures.append(future)
+        return await asyncio.gather(*futures, return_exceptions=True)
+
+    async def close(self):
+        self._closing = True
+        workers = [w for w in self.workers if w is not None]
+        for worker in workers:
+            if worker.writer is None:
+                worker.sock.close()
+                continue
+            self._send(worker, None)
+            worker.writer.close() # after the buffered messages are written
+        for worker in workers:
+            if worker.writer is not None:
+                try:
+                    await worker.writer.wait_closed()
+                except OSError:
+                    pass
+            await self._loop.run_in_executor(None, worker.process.join, 2.0)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        gc.unfreeze()
+
+    def stats(self):
+        now = time.perf_counter()
+        workers = []
+        for slot, worker in enumerate(self.workers):
+            if worker is None:
+                workers.append({'slot': slot, 'alive': False, 'restarts': self.restarts[slot]})
+                continue
+            rss, pss = _memory_mb(worker.process.pid)
+            workers.append({
+                'slot': slot,
+                'alive': True,
+                'pid': worker.process.pid,
+                'served': worker.served,
+                'inflight': len(worker.inflight),
+                'utilization': worker.busy_s / (now - worker.started) if now > worker.started else 0.0,
+                'restarts': self.restarts[slot],
+                'rss_mb': rss,
+                'pss_mb': pss
+            })
+        parent_rss, parent_pss = _memory_mb(os.getpid())
+        pss = [w['pss_mb'] for w in workers if w.get('pss_mb') is not None]
+        return {
+            'workers': workers,
+            'waiting': len(self._waiters),
+            'rejected': self.rejected,
+            'max_inflight': self.max_inflight,
+            'max_queue': self.max_queue,
+            'parent_rss_mb': parent_rss,
+            # Proportional set size counts shared pages once across the processes
+            'total_pss_mb': parent_pss + sum(pss) if parent_pss is not None else None
+        }
+
+
+class PoolService(LineServer):
+    """Line-protocol front end that routes every request to a WorkerPool."""
+    def __init__(self, detector, n_workers=None, max_inflight=2, max_queue=256):
+        super().__init__(detector)
+        self.pool = WorkerPool(detector, n_workers, max_inflight, max_queue)
+        self.max_in_flight = self.pool.capacity + max_queue
+        if detector.metrics is not None:
+            pool = self.pool
+            detector.metrics.add_gauge('queue_depth', lambda: len(pool._waiters))
+            detector.metrics.add_gauge('workers_alive', lambda: sum(w is not None for w in pool.workers))
+            detector.metrics.add_gauge('workers_in_flight',
+                                       lambda: sum(len(w.inflight) for w in pool.workers if w is not None))
+
+    async def start(self):
+        self.pool.start()
+
+    async def stop(self):
+        await self.pool.close()
+
+    async def metrics_snapshot(self):
+        snapshot = self.detector.metrics.snapshot(self.detector)
+        stats = [r['result'] for r in await self.pool.call_each({'op': 'stats'}) if isinstance(r, dict) and r.get('ok')]
+        caches = [s['cache'] for s in stats if s.get('cache')]
+        nears = [s['near_duplicates'] for s in stats if s.get('near_duplicates')]
+        if nears:
+            snapshot['near_duplicates'] = {k: sum(n[k] for n in nears) for k in NEAR_DUPLICATE_COUNTERS}
+        if caches:
+            hits = sum(c['hits'] for c in caches)
+            misses = sum(c['misses'] for c in caches)
+            snapshot['cache'] = {'hits': hits, 'misses': misses,
+                                 'hit_rate': hits / (hits + misses) if hits + misses else 0.0}
+        return snapshot
+
+    async def handle(self, request):
+        req_id = request.get('id') if isinstance(request, dict) else None
+        op = request.get('op') if isinstance(request, dict) else None
+        if op == 'stats':
+            return {'id': req_id, 'ok': True, 'result': {'pool': self.pool.stats()}}
+        if op in ('metrics', 'health') and self.detector.metrics is not None:
+            if op == 'health':
+                result = self.detector.metrics.health(self.detector)
+            elif request.get('format', 'json') == 'prometheus':
+                result = {'text': prometheus_text(await self.metrics_snapshot())}
+            else:
+                result = await self.metrics_snapshot()
+            return {'id': req_id, 'ok': True, 'result': result}
+        try:
+            return await self.pool.submit(request)
+        except Exception as e:
+            return {'id': req_id, 'ok': False, 'error': str(e)}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Pre-forked detector worker pool (worker line protocol)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--socket', default=None, help='Serve on this Unix socket path (default: stdin/stdout)')
+    parser.add_argument('--host', default='127.0.0.1', help='TCP host (with --port)')
+    parser.add_argument('--port', type=int, default=None, help='Serve on this TCP port')
+    parser.add_argument('--max-inflight', type=int, default=2, help='Outstanding requests per worker')
+    parser.add_argument('--max-queue', type=int, default=256, help='Requests waiting for a worker before rejecting')
+    parser.add_argument('--artifacts', default='scripts/artifacts', help='Artifacts directory')
+    parser.add_argument('--format', default='auto', choices=['auto', 'fast', 'joblib'], help='Artifact format to load')
+    parser.add_argument('--cache-size', type=int, default=2048, help='Per-worker in-memory result cache entries (0 disables)')
+    parser.add_argument('--near-dup', type=float, default=None, metavar='THRESHOLD',
+                        help='Serve edited re-submissions at >= THRESHOLD Jaccard similarity via the near-duplicate index')
+    parser.add_argument('--near-dup-mode', default='reuse', choices=['reuse', 'incremental'],
+                        help='Near-duplicates: return the stored result, or re-score incrementally')
+    parser.add_argument('--near-dup-size', type=int, default=4096, help='Texts kept in each worker\'s near-duplicate index')
+    parser.add_argument('--warmup', type=int, default=4, help='Warm-up texts from data/ scored before forking (0 skips)')
+    parser.add_argument('--metrics-port', type=int, default=None, help='Serve /metrics and /healthz over HTTP on host:PORT')
+    args = parser.parse_args()
+
+    if args.max_inflight < 1 or args.max_queue < 0 or (args.workers is not None and args.workers < 1):
+        parser.error('--workers and --max-inflight must be >= 1, --max-queue >= 0')
+    # No persistent cache: a SQLite connection must not be shared across fork
+    cache = ResultCache(max_entries=args.cache_size) if args.cache_size > 0 else None
+    near_duplicates = NearDuplicateIndex(args.near_dup, args.near_dup_size, args.near_dup_mode) if args.near_dup else None
+    detector = CommercialDetector(artifacts_dir=args.artifacts, cache=cache, artifact_format=args.format,
+                                  metrics=ServiceMetrics(), near_duplicates=near_duplicates)
+    detector.metrics.warm_up(detector, warmup_texts(n_texts=args.warmup))
+    service = PoolService(detector, args.workers, args.max_inflight, args.max_queue)
+    try:
+        asyncio.run(service.run(args.socket, args.host, args.port, args.metrics_port))
+    except KeyboardInterrupt:
+        pass
@@ -1,47 +1,157 @@
 
 import os
-import joblib
+import json
+import pickle
 import sys
+import time
 import numpy as np
-import pandas as pd
 
 # Add standard import path for shared modules
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
-# Import StylometryExtractor to ensure unpickling works
-from scripts.features.stylometry import StylometryExtractor
+# Only what scoring needs is imported up front. sklearn/joblib are imported on demand
+# when the joblib artifacts are used (unpickling model.joblib imports
+# scripts.features.stylometry and sklearn by itself).
+from scripts.features.stylometry_core import StylometryFeaturizer, features_from_row
+from scripts.api.cache import ResultCache, artifact_fingerprint
+from scripts.api.artifact_store import FAST_DIR, FastPipeline, load_fast_pipeline
+from scripts.api.incremental import IncrementalScorer
+from scripts.api.metrics import ServiceMetrics, prometheus_text, warmup_texts
+from scripts.api.near_duplicate import NearDuplicateIndex
+from scripts.api.segments import WindowScorer, sentence_spans, window_ranges
+from scripts.api.timing import StageHistograms, StageTimer
+
+def _predict_timed(pipeline, texts, timer):
+    """`pipeline.predict(texts)` with every FeatureUnion branch and the regressor timed."""
+    if not hasattr(pipeline, 'named_steps'):
+        return pipeline.predict(texts, timer=timer) # FastPipeline times its own branches
+
+    # Same computation as FeatureUnion.transform -> regressor.predict, one branch at a time
+    union = pipeline.named_steps['features']
+    weights = union.transformer_weights or {}
+    size = sum(len(t) for t in texts)
+    blocks = []
+    for name, trans in union.transformer_list:
+        with timer.stage(name, size):
+            X = trans.transform(texts)
+            if weights.get(name) is not None:
+                X = X * weights[name]
+        blocks.append(X)
+
+    from scipy import sparse
+    with timer.stage('regressor', len(texts)):
+        if any(sparse.issparse(X) for X in blocks):
+            X = sparse.hstack(blocks).tocsr()
+        else:
+            X = np.hstack(blocks)
+        return pipeline.named_steps['regressor'].predict(X)
+
+def _load_pickle(path):
+    # metadata.pkl is a joblib dump of a plain dict, which the stdlib unpickler reads
+    # without importing joblib; anything else goes through joblib
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        import joblib
+        return joblib.load(path)
 
 class CommercialDetector:
     """
     Production-grade inference wrapper for the AI Detector.
     Handles artifact loading, probability calibration, and signal explanation.
     """
-    def __init__(self, artifacts_dir='scripts/artifacts'):
+    # Domain-Adaptive Thresholds: probability needed for a "Likely Human" label
+    DOMAIN_THRESHOLDS = {
+        'esl': 0.55,      # Stricter for ESL (needs more evidence to be called Human)
+        'academic': 0.50, # Neutral
+        'general': 0.60,  # High bar for "Human" tag
+        'ai': 0.45
+    }
+
+    def __init__(self, artifacts_dir='scripts/artifacts', cache=None, artifact_format='auto', stage_stats=None,
+                 metrics=None, near_duplicates=None):
+        """
+        cache: optional ResultCache; identical re-submissions are then served from it.
+        artifact_format: 'auto' (fast export when present and current), 'fast' or 'joblib'.
+        stage_stats: optional StageHistograms; every call's per-stage timings are added to it.
+        metrics: optional ServiceMetrics, reported by the `metrics` and `health` ops.
+        near_duplicates: optional NearDuplicateIndex; lightly edited re-submissions then
+                         reuse a stored result or are re-scored incrementally.
+        """
         self.artifacts_dir = artifacts_dir
+        self.artifact_format = artifact_format
         self.pipeline = None
-        self.calibrator = None
+        self._calibrator = None
         self.metadata = None
-        self.extractor = StylometryExtractor()
+        self.fingerprint = None
+        self.cache = cache
+        self.stage_stats = stage_stats
+        self.metrics = metrics
+        self.near_duplicates = near_duplicates
+        self.incremental = None # IncrementalScorer, created by the first predict_incremental
+        self.extractor = StylometryFeaturizer()
         self._load_artifacts()
+        if self.cache is not None and self.fingerprint:
+            self.cache.bind(self.fingerprint)
+        if self.near_duplicates is not None:
+            self.near_duplicates.bind(self.fingerprint)
 
     def _load_artifacts(self):
         try:
             model_path = os.path.join(self.artifacts_dir, 'model.joblib')
             calib_path = os.path.join(self.artifacts_dir, 'calibrator.joblib')
             meta_path = os.path.join(self.artifacts_dir, 'metadata.pkl')
-            
-            if not os.path.exists(model_path):
-                raise FileNotFoundError(f"Model not found at {model_path}")
+            fast_manifest = os.path.join(self.artifacts_dir, FAST_DIR, 'manifest.json')
+
+            self.metadata = _load_pickle(meta_path)
+
+            # Fast format first: memory-mapped arrays, no sklearn unpickling
+            if self.artifact_format in ('auto', 'fast'):
+                self.pipeline = load_fast_pipeline(self.artifacts_dir, self.metadata)
+                if self.pipeline is None and self.artifact_format == 'fast':
+                    raise FileNotFoundError(f"No current fast artifacts at {fast_manifest}")
+            if self.pipeline is None:
+                if not os.path.exists(model_path):
+                    raise FileNotFoundError(f"Model not found at {model_path}")
+                import joblib
+                self.pipeline = joblib.load(model_path)
+                self.artifact_format = 'joblib'
+            else:
+                self.artifact_format = 'fast'
 
-            self.pipeline = joblib.load(model_path)
-            self.calibrator = joblib.load(calib_path)
-            self.metadata = joblib.load(meta_path)
+            # Share the pipeline's own extractor so mlDetails reuse the stylometry branch output
+            self.extractor = self._find_extractor(self.pipeline) or self.extractor
+            # Identity of the loaded artifacts; part of every cache key
+            self.fingerprint = artifact_fingerprint([model_path, calib_path, meta_path, fast_manifest])
             # print(f"Loaded Detector v{self.metadata.get('model_version', 'Unknown')}")
             
         except Exception as e:
-            print(f"CRITICAL: Failed to load detector artifacts: {e}")
+            print(f"CRITICAL: Failed to load detector artifacts: {e}", file=sys.stderr)
             self.pipeline = None
 
+    @property
+    def calibrator(self):
+        # Loaded on first use only: calibration is currently disabled in predict
+        if self._calibrator is None:
+            import joblib
+            self._calibrator = joblib.load(os.path.join(self.artifacts_dir, 'calibrator.joblib'))
+        return self._calibrator
+
+    @staticmethod
+    def _find_extractor(estimator):
+        """Locates the StylometryExtractor inside a (nested) Pipeline/FeatureUnion or FastPipeline."""
+        if isinstance(estimator, StylometryFeaturizer):
+            return estimator
+        if isinstance(getattr(estimator, 'extractor', None), StylometryFeaturizer):
+            return estimator.extractor # FastPipeline
+        children = getattr(estimator, 'steps', None) or getattr(estimator, 'transformer_list', None) or []
+        for _, child in children:
+            found = CommercialDetector._find_extractor(child)
+            if found is not None:
+                return found
+        return None
+
     def _compute_confidence(self, features, raw_score):
         """
         Commercial Confidence Logic:
@@ -77,103 +187,303 @@ class CommercialDetector:
         if base_conf < 0.3: return "LOW"
         return "MEDIUM"
 
-    def predict(self, text, domain=None):
+    def _compute_confidence_batch(self, scores):
+        """Vectorized `_compute_confidence` over an array of scores."""
+        ambiguity_penalty = np.where((scores >= 0.40) & (scores <= 0.60), 0.5, 0.0)
+        extremity_bonus = np.where((scores > 0.85) | (scores < 0.15), 0.3, 0.0)
+        base_conf = 0.5 - ambiguity_penalty + extremity_bonus
+        return np.where(base_conf > 0.7, "HIGH", np.where(base_conf < 0.3, "LOW", "MEDIUM"))
+
+    def predict(self, text, domain=None, timings=False):
         """
         Production Inference.
         domain: 'esl', 'academic', 'general' (optional hint)
+        timings: add per-stage wall times to result['meta']['timings']
+        """
+        return self.predict_batch([text], [domain], timings=timings)[0]
+
+    def predict_batch(self, texts, domains=None, timings=False):
+        """
+        Batch Inference: one pipeline call for the whole batch.
+        domains: None, a single domain hint for every text, or one hint per text.
+        timings: add the batch's per-stage wall times ({stage: {'ms', 'size'}}) to
+                 every result's meta block.
+        Returns the same per-item dicts as `predict`, in input order.
         """
         if not self.pipeline:
-            return {'error': 'Model not loaded'}
+            return [{'error': 'Model not loaded'} for _ in texts]
+
+        texts = list(texts)
+        n = len(texts)
+        if domains is None or isinstance(domains, str):
+            domains = [domains] * n
+        else:
+            domains = list(domains)
+            if len(domains) != n:
+                raise ValueError(f"Got {len(domains)} domains for {n} texts")
+
+        results = [None] * n
+        timer = StageTimer() if timings or self.stage_stats is not None else None
 
         # 1. Edge Case Handling (Short Text)
-        word_count = len(text.split())
-        if word_count < 20: # Commercial Minimum
-             return {
-                 'human_score': 0.5, 
-                 'classification': 'Cannot Determine',
-                 'confidence': 'LOW', 
-                 'reason': 'Text too short (Minimum 20 words)'
-             }
+        word_counts = np.array([len(text.split()) for text in texts], dtype=np.int64)
+        for i in np.flatnonzero(word_counts < 20): # Commercial Minimum
+            results[i] = {
+                'human_score': 0.5,
+                'classification': 'Cannot Determine',
+                'confidence': 'LOW',
+                'reason': 'Text too short (Minimum 20 words)'
+            }
+
+        idx = np.flatnonzero(word_counts >= 20)
+
+        # 1b. Result Cache (exact re-submissions)
+        keys = {}
+        if self.cache is not None and len(idx):
+            cache_start = time.perf_counter() if timer is not None else None
+            version = self.metadata.get('model_version')
+            misses = []
+            for i in idx:
+                keys[i] = ResultCache.make_key(texts[i], domains[i], version, self.fingerprint)
+                cached = self.cache.get(keys[i])
+                if cached is not None:
+                    results[i] = cached
+                else:
+                    misses.append(i)
+            if timer is not None:
+                timer.add('cache', time.perf_counter() - cache_start, len(keys))
+            idx = np.array(misses, dtype=np.int64)
 
+        # 1c. Near-duplicates of earlier submissions (edited copies, see near_duplicate.py)
+        signatures = {}
+        if self.near_duplicates is not None and len(idx):
+            dup_start = time.perf_counter() if timer is not None else None
+            index = self.near_duplicates
+            misses = []
+            for i in idx:
+                signatures[i] = index.signature(texts[i])
+                match = index.lookup(signatures[i], domains[i])
+                if index.mode == 'incremental' and self._incremental_supported(texts[i]):
+                    if match is not None and not (self.incremental and self.incremental.cached(texts[i])):
+                        # None of its paragraphs are cached (evicted, or a one-paragraph
+                        # text that was edited): nothing to reuse, score it with the batch
+                        misses.append(i)
+                        continue
+                    # New texts go through the incremental scorer too, so an edited copy
+                    # later only rescans the paragraphs that changed
+                    results[i], reused = self._predict_incremental(texts[i], domains[i])
+                    if 'meta' in results[i]:
+                        if i in keys:
+                            self.cache.put(keys[i], results[i], self.fingerprint)
+                        index.add(signatures[i], domains[i], results[i])
+                        if match is not None and reused:
+                            index.record('incremental')
+                            results[i]['meta']['near_duplicate'] = {'similarity': match[1], 'mode': 'incremental'}
+                elif match is not None and index.mode == 'reuse':
+                    results[i] = match[0]
+                    results[i]['meta']['near_duplicate'] = {'similarity': match[1], 'mode': 'reuse'}
+                    index.record('reuse')
+                else:
+                    misses.append(i)
+            if timer is not None:
+                timer.add('near_duplicate', time.perf_counter() - dup_start, len(signatures))
+            idx = np.array(misses, dtype=np.int64)
+
+        if len(idx) == 0:
+            return self._finish_timings(results, timer, timings)
+        batch = [texts[i] for i in idx]
+        batch_domains = [domains[i] for i in idx]
+        batch_counts = word_counts[idx]
 
         try:
-            # 2. Raw Prediction
-            raw_val = self.pipeline.predict([text])[0]
-            
-            # 3. Calibration
-            # prob_score = self.calibrator.transform([raw_val])[0]
-            prob_score = float(raw_val) # Calibration removed per user request
-            
-            # Ensure 0-1 bounds just in case
-            prob_score = max(0.0, min(1.0, prob_score))
-            
-            # SHORT TEXT SAFETY DAMPING
-            # If text is < 40 words, we don't trust extreme scores (0.0 or 1.0).
-            # We pull them closer to 0.5 to force "Ambiguity" or "Low Confidence".
-            # if word_count < 40:
-            #     prob_score = (prob_score * 0.6) + 0.2  # Maps 0.0->0.2, 1.0->0.8 (Never 0 or 1)
-            
-            # 4. Domain-Adaptive Thresholding & Ambiguity
-            # Map Probs to Classes using Domain Logic
-            thresholds = {
-                'esl': 0.55,      # Stricter for ESL (needs more evidence to be called Human)
-                'academic': 0.50, # Neutral
-                'general': 0.60,  # High bar for "Human" tag
-                'ai': 0.45
-            }
-            thresh = thresholds.get(domain, 0.50) # Default to 0.50 neutral
-            
-            # Gray Zone Logic (Ambiguity)
-            # Commercial Safety: If it's 0.45-0.55, just say we don't know.
-            if 0.45 < prob_score < 0.55:
-                classification = "Cannot Determine"
-            else:
-                classification = "Likely Human" if prob_score >= thresh else "Likely AI"
-            
-            # 5. Confidence Modeling
-            confidence = self._compute_confidence(None, prob_score)
-            
-            # 6. Length Override for Confidence
-            word_count = len(text.split())
-            if word_count < 50:
-                confidence = "LOW"
-            elif word_count < 100 and confidence == "HIGH":
-                confidence = "MEDIUM"
+            # 2. Raw Prediction (single sparse-matrix pass through the FeatureUnion + regressor)
+            with self.extractor.capture() as captured:
+                if timer is None:
+                    raw_vals = np.asarray(self.pipeline.predict(batch), dtype=np.float64)
+                else:
+                    raw_vals = np.asarray(_predict_timed(self.pipeline, batch, timer), dtype=np.float64)
+
+            # 3-6. Calibration, thresholds, confidence
+            classified = self._classify(raw_vals, batch_domains, batch_counts)
 
-            # 7. Extract Feature Details for UI
-            feats = self.extractor.get_feature_dict(text)
+            # 7. Feature Details for UI (reuse the stylometry branch's output when captured)
+            feats_start = time.perf_counter() if timer is not None else None
+            if captured:
+                feats_list = [features_from_row(row) for row in captured[0]]
+            else:
+                feats_list = [self.extractor.get_feature_dict(text) for text in batch]
+            if timer is not None:
+                timer.add('features', time.perf_counter() - feats_start, len(batch))
 
             # 8. Legal/Product Safe Output
-            return {
-                'human_score': float(prob_score),
-                'ai_score': 1.0 - float(prob_score),
-                'classification': classification,
-                'confidence': confidence,
-                'mlDetails': {
-                    'perplexity': feats['entropy'] * 10, # Scale up for UI visibility
-                    'burstiness': feats['rhythm'] * 10,  # Scale for UI
-                    'entropy': feats['entropy'],
-                    'symmetry': 100 - (feats['stop_ratio'] * 100), # Inverse stopword? Placeholder
-                    'planning': feats['start_var'] / 10, # Normalize
-                    'complexitySlope': feats['complex'] * 100, 
-                    'semanticDrift': feats['ttr'] * 100,
-                    'genre': domain or 'general',
-                    'accountability': 0,
-                    'aiProbability': 1.0 - float(prob_score),
-                    'humanProbability': float(prob_score),
-                    'confidence': confidence,
-                    'modelUsed': 'Python (50k)'
-                },
-                'meta': {
-                    'version': self.metadata.get('model_version'),
-                    'domain_bias': domain,
-                    'raw_score': float(raw_val)
-                },
-                'message': self._get_legal_message(classification, confidence)
-            }
-            
+            for j, i in enumerate(idx):
+                results[i] = self._build_result(*classified[j], feats_list[j], batch_domains[j])
+                if i in keys:
+                    self.cache.put(keys[i], results[i], self.fingerprint)
+                if i in signatures:
+                    self.near_duplicates.add(signatures[i], batch_domains[j], results[i])
+
+        except Exception as e:
+            for i in idx:
+                results[i] = {'error': str(e)}
+
+        return self._finish_timings(results, timer, timings)
+
+    def _classify(self, raw_vals, domains, word_counts):
+        """[(prob_score, raw_val, classification, confidence)] for raw model scores."""
+        # 3. Calibration
+        # prob_scores = self.calibrator.transform(raw_vals)
+        # Calibration removed per user request; ensure 0-1 bounds just in case
+        prob_scores = np.clip(raw_vals, 0.0, 1.0)
+
+        # 4. Domain-Adaptive Thresholding & Ambiguity
+        thresh = np.array([self.DOMAIN_THRESHOLDS.get(d, 0.50) for d in domains]) # Default to 0.50 neutral
+
+        # Gray Zone Logic (Ambiguity)
+        # Commercial Safety: If it's 0.45-0.55, just say we don't know.
+        gray = (prob_scores > 0.45) & (prob_scores < 0.55)
+        classifications = np.where(
+            gray, "Cannot Determine",
+            np.where(prob_scores >= thresh, "Likely Human", "Likely AI")
+        )
+
+        # 5. Confidence Modeling
+        confidences = self._compute_confidence_batch(prob_scores)
+
+        # 6. Length Override for Confidence
+        confidences = np.where(word_counts < 50, "LOW", confidences)
+        confidences = np.where((word_counts < 100) & (confidences == "HIGH"), "MEDIUM", confidences)
+        return [(float(p), float(r), str(c), str(conf))
+                for p, r, c, conf in zip(prob_scores, raw_vals, classifications, confidences)]
+
+    def _incremental_supported(self, text):
+        return isinstance(self.pipeline, FastPipeline) and IncrementalScorer.supports(text)
+
+    def predict_incremental(self, text, domain=None):
+        """
+        Same result as `predict`, for successive versions of a document being edited:
+        with the fast artifacts only paragraphs not seen before are rescanned (see
+        scripts/api/incremental.py). Other artifact formats use `predict`.
+        """
+        return self._predict_incremental(text, domain)[0]
+
+    def _predict_incremental(self, text, domain):
+        """(`predict_incremental` result, paragraphs served from the incremental cache)."""
+        word_count = len(text.split())
+        if word_count < 20 or not self._incremental_supported(text):
+            return self.predict(text, domain), 0
+        if self.incremental is None:
+            self.incremental = IncrementalScorer(self.pipeline)
+        try:
+            raw, row, reused = self.incremental.score_counted(text)
+            classified = self._classify(np.array([raw]), [domain], np.array([word_count]))[0]
+            return self._build_result(*classified, features_from_row(row), domain), reused
         except Exception as e:
-            return {'error': str(e)}
+            return {'error': str(e)}, 0
+
+    def predict_segments(self, text, domain=None, window=3, stride=1, incremental=False):
+        """
+        `predict` plus per-sentence attribution in result['segments']:
+        every run of `window` consecutive sentences (stepping by `stride`) is scored, and
+        each sentence gets the mean score of the windows covering it. Sentences are
+        flagged AI with the document rule (outside the gray zone, below the domain
+        threshold); their texts are listed in segments['ai_sentences'].
+        incremental: take the document score from `predict_incremental`.
+        """
+        if window < 1 or not 1 <= stride <= window:
+            raise ValueError("window and stride must be >= 1, stride <= window (every sentence in a window)")
+        result = self.predict_incremental(text, domain) if incremental else self.predict(text, domain)
+        return self.add_segments(result, text, domain, window, stride)
+
+    def add_segments(self, result, text, domain=None, window=3, stride=1):
+        """
+        Adds result['segments'] (see `predict_segments`) to the document `result` of
+        `text`, e.g. one item of a `predict_batch` call; returns `result`.
+        """
+        if window < 1 or not 1 <= stride <= window:
+            raise ValueError("window and stride must be >= 1, stride <= window (every sentence in a window)")
+        if 'meta' not in result:
+            return result # too short / not scored: nothing to attribute
+
+        spans = sentence_spans(text)
+        ranges = window_ranges(len(spans), window, stride)
+        if not ranges:
+            raw = np.empty(0)
+        elif isinstance(self.pipeline, FastPipeline) and len(text.lower()) == len(text):
+            # One tokenization, windows scored by sliding counts
+            raw = WindowScorer(self.pipeline).score(text, spans, ranges)
+        else:
+            raw = np.asarray(self.pipeline.predict([text[spans[a][0]:spans[b - 1][1]] for a, b in ranges]),
+                             dtype=np.float64)
+        window_scores = np.clip(raw, 0.0, 1.0)
+
+        # Mean over covering windows, via a difference array over sentence indices
+        totals = np.zeros(len(spans) + 1)
+        covers = np.zeros(len(spans) + 1)
+        for (a, b), score in zip(ranges, window_scores):
+            totals[a] += score
+            totals[b] -= score
+            covers[a] += 1
+            covers[b] -= 1
+        sentence_scores = np.cumsum(totals)[:-1] / np.maximum(np.cumsum(covers)[:-1], 1)
+
+        thresh = self.DOMAIN_THRESHOLDS.get(domain, 0.50)
+        sentences = []
+        ai_sentences = []
+        for (start, end), score in zip(spans, sentence_scores):
+            sentence = text[start:end]
+            sentences.append({'text': sentence, 'start': start, 'end': end, 'human_score': float(score)})
+            if not 0.45 < score < 0.55 and score < thresh:
+                ai_sentences.append(sentence)
+        result['segments'] = {
+            'window': window,
+            'stride': stride,
+            'sentences': sentences,
+            'ai_sentences': ai_sentences
+        }
+        return result
+
+    def _finish_timings(self, results, timer, timings):
+        if timer is None:
+            return results
+        stages = timer.finish()
+        if self.stage_stats is not None:
+            self.stage_stats.observe(stages)
+        if timings:
+            # Added after cache.put, so cached payloads never carry timings
+            for result in results:
+                if 'meta' in result:
+                    result['meta']['timings'] = stages
+        return results
+
+    def _build_result(self, prob_score, raw_val, classification, confidence, feats, domain):
+        return {
+            'human_score': prob_score,
+            'ai_score': 1.0 - prob_score,
+            'classification': classification,
+            'confidence': confidence,
+            'mlDetails': {
+                'perplexity': feats['entropy'] * 10, # Scale up for UI visibility
+                'burstiness': feats['rhythm'] * 10,  # Scale for UI
+                'entropy': feats['entropy'],
+                'symmetry': 100 - (feats['stop_ratio'] * 100), # Inverse stopword? Placeholder
+                'planning': feats['start_var'] / 10, # Normalize
+                'complexitySlope': feats['complex'] * 100,
+                'semanticDrift': feats['ttr'] * 100,
+                'genre': domain or 'general',
+                'accountability': 0,
+                'aiProbability': 1.0 - prob_score,
+                'humanProbability': prob_score,
+                'confidence': confidence,
+                'modelUsed': 'Python (50k)'
+            },
+            'meta': {
+                'version': self.metadata.get('model_version'),
+                'domain_bias': domain,
+                'raw_score': raw_val
+            },
+            'message': self._get_legal_message(classification, confidence)
+        }
 
     def _get_legal_message(self, label, conf):
         if label == "Cannot Determine":
@@ -185,11 +495,196 @@ class CommercialDetector:
         else:
             return f"{prefix} often found in AI-generated content. ({conf} Confidence)"
 
-# CLI Test Interface
+# --- RESIDENT WORKER MODE ---
+# Loading the artifacts dominates the cost of a single request, so the API keeps one
+# process alive and streams requests to it instead of spawning python per call.
+#
+# Framing: one JSON object per line (newlines inside strings are always escaped by JSON).
+#   request:  {"id": 1, "op": "predict", "text": "...", "domain": "esl"}
+#             {"id": 2, "op": "predict_batch", "texts": ["...", ...], "domains": [...] | "esl" | null}
+#             {"id": 3, "op": "stats"}
+#             {"id": 4, "op": "timings", "reset": false}   (per-stage histograms, --stage-timings)
+#             {"id": 5, "op": "metrics", "format": "json" | "prometheus"}   (counters, latency, RSS)
+#             {"id": 6, "op": "health"}   (ready once the model is loaded and warmed up)
+#   "timings": true on predict/predict_batch adds per-stage wall times to result.meta.timings
+#   "segments": true on predict adds per-sentence scores to result.segments
+#             (optional "window" / "stride" in sentences, default 3 / 1)
+#   "incremental": true on predict rescans only paragraphs not seen before (live editor)
+#   With --near-dup, results of edited re-submissions carry meta.near_duplicate
+#             ({"similarity", "mode"}: reused stored result or incremental re-score)
+#   response: {"id": 1, "ok": true, "result": {...}}  |  {"id": 1, "ok": false, "error": "..."}
+# On startup the worker emits {"event": "ready", ...} once the model is loaded.
+
+def _json_default(obj):
+    # numpy scalars/arrays leak into results via metadata and feature dicts
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def to_json(obj):
+    return json.dumps(obj, default=_json_default)
+
+def handle_request(detector, request):
+    """Dispatches one decoded protocol request and returns the response dict."""
+    req_id = request.get('id') if isinstance(request, dict) else None
+    try:
+        if not isinstance(request, dict):
+            raise ValueError('Request must be a JSON object')
+        op = request.get('op', 'predict')
+        if op == 'predict':
+            text = request.get('text')
+            if not isinstance(text, str):
+                raise ValueError("'text' must be a string")
+            if request.get('segments'):
+                result = detector.predict_segments(text, request.get('domain'), window=int(request.get('window', 3)),
+                                                   stride=int(request.get('stride', 1)),
+                                                   incremental=bool(request.get('incremental')))
+            elif request.get('incremental'):
+                result = detector.predict_incremental(text, request.get('domain'))
+            else:
+                result = detector.predict(text, request.get('domain'), timings=bool(request.get('timings')))
+        elif op == 'predict_batch':
+            texts = request.get('texts')
+            if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                raise ValueError("'texts' must be a list of strings")
+            result = detector.predict_batch(texts, request.get('domains'), timings=bool(request.get('timings')))
+        elif op == 'ping':
+            result = {'pong': True}
+        elif op == 'stats':
+            result = {
+                'cache': detector.cache.stats() if detector.cache is not None else None,
+                'near_duplicates': detector.near_duplicates.stats() if detector.near_duplicates is not None else None,
+                'incremental': detector.incremental.stats() if detector.incremental is not None else None
+            }
+        elif op == 'timings':
+            if detector.stage_stats is None:
+                raise ValueError('Stage timing is disabled (start the worker with --stage-timings)')
+            result = detector.stage_stats.snapshot()
+            if request.get('reset'):
+                detector.stage_stats.reset()
+        elif op in ('metrics', 'health'):
+            if detector.metrics is None:
+                raise ValueError('Metrics are disabled in this process')
+            if op == 'health':
+                result = detector.metrics.health(detector)
+            elif request.get('format', 'json') == 'prometheus':
+                result = {'text': prometheus_text(detector.metrics.snapshot(detector))}
+            else:
+                result = detector.metrics.snapshot(detector)
+        else:
+            raise ValueError(f"Unknown op: {op}")
+        return {'id': req_id, 'ok': True, 'result': result}
+    except Exception as e:
+        return {'id': req_id, 'ok': False, 'error': str(e)}
+
+def _handle_line(detector, line):
+    start = time.perf_counter()
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        request = None
+        response = {'id': None, 'ok': False, 'error': f"Invalid JSON: {e}"}
+    else:
+        response = handle_request(detector, request)
+    if detector.metrics is not None:
+        detector.metrics.observe(request, response, time.perf_counter() - start)
+    return response
+
+def _ready_event(detector):
+    metrics = detector.metrics
+    return {
+        'event': 'ready',
+        'loaded': detector.pipeline is not None,
+        'format': detector.artifact_format,
+        'version': (detector.metadata or {}).get('model_version'),
+        'warmup': metrics.warmup if metrics is not None else None,
+        'pid': os.getpid()
+    }
+
+def serve_stdio(detector):
+    """Serves newline-delimited JSON requests on stdin/stdout until EOF."""
+    out = sys.stdout
+    # Anything else that prints (warnings, load errors) must not corrupt the protocol stream
+    sys.stdout = sys.stderr
+    out.write(to_json(_ready_event(detector)) + '\n')
+    out.flush()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        out.write(to_json(_handle_line(detector, line)) + '\n')
+        out.flush()
+
+def serve_unix_socket(detector, socket_path):
+    """Serves the same line protocol on a Unix domain socket (one thread per connection)."""
+    import socketserver
+    import threading
+
+    lock = threading.Lock()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            self.wfile.write((to_json(_ready_event(detector)) + '\n').encode('utf-8'))
+            for raw in self.rfile:
+                line = raw.decode('utf-8')
+                if not line.strip():
+                    continue
+                with lock:
+                    response = _handle_line(detector, line)
+                self.wfile.write((to_json(response) + '\n').encode('utf-8'))
+                self.wfile.flush()
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+        print(f"Detector worker listening on {socket_path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(socket_path)
+
+# CLI Interface
 if __name__ == "__main__":
-    detector = CommercialDetector()
-    if len(sys.argv) > 1:
-        text = sys.argv[1]
-        print(detector.predict(text))
+    import argparse
+
+    parser = argparse.ArgumentParser(description='AI Detector inference')
+    parser.add_argument('text', nargs='?', help='Text to score (one-shot mode)')
+    parser.add_argument('--domain', default=None, help="Domain hint: 'esl', 'academic', 'general'")
+    parser.add_argument('--worker', action='store_true', help='Serve JSON lines on stdin/stdout')
+    parser.add_argument('--socket', default=None, help='Serve JSON lines on this Unix socket path')
+    parser.add_argument('--artifacts', default='scripts/artifacts', help='Artifacts directory')
+    parser.add_argument('--format', default='auto', choices=['auto', 'fast', 'joblib'], help='Artifact format to load')
+    parser.add_argument('--cache-size', type=int, default=2048, help='Worker in-memory result cache entries (0 disables)')
+    parser.add_argument('--cache-db', default=None, help='Optional SQLite file for a persistent result cache')
+    parser.add_argument('--cache-db-mb', type=int, default=64, help='Size budget of the persistent cache')
+    parser.add_argument('--stage-timings', action='store_true', help='Aggregate per-stage latency histograms in the worker')
+    parser.add_argument('--near-dup', type=float, default=None, metavar='THRESHOLD',
+                        help='Serve edited re-submissions at >= THRESHOLD Jaccard similarity via the near-duplicate index')
+    parser.add_argument('--near-dup-mode', default='reuse', choices=['reuse', 'incremental'],
+                        help='Near-duplicates: return the stored result, or re-score incrementally')
+    parser.add_argument('--near-dup-size', type=int, default=4096, help='Texts kept in the near-duplicate index')
+    parser.add_argument('--warmup', type=int, default=4, help='Warm-up texts from data/ scored before serving (0 skips)')
+    parser.add_argument('--timings', action='store_true', help='One-shot mode: include per-stage timings in meta')
+    args = parser.parse_args()
+
+    if args.worker or args.socket:
+        cache = None
+        if args.cache_size > 0 or args.cache_db:
+            cache = ResultCache(max_entries=args.cache_size, db_path=args.cache_db,
+                                max_db_bytes=args.cache_db_mb * 1024 * 1024)
+        stage_stats = StageHistograms() if args.stage_timings else None
+        near_duplicates = NearDuplicateIndex(args.near_dup, args.near_dup_size, args.near_dup_mode) if args.near_dup else None
+        detector = CommercialDetector(artifacts_dir=args.artifacts, cache=cache, artifact_format=args.format,
+                                      stage_stats=stage_stats, metrics=ServiceMetrics(),
+                                      near_duplicates=near_duplicates)
+        detector.metrics.warm_up(detector, warmup_texts(n_texts=args.warmup))
+        if args.socket:
+            serve_unix_socket(detector, args.socket)
+        else:
+            serve_stdio(detector)
+    elif args.text is not None:
+        detector = CommercialDetector(artifacts_dir=args.artifacts, artifact_format=args.format)
+        print(to_json(detector.predict(args.text, args.domain, timings=args.timings)))
     else:
-        print("Usage: python3 predict.py 'Your text here'")
+        print("Usage: python3 predict.py 'Your text here'  |  --worker  |  --socket PATH")
@@ -0,0 +1,259 @@
+import bisect
+import re
+
+import numpy as np
+
+from scripts.features.ngrams import DEFAULT_TOKEN_PATTERN
+from scripts.features.stylometry_core import (
+    DEFAULT_FEATURES, FEATURE_NAMES, STOPWORDS, _ADVERB_RE, _NONSPACE_RE,
+    _PASSIVE_RE, _SENTENCE_SPLIT_RE, _WORD_RE, _chunk_stats
+)
+
+# Sentence-window scoring
+# -----------------------
+# Scores overlapping windows of `window` consecutive sentences without rescoring each
+# window from scratch. The document is tokenized once; every sentence window is a
+# contiguous character span, so its n-grams are exactly the document n-grams lying
+# inside the span:
+#   - TF-IDF branches: the column of every n-gram is looked up once per document
+#     position; as the window slides, the n-grams leaving / entering it update a
+#     shared count vector and the running sums  sum(tf' * weights)  and
+#     sum((tf' * idf)^2)  the branch score needs (see artifact_store.FastPipeline)
+#   - stylometry: per-sentence counts with prefix sums give every window's counts and
+#     sentence-length moments in O(1); only the 50-word chunk statistics are taken
+#     over the window's own words
+# Sentences are the pieces of the stylometry sentence split ([.!?]+), so the window
+# features match scoring the window text on its own.
+
+
+def sentence_spans(text):
+    """
+    (start, end) of every sentence kept by the stylometry split: start is the first
+    non-space character, end includes the terminating punctuation. The split does not
+    depend on case, so the spans of `text` are those of `text.lower()`.
+    """
+    spans = []
+    pos = 0
+    bounds = [(m.start(), m.end()) for m in _SENTENCE_SPLIT_RE.finditer(text)]
+    bounds.append((len(text), len(text)))
+    for piece_end, sep_end in bounds:
+        piece = text[pos:piece_end]
+        if piece and not piece.isspace():
+            first = _NONSPACE_RE.search(piece)
+            spans.append((pos + first.start(), sep_end))
+        pos = sep_end
+    return spans
+
+
+def window_ranges(n_sentences, window, stride):
+    """[(first, last + 1)] sentence ranges; the last window always ends at the last sentence."""
+    if n_sentences <= window:
+        return [(0, n_sentences)] if n_sentences else []
+    ranges = [(i, i + window) for i in range(0, n_sentences - window + 1, stride)]
+    if ranges[-1][1] != n_sentences:
+        ranges.append((n_sentences - window, n_sentences))
+    return ranges
+
+
+class _SlidingCounts:
+    """N-gram counts of the current window plus the two running sums of a TF-IDF branch."""
+    def __init__(self, branch):
+        self.weights = np.asarray(branch.weights)
+        self.idf_sq = np.asarray(branch.idf) ** 2
+        self.sublinear_tf = branch.sublinear_tf
+        self.counts = np.zeros(branch.n_features, dtype=np.int64)
+        self.dot = 0.0
+        self.sq = 0.0
+
+    def _tf(self, counts):
+        tf = counts.astype(np.float64)
+        if self.sublinear_tf:
+            nz = counts > 0
+            tf[nz] = 1.0 + np.log(tf[nz])
+        return tf
+
+    def update(self, added, removed):
+        if not len(added) and not len(removed):
+            return
+        cols, inverse = np.unique(np.concatenate([added, removed]), return_inverse=True)
+        delta = np.bincount(inverse, weights=np.concatenate([np.ones(len(added)), -np.ones(len(removed))]),
+                            minlength=len(cols)).astype(np.int64)
+        old = self.counts[cols]
+        new = old + delta
+        tf_old = self._tf(old)
+        tf_new = self._tf(new)
+        self.dot += float(self.weights[cols] @ (tf_new - tf_old))
+        self.sq += float(self.idf_sq[cols] @ (tf_new * tf_new - tf_old * tf_old))
+        self.counts[cols] = new
+
+    def score(self):
+        return self.dot / np.sqrt(self.sq) if self.sq > 1e-300 else 0.0
+
+
+def _ngram_columns(grams_by_start, vocabulary, n_positions, ngram_range):
+    """{n: int64 array of the column of the n-gram starting at each position (-1 = OOV)}."""
+    get = vocabulary.get
+    columns = {}
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        columns[n] = np.fromiter((get(g, -1) for g in grams_by_start(n)), dtype=np.int64,
+                                 count=max(n_positions - n + 1, 0))
+    return columns
+
+
+def _slide(counts, columns, old, new):
+    """Moves a window of positions [a, b) from `old` to `new` (both ends non-decreasing)."""
+    added = []
+    removed = []
+    for n, cols in columns.items():
+        # n-grams of size n inside [a, b) start at [a, b - n + 1)
+        a1, b1 = old[0], max(old[1] - n + 1, old[0])
+        a2, b2 = new[0], max(new[1] - n + 1, new[0])
+        removed.append(cols[a1:min(a2, b1)])
+        added.append(cols[max(b1, a2):b2])
+    added = np.concatenate(added)
+    removed = np.concatenate(removed)
+    counts.update(added[added >= 0], removed[removed >= 0])
+
+
+class WindowScorer:
+    """Window scores of one document against a FastPipeline's compiled scoring table."""
+    def __init__(self, fast_pipeline):
+        self.fast = fast_pipeline
+
+    def score(self, text, spans, ranges):
+        """
+        Raw model score of every window (first, last + 1) of the sentence `spans`.
+        Requires len(text.lower()) == len(text); agrees with scoring each window text on
+        its own up to the rounding of the running sums (~1e-7).
+        """
+        lower = text.lower()
+        bounds = [(spans[a][0], spans[b - 1][1]) for a, b in ranges]
+        scores = np.full(len(ranges), self.fast.intercept, dtype=np.float64)
+        for branch in self.fast.branches:
+            if hasattr(branch, 'vocabulary'):
+                if branch.spec['analyzer'] == 'char':
+                    scores += self._char_branch(branch, lower if branch.spec['lowercase'] else text, bounds)
+                else:
+                    scores += self._word_branch(branch, lower if branch.spec['lowercase'] else text, bounds)
+            else:
+                scores += branch.decision_features(self._stylometry_rows(lower, spans, ranges))
+        return scores
+
+    # --- TF-IDF branches ---
+    def _word_branch(self, branch, source, bounds):
+        spec = branch.spec
+        stop_words = frozenset(spec['stop_words'] or ())
+        tokens = []
+        starts = []
+        for m in re.finditer(spec['token_pattern'] or DEFAULT_TOKEN_PATTERN, source):
+            token = m.group()
+            if token not in stop_words:
+                tokens.append(token)
+                starts.append(m.start())
+
+        space_join = ' '.join
+        columns = _ngram_columns(
+            lambda n: (space_join(tokens[k:k + n]) for k in range(len(tokens) - n + 1)),
+            branch.vocabulary, len(tokens), spec['ngram_range']
+        )
+        # Window token range: tokens never straddle a sentence boundary
+        token_bounds = [(bisect.bisect_left(starts, s), bisect.bisect_left(starts, e)) for s, e in bounds]
+        return self._slide_all(branch, columns, token_bounds)
+
+    def _char_branch(self, branch, source, bounds):
+        # Whitespace runs collapse as in the char analyzer; window boundaries never fall
+        # inside a run, so positions map through the cumulative shrinkage before them
+        run_ends = []
+        shrink = []
+        total = 0
+        for m in re.finditer(r'\s\s+', source):
+            total += m.end() - m.start() - 1
+            run_ends.append(m.end())
+            shrink.append(total)
+        normalized = re.sub(r'\s\s+', ' ', source)
+
+        def to_normalized(p):
+            i = bisect.bisect_right(run_ends, p)
+            return p - (shrink[i - 1] if i else 0)
+
+        columns = _ngram_columns(
+            lambda n: (normalized[p:p + n] for p in range(len(normalized) - n + 1)),
+            branch.vocabulary, len(normalized), branch.spec['ngram_range']
+        )
+        char_bounds = [(to_normalized(s), to_normalized(e)) for s, e in bounds]
+        return self._slide_all(branch, columns, char_bounds)
+
+    @staticmethod
+    def _slide_all(branch, columns, position_bounds):
+        counts = _SlidingCounts(branch)
+        out = np.empty(len(position_bounds))
+        current = (0, 0)
+        for j, bound in enumerate(position_bounds):
+            _slide(counts, columns, current, bound)
+            current = bound
+            out[j] = counts.score()
+        return out
+
+    # --- stylometry ---
+    @staticmethod
+    def _stylometry_rows(lower, spans, ranges):
+        words = []
+        word_ends = []
+        sent_lens = []
+        first_lens = []
+        per_sentence = []  # stop, complex, adverbs, em_dash, struct_punct, passive
+        for start, end in spans:
+            sentence = lower[start:end]
+            sent_words = _WORD_RE.findall(sentence)
+            words += sent_words
+            word_ends.append(len(words))
+            sent_lens.append(len(sent_words))
+            # First token of the sentence itself, without the terminating punctuation
+            first_lens.append(len(_SENTENCE_SPLIT_RE.split(_NONSPACE_RE.match(sentence).group(), 1)[0]))
+            per_sentence.append((
+                sum(map(STOPWORDS.__contains__, sent_words)),
+                sum([len(w) > 6 for w in sent_words]),
+                len(_ADVERB_RE.findall(sentence)),
+                sentence.count('—') + sentence.count('--'),
+                sentence.count(';') + sentence.count(':'),
+                len(_PASSIVE_RE.findall(sentence))
+            ))
+
+        # Prefix sums over sentences
+        def prefix(values):
+            values = np.asarray(values, dtype=np.float64)
+            return np.concatenate((np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)))
+        P_words = prefix(sent_lens)
+        P_len_sq = prefix(np.square(sent_lens, dtype=np.float64))
+        P_first = prefix(first_lens)
+        P_first_sq = prefix(np.square(first_lens, dtype=np.float64))
+        P_counts = prefix(per_sentence) if per_sentence else np.zeros((1, 6))
+        word_starts = [0] + word_ends
+
+        default_row = [DEFAULT_FEATURES[name] for name in FEATURE_NAMES]
+        rows = np.empty((len(ranges), len(FEATURE_NAMES)))
+        for j, (a, b) in enumerate(ranges):
+            n_words = P_words[b] - P_words[a]
+            if n_words < 5:
+                rows[j] = default_row
+                continue
+            n_sentences = b - a
+            mean_len = n_words / n_sentences
+            len_var = max((P_len_sq[b] - P_len_sq[a]) / n_sentences - mean_len * mean_len, 0.0)
+            mean_first = (P_first[b] - P_first[a]) / n_sentences
+            first_var = max((P_first_sq[b] - P_first_sq[a]) / n_sentences - mean_first * mean_first, 0.0)
+            n_stop, n_complex, n_adverbs, n_em_dash, n_struct, n_passive = P_counts[b] - P_counts[a]
+            chunk_entropies, ttrs = _chunk_stats(words[word_starts[a]:word_starts[b]])
+            rows[j] = (
+                np.log1p(len_var),
+                n_stop / n_words,
+                np.var(chunk_entropies),
+                np.mean(ttrs),
+                first_var,
+                np.log1p(n_em_dash),
+                n_struct / (n_words + 1.0),
+                n_passive / (n_sentences + 1.0),
+                n_adverbs / (n_words + 1.0),
+                n_complex / (n_words + 1.0)
+            )
+        return rows
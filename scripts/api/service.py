@@ -0,0 +1,389 @@
+import abc
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Add standard import path for shared modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from scripts.api.cache import ResultCache
+from scripts.api.metrics import ServiceMetrics, prometheus_text, warmup_texts
+from scripts.api.near_duplicate import NearDuplicateIndex
+from scripts.api.predict import CommercialDetector, _ready_event, handle_request, to_json
+from scripts.api.timing import StageHistograms
+
+# Asyncio scoring service with dynamic micro-batching
+# ---------------------------------------------------
+# Speaks the worker's line protocol (see predict.py) on stdin/stdout, a Unix socket or
+# TCP, but keeps every connection's requests in flight concurrently. Single-text
+# `predict` requests go through a MicroBatcher: the first queued request opens a
+# batch, which collects further requests for up to max_wait_ms or max_batch_size
+# items and is then scored with one `predict_batch` call. Requests asking for
+# `segments` (the API route always does) share that document-level call; their sentence
+# windows are scored afterwards, one request at a time, and each response is sent as
+# soon as it is complete. Everything else (batches, incremental re-checks, which
+# depend on the paragraph cache of one document, stats) is passed to `handle_request`.
+#
+# All detector calls run on one scoring thread, so the event loop keeps accepting and
+# queueing requests while a batch is scored, and the next batch picks them up.
+#
+# With --metrics-port, a minimal HTTP listener serves GET /metrics (Prometheus text),
+# /metrics.json and /healthz (200 once the model is loaded and warmed up, else 503).
+
+STREAM_LIMIT = 64 * 1024 * 1024 # longest request line accepted (bytes)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent `predict` calls into `predict_batch` calls.
+    max_batch_size: most requests scored together
+    max_wait_ms: longest a request waits for the batch to fill
+    """
+    def __init__(self, detector, executor, max_batch_size=32, max_wait_ms=5.0):
+        self.detector = detector
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.latency = StageHistograms() # 'queue_wait' and 'segments' per request, 'score' per batch
+        self.batch_sizes = Counter()
+        self.requests = 0
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def predict(self, text, domain=None, segments=None, timings=False):
+        """
+        Result of `detector.predict(text, domain, timings)`, or with segments=(window,
+        stride) of `detector.predict_segments(text, domain, window, stride)`.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, domain, segments, timings, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            start = time.perf_counter()
+            for *_, queued in batch:
+                self.latency.observe({'queue_wait': {'ms': (start - queued) * 1000.0, 'size': 1}})
+            self.batch_sizes[len(batch)] += 1
+            self.requests += len(batch)
+            if self.detector.metrics is not None:
+                self.detector.metrics.observe_batch(len(batch))
+
+            texts = [item[0] for item in batch]
+            domains = [item[1] for item in batch]
+            timings = any(item[3] for item in batch)
+            try:
+                results = await loop.run_in_executor(self.executor, self.detector.predict_batch, texts, domains,
+                                                     timings)
+            except Exception as e:
+                for *_, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.latency.observe({'score': {'ms': (time.perf_counter() - start) * 1000.0, 'size': len(batch)}})
+            for (text, domain, segments, timed, future, _), result in zip(batch, results):
+                if future.done(): # the caller may have gone away
+                    continue
+                if timings and not timed and 'meta' in result:
+                    del result['meta']['timings']
+                if segments is not None:
+                    segments_start = time.perf_counter()
+                    try:
+                        result = await loop.run_in_executor(self.executor, self.detector.add_segments, result, text,
+                                                            domain, *segments)
+                    except Exception as e:
+                        future.set_exception(e)
+                        continue
+                    self.latency.observe({'segments': {'ms': (time.perf_counter() - segments_start) * 1000.0,
+                                                       'size': 1}})
+                if not future.done():
+                    future.set_result(result)
+
+    @property
+    def queued(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self):
+        batches = sum(self.batch_sizes.values())
+        return {
+            'requests': self.requests,
+            'batches': batches,
+            'mean_batch_size': self.requests / batches if batches else None,
+            'batch_sizes': {str(size): n for size, n in sorted(self.batch_sizes.items())},
+            'queued': self.queued,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'latency': self.latency.snapshot()
+        }
+
+
+class LineServer(abc.ABC):
+    """
+    Line-protocol front end: every request line becomes a task, so a connection's
+    requests are in flight concurrently. Subclasses provide `handle` and, optionally,
+    `start` / `stop`.
+    """
+    # Per connection: reading pauses while this many requests are pending (None = no limit)
+    max_in_flight = None
+
+    def __init__(self, detector):
+        self.detector = detector
+        self.in_flight = 0
+        if detector.metrics is not None:
+            detector.metrics.add_gauge('requests_in_flight', lambda: self.in_flight)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abc.abstractmethod
+    async def handle(self, request):
+        """Response dict for one decoded request."""
+
+    async def metrics_snapshot(self):
+        return self.detector.metrics.snapshot(self.detector)
+
+    async def _respond(self, line, write):
+        start = time.perf_counter()
+        self.in_flight += 1
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                request = None
+                response = {'id': None, 'ok': False, 'error': f"Invalid JSON: {e}"}
+            else:
+                response = await self.handle(request)
+        finally:
+            self.in_flight -= 1
+        if self.detector.metrics is not None:
+            self.detector.metrics.observe(request, response, time.perf_counter() - start)
+        await write(to_json(response) + '\n')
+
+    async def serve_stream(self, reader, write):
+        """Reads request lines until EOF; responses are written as they complete (match by id)."""
+        await write(to_json(_ready_event(self.detector)) + '\n')
+        pending = set()
+        slots = asyncio.Semaphore(self.max_in_flight) if self.max_in_flight else None
+        while True:
+            raw = await reader.readline()
+            if not raw:
+                break
+            line = raw.decode('utf-8')
+            if not line.strip():
+                continue
+            if slots is not None:
+                await slots.acquire()
+            task = asyncio.get_running_loop().create_task(self._respond(line, write))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            if slots is not None:
+                task.add_done_callback(lambda _: slots.release())
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _serve_connection(self, reader, writer):
+        async def write(text):
+            writer.write(text.encode('utf-8'))
+            await writer.drain()
+        try:
+            await self.serve_stream(reader, write)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_stdio(self):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=STREAM_LIMIT)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        out = sys.stdout
+        # Anything else that prints (warnings, load errors) must not corrupt the protocol stream
+        sys.stdout = sys.stderr
+
+        async def write(text):
+            out.write(text)
+            out.flush()
+        await self.serve_stream(reader, write)
+
+    async def _http_response(self, path):
+        metrics = self.detector.metrics
+        if metrics is None:
+            return 404, 'text/plain', 'Metrics are disabled\n'
+        if path == '/healthz':
+            health = metrics.health(self.detector)
+            return (200 if health['ready'] else 503), 'application/json', to_json(health)
+        if path == '/metrics':
+            return 200, 'text/plain; version=0.0.4', prometheus_text(await self.metrics_snapshot())
+        if path == '/metrics.json':
+            return 200, 'application/json', to_json(await self.metrics_snapshot())
+        return 404, 'text/plain', 'Not found\n'
+
+    async def _serve_http(self, reader, writer):
+        # One GET per connection; headers are read and ignored
+        try:
+            parts = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            path = parts[1].split('?')[0] if len(parts) > 1 else '/'
+            status, content_type, body = await self._http_response(path)
+            body = body.encode('utf-8')
+            writer.write((f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                          f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                          "Connection: close\r\n\r\n").encode('latin-1') + body)
+            await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def run(self, socket_path=None, host=None, port=None, metrics_port=None):
+        """
+        Serves stdin/stdout, or `socket_path`, or host:port until cancelled; metrics_port
+        adds the HTTP metrics / health listener on host.
+        """
+        await self.start()
+        metrics_server = None
+        try:
+            if metrics_port is not None:
+                metrics_server = await asyncio.start_server(self._serve_http, host, metrics_port)
+                print(f"Metrics on http://{host}:{metrics_port}/metrics", file=sys.stderr)
+            if socket_path is None and port is None:
+                await self.serve_stdio()
+                return
+            if socket_path is not None:
+                if os.path.exists(socket_path):
+                    os.unlink(socket_path)
+                server = await asyncio.start_unix_server(self._serve_connection, socket_path, limit=STREAM_LIMIT)
+                where = socket_path
+            else:
+                server = await asyncio.start_server(self._serve_connection, host, port, limit=STREAM_LIMIT)
+                where = f"{host}:{port}"
+            print(f"Scoring service listening on {where}", file=sys.stderr)
+            async with server:
+                await server.serve_forever()
+        finally:
+            if metrics_server is not None:
+                metrics_server.close()
+            await self.stop()
+            if socket_path is not None and os.path.exists(socket_path):
+                os.unlink(socket_path)
+
+
+class ScoringService(LineServer):
+    """Serves one in-process detector; single-text predicts are micro-batched."""
+    def __init__(self, detector, max_batch_size=32, max_wait_ms=5.0):
+        super().__init__(detector)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scoring')
+        self.batcher = MicroBatcher(detector, self.executor, max_batch_size, max_wait_ms)
+        if detector.metrics is not None:
+            detector.metrics.add_gauge('queue_depth', lambda: self.batcher.queued)
+
+    async def start(self):
+        self.batcher.start()
+
+    async def stop(self):
+        await self.batcher.stop()
+        self.executor.shutdown(wait=False)
+
+    @staticmethod
+    def _batchable(request):
+        return (request.get('op', 'predict') == 'predict' and isinstance(request.get('text'), str)
+                and not request.get('incremental'))
+
+    async def handle(self, request):
+        """Response dict for one decoded request (same shapes as `handle_request`)."""
+        if isinstance(request, dict) and self._batchable(request):
+            try:
+                segments = None
+                if request.get('segments'):
+                    segments = (int(request.get('window', 3)), int(request.get('stride', 1)))
+                result = await self.batcher.predict(request['text'], request.get('domain'), segments,
+                                                    bool(request.get('timings')))
+            except Exception as e:
+                return {'id': request.get('id'), 'ok': False, 'error': str(e)}
+            return {'id': request.get('id'), 'ok': True, 'result': result}
+
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(self.executor, handle_request, self.detector, request)
+        if response['ok'] and request.get('op') == 'stats':
+            response['result']['batching'] = self.batcher.stats()
+        return response
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Micro-batching detector service (worker line protocol)')
+    parser.add_argument('--socket', default=None, help='Serve on this Unix socket path (default: stdin/stdout)')
+    parser.add_argument('--host', default='127.0.0.1', help='TCP host (with --port)')
+    parser.add_argument('--port', type=int, default=None, help='Serve on this TCP port')
+    parser.add_argument('--max-batch-size', type=int, default=32, help='Most requests scored in one batch')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0, help='Longest a request waits for its batch to fill')
+    parser.add_argument('--artifacts', default='scripts/artifacts', help='Artifacts directory')
+    parser.add_argument('--format', default='auto', choices=['auto', 'fast', 'joblib'], help='Artifact format to load')
+    parser.add_argument('--cache-size', type=int, default=2048, help='In-memory result cache entries (0 disables)')
+    parser.add_argument('--cache-db', default=None, help='Optional SQLite file for a persistent result cache')
+    parser.add_argument('--cache-db-mb', type=int, default=64, help='Size budget of the persistent cache')
+    parser.add_argument('--stage-timings', action='store_true', help='Aggregate per-stage latency histograms')
+    parser.add_argument('--near-dup', type=float, default=None, metavar='THRESHOLD',
+                        help='Serve edited re-submissions at >= THRESHOLD Jaccard similarity via the near-duplicate index')
+    parser.add_argument('--near-dup-mode', default='reuse', choices=['reuse', 'incremental'],
+                        help='Near-duplicates: return the stored result, or re-score incrementally')
+    parser.add_argument('--near-dup-size', type=int, default=4096, help='Texts kept in the near-duplicate index')
+    parser.add_argument('--warmup', type=int, default=4, help='Warm-up texts from data/ scored before serving (0 skips)')
+    parser.add_argument('--metrics-port', type=int, default=None, help='Serve /metrics and /healthz over HTTP on host:PORT')
+    args = parser.parse_args()
+
+    if args.max_batch_size < 1 or args.max_wait_ms < 0:
+        parser.error('--max-batch-size must be >= 1 and --max-wait-ms >= 0')
+    cache = None
+    if args.cache_size > 0 or args.cache_db:
+        cache = ResultCache(max_entries=args.cache_size, db_path=args.cache_db, max_db_bytes=args.cache_db_mb * 1024 * 1024)
+    near_duplicates = NearDuplicateIndex(args.near_dup, args.near_dup_size, args.near_dup_mode) if args.near_dup else None
+    detector = CommercialDetector(artifacts_dir=args.artifacts, cache=cache, artifact_format=args.format,
+                                  stage_stats=StageHistograms() if args.stage_timings else None,
+                                  metrics=ServiceMetrics(), near_duplicates=near_duplicates)
+    detector.metrics.warm_up(detector, warmup_texts(n_texts=args.warmup))
+    service = ScoringService(detector, args.max_batch_size, args.max_wait_ms)
+    try:
+        asyncio.run(service.run(args.socket, args.host, args.port, args.metrics_port))
+    except KeyboardInterrupt:
+        pass
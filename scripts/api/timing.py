@@ -0,0 +1,90 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Per-stage wall time of a detector call.
+#
+# Instrumentation is opt-in: the detector only creates a StageTimer when a caller asks
+# for timings or a StageHistograms aggregate is attached, and every instrumented stage
+# is guarded by `if timer is None`, so the disabled path costs one comparison per stage.
+
+# Upper bounds (ms) of the histogram buckets; the last bucket is open-ended
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class StageTimer:
+    """Collects {stage: {'ms': wall time, 'size': input size}} for one call."""
+    def __init__(self):
+        self.stages = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, size=None):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0, size)
+
+    def add(self, name, seconds, size=None):
+        entry = self.stages.setdefault(name, {'ms': 0.0, 'size': 0})
+        entry['ms'] += seconds * 1000.0
+        if size is not None:
+            entry['size'] += size
+
+    def finish(self):
+        self.stages['total'] = {'ms': (time.perf_counter() - self._start) * 1000.0, 'size': None}
+        return self.stages
+
+
+class StageHistograms:
+    """
+    Thread-safe aggregate of StageTimer results: per stage count, sum, max and a
+    fixed-bucket latency histogram (BUCKETS_MS), as the worker's `timings` op reports.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def observe(self, stages):
+        with self._lock:
+            for name, entry in stages.items():
+                agg = self._stages.get(name)
+                if agg is None:
+                    agg = self._stages[name] = {
+                        'count': 0, 'sum_ms': 0.0, 'max_ms': 0.0, 'size': 0,
+                        'buckets': [0] * (len(BUCKETS_MS) + 1)
+                    }
+                ms = entry['ms']
+                agg['count'] += 1
+                agg['sum_ms'] += ms
+                agg['max_ms'] = max(agg['max_ms'], ms)
+                agg['size'] += entry['size'] or 0
+                agg['buckets'][_bucket(ms)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            out = {}
+            for name, agg in self._stages.items():
+                out[name] = {
+                    'count': agg['count'],
+                    'mean_ms': agg['sum_ms'] / agg['count'],
+                    'max_ms': agg['max_ms'],
+                    'size': agg['size'],
+                    'buckets_ms': {
+                        (f"le_{bound}" if i < len(BUCKETS_MS) else 'inf'): n
+                        for i, (bound, n) in enumerate(zip(BUCKETS_MS + (None,), agg['buckets']))
+                    }
+                }
+            return {'bucket_bounds_ms': list(BUCKETS_MS), 'stages': out}
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+
+def _bucket(ms):
+    for i, bound in enumerate(BUCKETS_MS):
+        if ms <= bound:
+            return i
+    return len(BUCKETS_MS)
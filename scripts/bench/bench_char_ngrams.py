@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+# Character n-gram featurizer benchmark and equivalence check.
+#
+#   reference  count_vocab(char_ngrams(...)): one Python string per n-gram
+#   vectorized CharNgramCounter: packed integer keys over one code point array
+#
+# The char TF-IDF vectorizer comes from model.joblib (--artifacts) or, with --fit, is
+# fitted on the bundled corpora with the training parameters. Before timing, the
+# vectorized counts of every input (plus edge cases: empty, short, whitespace runs,
+# characters outside the vocabulary) must equal CountVectorizer.transform's, and the
+# TF-IDF rows built from them must match TfidfVectorizer.transform; the run aborts
+# otherwise.
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from scripts.bench.bench_detector import summarize, time_calls
+from scripts.bench.corpus import DEFAULT_SIZES, REPO_ROOT, build_inputs
+from scripts.features.char_ngrams import CharNgramCounter
+from scripts.features.ngrams import build_analyzer, count_vocab
+
+EDGE_CASES = [
+    '', 'a', 'ab', 'abc', '   ', 'the\n\n\n  the\t\tthe',
+    'ÀBÇ déf — naïve façade', 'İstanbul ǅ ß ﬁ', 'emoji \U0001F600 in the text', 'x' * 200
+]
+# Largest |vectorized - sklearn| TF-IDF value accepted (both sum the same terms)
+TFIDF_TOL = 1e-12
+
+
+def load_vectorizer(artifacts, fit):
+    import joblib
+    if not fit:
+        pipeline = joblib.load(os.path.join(artifacts, 'model.joblib'))
+        return dict(pipeline.named_steps['features'].transformer_list)['char_tfidf']
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    texts = [t for texts in build_inputs([200], per_size=200).values() for t in texts]
+    return TfidfVectorizer(analyzer='char', ngram_range=(3, 5), min_df=5, max_features=6000,
+                           sublinear_tf=True).fit(texts)
+
+
+def check_equivalence(vec, counter, texts):
+    """Raises AssertionError unless the counter reproduces the vectorizer on `texts`."""
+    from scipy import sparse
+    from sklearn.feature_extraction.text import CountVectorizer
+    expected = CountVectorizer.transform(vec, texts).tocsr()
+    expected.sort_indices()
+    rows, cols, data = [], [], []
+    for i, text in enumerate(texts):
+        c, n = counter.count_arrays(text)
+        rows.append(np.full(len(c), i))
+        cols.append(c)
+        data.append(n)
+    counts = sparse.csr_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+                               shape=expected.shape)
+    assert (counts != expected).nnz == 0, 'n-gram counts differ from CountVectorizer.transform'
+
+    tfidf = vec._tfidf.transform(counts.astype(np.float64))
+    diff = abs(tfidf - vec.transform(texts)).max() if len(texts) else 0.0
+    assert diff <= TFIDF_TOL, f"TF-IDF differs from TfidfVectorizer.transform by {diff:.3g}"
+    return float(diff)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Char n-gram featurizer benchmark (reference vs vectorized)')
+    parser.add_argument('--artifacts', default=os.path.join(REPO_ROOT, 'scripts', 'artifacts'))
+    parser.add_argument('--fit', action='store_true', help='Fit a char vectorizer on the corpora instead of loading one')
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES, help='Input lengths in words')
+    parser.add_argument('--per-size', type=int, default=5, help='Distinct texts per label and size')
+    parser.add_argument('--repeats', type=int, default=3, help='Minimum passes over the inputs')
+    parser.add_argument('--min-time', type=float, default=0.5, help='Minimum seconds per measurement')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write results JSON here')
+    args = parser.parse_args()
+
+    vec = load_vectorizer(args.artifacts, args.fit)
+    params = vec.get_params()
+    counter = CharNgramCounter.build(vec.vocabulary_, params['ngram_range'], params['lowercase'])
+    if counter is None:
+        sys.exit("Vocabulary alphabet too wide for 64-bit keys; the reference analyzer stays in use")
+    analyze = build_analyzer('char', params['ngram_range'], params['lowercase'])
+    vocabulary = vec.vocabulary_
+
+    inputs = build_inputs(args.sizes, args.per_size, seed=args.seed)
+    all_texts = [t for texts in inputs.values() for t in texts]
+    diff = check_equivalence(vec, counter, all_texts + EDGE_CASES)
+    print(f"Equivalence: {len(all_texts) + len(EDGE_CASES)} texts, counts identical,"
+          f" max TF-IDF diff {diff:.3g}", file=sys.stderr)
+
+    results = []
+    for (label, n_words), texts in sorted(inputs.items(), key=lambda kv: (kv[0][1], kv[0][0])):
+        row = {'label': label, 'words': n_words}
+        for name, fn in (('reference', lambda t: count_vocab(analyze(t), vocabulary)),
+                         ('vectorized', counter.count_arrays)):
+            fn(texts[0])
+            latencies = time_calls(fn, [(t,) for t in texts], args.repeats, args.min_time)
+            row[name] = summarize(latencies, len(latencies))
+        row['speedup_p50'] = row['reference']['p50_ms'] / row['vectorized']['p50_ms']
+        results.append(row)
+        print(f"{label:>5} {n_words:>6}w | reference p50 {row['reference']['p50_ms']:8.2f} ms"
+              f" | vectorized p50 {row['vectorized']['p50_ms']:8.2f} ms | {row['speedup_p50']:5.1f}x",
+              file=sys.stderr)
+
+    report = {'vocabulary_size': len(vocabulary), 'key_bits': counter.bits, 'max_tfidf_diff': diff,
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# Latency / throughput suite for the detector.
+#
+#   predict     CommercialDetector.predict, one text per call
+#   batch       CommercialDetector.predict_batch over --batch-size texts
+#   stylometry  StylometryExtractor.transform on its own, one text per call
+#
+# Inputs are synthesized from the bundled corpora (see corpus.py) from 20 words up to
+# thesis length. Results are written as JSON (--output) so runs on different commits
+# can be compared with --compare.
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from scripts.bench.corpus import DEFAULT_SIZES, REPO_ROOT, build_inputs
+from scripts.api.predict import CommercialDetector
+from scripts.features.stylometry_core import StylometryFeaturizer
+
+BENCHES = ('predict', 'batch', 'stylometry')
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=REPO_ROOT)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def summarize(latencies_s, n_texts):
+    """Latency percentiles (ms) and throughput for a list of per-call wall times."""
+    ms = np.asarray(latencies_s) * 1000.0
+    total = float(np.sum(latencies_s))
+    return {
+        'calls': len(ms),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'mean_ms': float(np.mean(ms)),
+        'texts_per_s': n_texts / total if total > 0 else None
+    }
+
+
+def time_calls(fn, args_list, repeats, min_time):
+    """Calls fn(*args) for every args tuple, `repeats` passes and at least `min_time` seconds."""
+    latencies = []
+    start = time.perf_counter()
+    passes = 0
+    while passes < repeats or time.perf_counter() - start < min_time:
+        for args in args_list:
+            t0 = time.perf_counter()
+            fn(*args)
+            latencies.append(time.perf_counter() - t0)
+        passes += 1
+    return latencies
+
+
+def run_suite(detector, inputs, benches, batch_size, repeats, min_time):
+    results = []
+    extractor = StylometryFeaturizer()
+    for (label, n_words), texts in sorted(inputs.items(), key=lambda kv: (kv[0][1], kv[0][0])):
+        chars = int(np.mean([len(t) for t in texts]))
+        # Warm-up (regex compilation, lazy imports, first-touch of mmapped arrays)
+        detector.predict(texts[0])
+
+        for bench in benches:
+            if bench == 'predict':
+                latencies = time_calls(detector.predict, [(t,) for t in texts], repeats, min_time)
+                stats = summarize(latencies, len(latencies))
+            elif bench == 'batch':
+                batch = (texts * (batch_size // len(texts) + 1))[:batch_size]
+                latencies = time_calls(detector.predict_batch, [(batch,)], repeats, min_time)
+                stats = summarize(latencies, len(latencies) * len(batch))
+                stats['batch_size'] = len(batch)
+            elif bench == 'stylometry':
+                latencies = time_calls(extractor.transform, [([t],) for t in texts], repeats, min_time)
+                stats = summarize(latencies, len(latencies))
+            else:
+                raise ValueError(f"Unknown benchmark: {bench}")
+
+            row = {'bench': bench, 'label': label, 'words': n_words, 'chars': chars}
+            row.update(stats)
+            results.append(row)
+            print(f"{bench:>10} {label:>5} {n_words:>6}w | p50 {stats['p50_ms']:9.2f} ms | p95 {stats['p95_ms']:9.2f} ms"
+                  f" | p99 {stats['p99_ms']:9.2f} ms | {stats['texts_per_s']:9.1f} texts/s", file=sys.stderr)
+    return results
+
+
+def compare(current, baseline_path):
+    """Prints p50 / throughput ratios against a previous results file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    base = {(r['bench'], r['label'], r['words']): r for r in baseline['results']}
+    print(f"\nvs {baseline_path} ({baseline['meta'].get('git_commit')}):", file=sys.stderr)
+    for r in current['results']:
+        old = base.get((r['bench'], r['label'], r['words']))
+        if old is None:
+            continue
+        print(f"{r['bench']:>10} {r['label']:>5} {r['words']:>6}w | p50 {old['p50_ms']:9.2f} -> {r['p50_ms']:9.2f} ms"
+              f" ({old['p50_ms'] / r['p50_ms']:5.2f}x)", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detector latency/throughput benchmark suite')
+    parser.add_argument('--artifacts', default=os.path.join(REPO_ROOT, 'scripts', 'artifacts'))
+    parser.add_argument('--format', default='auto', choices=['auto', 'fast', 'joblib'])
+    parser.add_argument('--bench', nargs='+', default=list(BENCHES), choices=BENCHES)
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES, help='Input lengths in words')
+    parser.add_argument('--labels', nargs='+', default=['human', 'ai'], choices=['human', 'ai'])
+    parser.add_argument('--per-size', type=int, default=5, help='Distinct texts per label and size')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--repeats', type=int, default=3, help='Minimum passes over the inputs')
+    parser.add_argument('--min-time', type=float, default=0.5, help='Minimum seconds per measurement')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write results JSON here (default: stdout)')
+    parser.add_argument('--compare', help='Previous results JSON to compare against')
+    args = parser.parse_args()
+
+    detector = CommercialDetector(artifacts_dir=args.artifacts, artifact_format=args.format)
+    if detector.pipeline is None:
+        sys.exit(f"Could not load detector artifacts from {args.artifacts}")
+
+    inputs = build_inputs(args.sizes, args.per_size, args.labels, args.seed)
+    report = {
+        'meta': {
+            'git_commit': _git_commit(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'artifact_format': detector.artifact_format,
+            'model_version': detector.metadata.get('model_version'),
+            'config': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')}
+        },
+        'results': run_suite(detector, inputs, args.bench, args.batch_size, args.repeats, args.min_time)
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Cold-start benchmark: each run is a fresh interpreter that imports the detector,
+# loads the artifacts in the requested format and scores one text.
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+CHILD = r'''
+import json, os, resource, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, os.path.join({root!r}, 'scripts', 'api'))
+from predict import CommercialDetector
+t1 = time.perf_counter()
+detector = CommercialDetector(artifacts_dir={artifacts!r}, artifact_format={fmt!r})
+t2 = time.perf_counter()
+detector.predict("The committee reviewed the proposal carefully and decided that further analysis was needed before any funding could be approved for the next phase.")
+t3 = time.perf_counter()
+print(json.dumps({{
+    'format': detector.artifact_format,
+    'import_s': t1 - t0,
+    'load_s': t2 - t1,
+    'first_predict_s': t3 - t2,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+}}))
+'''
+
+
+def run_once(artifacts, fmt):
+    code = CHILD.format(root=REPO_ROOT, artifacts=artifacts, fmt=fmt)
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=REPO_ROOT)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detector cold-start benchmark')
+    parser.add_argument('--artifacts', default=os.path.join(REPO_ROOT, 'scripts', 'artifacts'))
+    parser.add_argument('--formats', nargs='+', default=['joblib', 'fast'])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    report = {}
+    for fmt in args.formats:
+        runs = [run_once(args.artifacts, fmt) for _ in range(args.runs)]
+        report[fmt] = {
+            key: statistics.median(r[key] for r in runs)
+            for key in ('import_s', 'load_s', 'first_predict_s', 'max_rss_mb')
+        }
+        report[fmt]['loaded_format'] = runs[0]['format']
+        print(f"{fmt:>7}: import {report[fmt]['import_s']*1000:7.1f} ms | load {report[fmt]['load_s']*1000:7.1f} ms"
+              f" | first predict {report[fmt]['first_predict_s']*1000:6.1f} ms | RSS {report[fmt]['max_rss_mb']:6.1f} MB",
+              file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
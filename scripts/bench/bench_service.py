@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+# Load test of the micro-batching service as the API route drives it.
+#
+# Starts scripts/api/service.py on stdin/stdout, as src/lib/python-worker.ts does, and
+# keeps --concurrency requests in flight: each client sends the route's payload
+# ({"op": "predict", "segments": true, ...}) and its next request once the response
+# arrives. Reports throughput, latency percentiles and the service's batching stats
+# (batch size histogram), so it shows whether concurrent route traffic is batched.
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from scripts.bench.corpus import REPO_ROOT, build_inputs
+
+SERVICE = os.path.join(REPO_ROOT, 'scripts', 'api', 'service.py')
+
+
+class ServiceClient:
+    """Line-protocol client of one service process; requests are matched by id."""
+    def __init__(self, args):
+        self.proc = subprocess.Popen([sys.executable, SERVICE] + args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     text=True, cwd=REPO_ROOT)
+        ready = json.loads(self.proc.stdout.readline())
+        if not ready.get('loaded'):
+            raise RuntimeError(f"Service started without a model: {ready}")
+        self._lock = threading.Lock()
+        self._waiting = {}
+        self._next_id = 0
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        for line in self.proc.stdout:
+            response = json.loads(line)
+            slot = self._waiting.pop(response['id'])
+            slot[1] = response
+            slot[0].set()
+
+    def request(self, payload):
+        slot = [threading.Event(), None]
+        with self._lock:
+            req_id = self._next_id
+            self._next_id += 1
+            self._waiting[req_id] = slot
+            self.proc.stdin.write(json.dumps(dict(payload, id=req_id)) + '\n')
+            self.proc.stdin.flush()
+        slot[0].wait()
+        return slot[1]
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait()
+
+
+def run_load(client, texts, concurrency, payload):
+    latencies = []
+    errors = []
+    position = iter(range(len(texts)))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                i = next(position, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            response = client.request(dict(payload, text=texts[i]))
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if not response['ok']:
+                    errors.append(response['error'])
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'wall_s': wall,
+        'requests_per_s': len(latencies) / wall,
+        'p50_ms': statistics.median(latencies) * 1000.0,
+        'p95_ms': latencies[int(0.95 * (len(latencies) - 1))] * 1000.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-batching service load test (API route payload)')
+    parser.add_argument('--artifacts', default=os.path.join(REPO_ROOT, 'scripts', 'artifacts'))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32], help='Requests in flight')
+    parser.add_argument('--requests', type=int, default=256, help='Requests per concurrency level')
+    parser.add_argument('--words', type=int, default=300, help='Words per text')
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--no-segments', action='store_true', help='Plain predicts instead of the route payload')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    per_label = -(-args.requests // 2)
+    inputs = build_inputs([args.words], per_label, seed=args.seed)
+    texts = [text for group in inputs.values() for text in group][:args.requests]
+    payload = {'op': 'predict', 'domain': None, 'segments': not args.no_segments, 'incremental': False}
+
+    report = {}
+    for concurrency in args.concurrency:
+        # A fresh service per level: no result cache hits, batching stats of this level only
+        client = ServiceClient(['--artifacts', args.artifacts, '--cache-size', '0', '--warmup', '0',
+                                '--max-batch-size', str(args.max_batch_size), '--max-wait-ms', str(args.max_wait_ms)])
+        try:
+            result = run_load(client, texts, concurrency, payload)
+            batching = client.request({'op': 'stats'})['result']['batching']
+        finally:
+            client.close()
+        result.update({k: batching[k] for k in ('batches', 'mean_batch_size', 'batch_sizes')})
+        report[str(concurrency)] = result
+        print(f"concurrency {concurrency:>3}: {result['requests_per_s']:7.1f} req/s | p50 {result['p50_ms']:7.1f} ms"
+              f" | p95 {result['p95_ms']:7.1f} ms | {result['batches']} batches,"
+              f" mean size {result['mean_batch_size']:.2f} | errors {result['errors']}", file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
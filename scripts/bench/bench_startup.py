@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Startup benchmark for the inference entry point. Each run is a fresh
+# `python -X importtime` interpreter that imports the detector, loads the artifacts and
+# scores one text; wall time of the whole process is the time-to-first-prediction a
+# one-shot CLI call pays. The importtime log is aggregated to show which top-level
+# packages the interpreter spends its import time in.
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+CHILD = r'''
+import json, os, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, os.path.join({root!r}, 'scripts', 'api'))
+from predict import CommercialDetector
+t1 = time.perf_counter()
+detector = CommercialDetector(artifacts_dir={artifacts!r}, artifact_format={fmt!r})
+t2 = time.perf_counter()
+detector.predict("The committee reviewed the proposal carefully and decided that further analysis was needed before any funding could be approved for the next phase.")
+t3 = time.perf_counter()
+print(json.dumps({{
+    'format': detector.artifact_format,
+    'import_s': t1 - t0,
+    'load_s': t2 - t1,
+    'first_predict_s': t3 - t2,
+    'heavy_modules': sorted(m for m in ('sklearn', 'scipy', 'pandas', 'joblib') if m in sys.modules)
+}}))
+'''
+
+
+def parse_importtime(stderr):
+    """{top-level package: import microseconds} from a -X importtime log.
+
+    Uses each module's self time, so nested imports are attributed to their own
+    package (numpy imported by predict counts as numpy) and nothing is counted twice.
+    """
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():
+            continue  # header line
+        package = name.strip().split('.')[0]
+        totals[package] = totals.get(package, 0) + int(self_us)
+    return totals
+
+
+def run_once(artifacts, fmt):
+    code = CHILD.format(root=REPO_ROOT, artifacts=artifacts, fmt=fmt)
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                         capture_output=True, text=True, check=True, cwd=REPO_ROOT)
+    wall = time.perf_counter() - start
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result['time_to_first_prediction_s'] = wall
+    result['imports_us'] = parse_importtime(out.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detector startup (time-to-first-prediction) benchmark')
+    parser.add_argument('--artifacts', default=os.path.join(REPO_ROOT, 'scripts', 'artifacts'))
+    parser.add_argument('--format', default='auto', choices=['auto', 'fast', 'joblib'])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='Top-level packages to report by import time')
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help='Exit non-zero when the median time-to-first-prediction exceeds this')
+    args = parser.parse_args()
+
+    runs = [run_once(args.artifacts, args.format) for _ in range(args.runs)]
+    report = {
+        key: statistics.median(r[key] for r in runs)
+        for key in ('time_to_first_prediction_s', 'import_s', 'load_s', 'first_predict_s')
+    }
+    report['format'] = runs[0]['format']
+    report['heavy_modules'] = runs[0]['heavy_modules']
+
+    packages = set().union(*(r['imports_us'] for r in runs))
+    imports_ms = {p: statistics.median(r['imports_us'].get(p, 0) for r in runs) / 1000.0 for p in packages}
+    report['top_imports_ms'] = dict(sorted(imports_ms.items(), key=lambda kv: -kv[1])[:args.top])
+
+    print(f"{report['format']}: first prediction {report['time_to_first_prediction_s']*1000:.1f} ms"
+          f" (import {report['import_s']*1000:.1f} | load {report['load_s']*1000:.1f}"
+          f" | predict {report['first_predict_s']*1000:.1f}) heavy modules: {report['heavy_modules'] or 'none'}",
+          file=sys.stderr)
+    for package, ms in report['top_imports_ms'].items():
+        print(f"  {package:<24} {ms:8.1f} ms", file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+    if args.budget_ms is not None and report['time_to_first_prediction_s'] * 1000 > args.budget_ms:
+        print(f"Startup budget exceeded: {report['time_to_first_prediction_s']*1000:.1f} ms > {args.budget_ms} ms",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import glob
+import os
+import random
+
+# Benchmark inputs built from the bundled corpora (data/human_mass/<genre>/*.txt and
+# data/ai/<genre>/*.txt). Texts of any length are cut from the concatenated word
+# stream of one label, so short inputs look like real excerpts and thesis-length
+# inputs wrap around the corpus instead of repeating one sentence.
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DATA_DIR = os.path.join(REPO_ROOT, 'data')
+CORPORA = {'human': 'human_mass', 'ai': 'ai'}
+
+# 20 words is the detector's minimum; 20k words is a full thesis
+DEFAULT_SIZES = [20, 100, 500, 2000, 8000, 20000]
+
+
+def corpus_files(label):
+    return sorted(glob.glob(os.path.join(DATA_DIR, CORPORA[label], '*', '*.txt')))
+
+
+def load_words(label):
+    """Whitespace tokens of every file of one label, in file order."""
+    words = []
+    for path in corpus_files(label):
+        with open(path, encoding='utf-8', errors='replace') as f:
+            words.extend(f.read().split())
+    if not words:
+        raise FileNotFoundError(f"No corpus files under {os.path.join(DATA_DIR, CORPORA[label])}")
+    return words
+
+
+def synthesize(words, n_words, rng):
+    """A text of exactly n_words tokens starting at a random offset of the word stream."""
+    start = rng.randrange(len(words))
+    out = []
+    while len(out) < n_words:
+        take = words[start:start + n_words - len(out)]
+        out.extend(take)
+        start = 0
+    return ' '.join(out)
+
+
+def build_inputs(sizes=DEFAULT_SIZES, per_size=5, labels=('human', 'ai'), seed=0):
+    """{(label, n_words): [text, ...]} with per_size texts for every label and size."""
+    rng = random.Random(seed)
+    inputs = {}
+    for label in labels:
+        words = load_words(label)
+        for n_words in sizes:
+            inputs[(label, n_words)] = [synthesize(words, n_words, rng) for _ in range(per_size)]
+    return inputs
@@ -0,0 +1,112 @@
+import re
+
+import numpy as np
+
+# Vectorized character n-gram counts for a fitted char TF-IDF vocabulary
+# ----------------------------------------------------------------------
+# The reference analyzer (ngrams.char_ngrams + count_vocab) slices every 3..5-gram of
+# the text into its own string and looks it up in the vocabulary dict. Here the text is
+# encoded once into a numpy array of code points, each mapped to a small id: 1..A for
+# the A characters that occur in the vocabulary, 0 for every other character (an
+# n-gram containing one cannot be in the vocabulary). With b = bit_length(A), an n-gram
+# packs exactly into one integer, (id_0 << b*(n-1)) | ... | id_{n-1}, as long as
+# max_n * b <= 64. Keys of all lengths are built by shifting the previous length's keys
+# (key_n = key_{n-1} << b | id), reduced to distinct keys with their counts and matched
+# against the sorted keys of the vocabulary with one searchsorted. Leading ids are
+# non-zero, so keys of different lengths never coincide and the packing is injective:
+# counts are exactly count_vocab's.
+#
+# For wider alphabets (or analyzers other than 'char') `CharNgramCounter.build`
+# returns None and callers keep the reference path.
+
+_WHITE_SPACES_RE = re.compile(r"\s\s+")
+KEY_BITS = 64
+
+
+def _code_points(text):
+    return np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+
+
+class CharNgramCounter:
+    """
+    Drop-in for count_vocab(build_analyzer('char', ngram_range, lowercase)(text), vocabulary).
+    Use `build`, which checks that the vocabulary's alphabet fits the key width; the
+    constructor takes the arrays of a built counter (e.g. stored with the artifacts).
+    """
+    def __init__(self, alphabet, keys, columns, ngram_range, lowercase):
+        self.alphabet = alphabet # sorted code points of the vocabulary's characters
+        self.table = np.zeros(int(alphabet[-1]) + 1, dtype=np.uint64) # code point -> id (0 = not in the alphabet)
+        self.table[alphabet] = np.arange(1, len(alphabet) + 1, dtype=np.uint64)
+        self.bits = int(len(alphabet)).bit_length()
+        self.keys = keys # sorted packed vocabulary n-grams
+        self.columns = columns # column index of each key
+        self.ngram_range = tuple(ngram_range)
+        self.lowercase = lowercase
+
+    @classmethod
+    def build(cls, vocabulary, ngram_range, lowercase=True):
+        """Counter for a {term: column} vocabulary, or None if its n-grams do not pack into 64 bits."""
+        min_n, max_n = ngram_range
+        if not vocabulary or min_n < 1:
+            return None
+        terms = sorted(vocabulary, key=vocabulary.get)
+        lengths = np.fromiter((len(t) for t in terms), dtype=np.int64, count=len(terms))
+        if lengths.min() < 1:
+            return None
+        cps = _code_points(''.join(terms))
+        alphabet = np.unique(cps)
+        bits = int(len(alphabet)).bit_length()
+        if lengths.max() * bits > KEY_BITS:
+            return None
+
+        ids = np.searchsorted(alphabet, cps).astype(np.uint64) + np.uint64(1)
+        # Shift of each character: b * (characters after it in its term)
+        ends = np.cumsum(lengths)
+        after = np.repeat(ends, lengths) - 1 - np.arange(len(cps), dtype=np.int64)
+        packed = ids << (after * bits).astype(np.uint64)
+        keys = np.add.reduceat(packed, ends - lengths) if len(packed) else packed
+        order = np.argsort(keys, kind='stable')
+        columns = np.fromiter((vocabulary[t] for t in terms), dtype=np.int64, count=len(terms))
+        return cls(alphabet, keys[order], columns[order], ngram_range, lowercase)
+
+    def count_arrays(self, text, normalized=False):
+        """
+        (columns, counts) int64 arrays of the text's in-vocabulary n-grams, columns
+        ascending. normalized: `text` is already lowercased (if the vectorizer does)
+        and whitespace-normalized.
+        """
+        if not normalized:
+            if self.lowercase:
+                text = text.lower()
+            text = _WHITE_SPACES_RE.sub(" ", text)
+        cps = _code_points(text)
+        ids = np.zeros(len(cps), dtype=np.uint64)
+        known = cps < len(self.table)
+        ids[known] = self.table[cps[known]]
+        # Prefix count of out-of-alphabet characters, to drop windows containing one
+        missing = np.concatenate(([0], np.cumsum(ids == 0)))
+
+        min_n, max_n = self.ngram_range
+        shift = np.uint64(self.bits)
+        key = ids
+        windows = []
+        for n in range(1, min(max_n, len(ids)) + 1):
+            if n > 1:
+                key = (key[:-1] << shift) | ids[n - 1:]
+            if n >= min_n:
+                windows.append(key[missing[n:] == missing[:-n]])
+        if not windows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        # Distinct n-grams first: searchsorted is much faster on fewer, sorted needles
+        grams, counts = np.unique(np.concatenate(windows), return_counts=True)
+        pos = np.searchsorted(self.keys, grams)
+        pos[pos == len(self.keys)] = 0
+        hit = self.keys[pos] == grams
+        cols = self.columns[pos[hit]]
+        order = np.argsort(cols)
+        return cols[order], counts[hit][order].astype(np.int64)
+
+    def counts(self, text):
+        """{column: count}, as count_vocab."""
+        cols, counts = self.count_arrays(text)
+        return dict(zip(cols.tolist(), counts.tolist()))
@@ -0,0 +1,106 @@
+import re
+import zlib
+
+import numpy as np
+
+# MinHash signatures of word shingles, and LSH banding
+# ----------------------------------------------------
+# A text is reduced to the set of its k-word shingles (lowercased \w+ tokens). Each
+# token is hashed with crc32, a shingle's hash is a polynomial of its k token hashes
+# (wrapping uint64 arithmetic, folded to 32 bits), and the signature keeps, for each of
+# num_perm multiply-add-shift hash functions h(x) = ((a*x + b) mod 2^64) >> 32, the
+# minimum over the shingles. The fraction of equal signature positions of two texts
+# estimates the Jaccard similarity of their shingle sets.
+#
+# For an LSH index the signature is cut into `bands` bands of `rows` positions: two
+# texts become candidates when any band is identical, which happens with probability
+# 1 - (1 - J^rows)^bands. `lsh_bands` picks the most selective split that still finds
+# pairs at the threshold with probability >= recall; candidates are then checked
+# against the threshold on the full signature. `lsh_params` balances false positives
+# and negatives instead, for indexes that keep only band hashes.
+#
+# Hashes use only crc32 and fixed seeds, so signatures are the same in every process.
+
+_TOKEN_RE = re.compile(r'\w+')
+_MASK_32 = np.uint64(0xFFFFFFFF)
+_SHINGLE_BASE = np.uint64(0x100000001B3) # FNV-1a 64-bit prime
+CHUNK = 4096 # shingles hashed at a time (bounds the num_perm x chunk work array)
+
+
+def tokens(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def shingle_hashes(text, k=5, distinct=True):
+    """
+    32-bit hashes of the text's k-word shingles (one shingle if shorter); sorted and
+    distinct unless distinct=False (in text order, as the signature only needs minima).
+    """
+    words = tokens(text)
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    h = np.fromiter((zlib.crc32(w.encode('utf-8', 'surrogatepass')) for w in words),
+                    dtype=np.uint64, count=len(words))
+    k = min(k, len(h))
+    with np.errstate(over='ignore'):
+        shingles = h[:len(h) - k + 1].copy()
+        for j in range(1, k):
+            shingles = shingles * _SHINGLE_BASE + h[j:len(h) - k + 1 + j]
+    hashes = (shingles ^ (shingles >> np.uint64(32))) & _MASK_32
+    return np.unique(hashes) if distinct else hashes
+
+
+def lsh_bands(num_perm, threshold, recall=0.99):
+    """(bands, rows) with bands * rows == num_perm for an LSH index at `threshold`."""
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if 1.0 - (1.0 - threshold ** rows) ** bands >= recall:
+            best = (bands, rows)
+    return best
+
+
+def lsh_params(num_perm, threshold, fp_weight=0.5, fn_weight=0.5):
+    """
+    (bands, rows) with bands * rows <= num_perm minimizing the weighted false positive
+    and false negative probability mass around `threshold`, for indexes that cannot
+    check candidates on the full signature.
+    """
+    below = np.linspace(0.0, threshold, 201)
+    above = np.linspace(threshold, 1.0, 201)
+    best, best_err = (num_perm, 1), np.inf
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            fp = (1.0 - (1.0 - below ** rows) ** bands).mean() * threshold
+            fn = ((1.0 - above ** rows) ** bands).mean() * (1.0 - threshold)
+            err = fp_weight * fp + fn_weight * fn
+            if err < best_err:
+                best, best_err = (bands, rows), err
+    return best
+
+
+class MinHasher:
+    """MinHash signatures (uint32 arrays of length num_perm) of k-word shingle sets."""
+    def __init__(self, num_perm=128, shingle_size=5, seed=1):
+        rng = np.random.RandomState(seed)
+        # Odd 64-bit multipliers and 64-bit offsets; products wrap modulo 2^64
+        self.a = rng.randint(0, 1 << 63, size=num_perm, dtype=np.uint64)[:, None] * np.uint64(2) + np.uint64(1)
+        self.b = rng.randint(0, 1 << 63, size=num_perm, dtype=np.uint64)[:, None] * np.uint64(2)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+
+    def signature(self, text):
+        hashes = shingle_hashes(text, self.shingle_size, distinct=False)
+        sig = np.full(self.num_perm, _MASK_32, dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            for start in range(0, len(hashes), CHUNK):
+                chunk = hashes[None, start:start + CHUNK]
+                np.minimum(sig, ((self.a * chunk + self.b) >> np.uint64(32)).min(axis=1), out=sig)
+        return sig.astype(np.uint32)
+
+    @staticmethod
+    def similarity(sig_a, sig_b):
+        """Estimated Jaccard similarity of two signatures."""
+        return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
@@ -0,0 +1,78 @@
+import re
+
+# Re-implementation of the TfidfVectorizer analyzers used by the detector, so fitted
+# vocabularies can be applied without importing sklearn. Mirrors
+# sklearn.feature_extraction.text: lowercase preprocessing, `token_pattern` word
+# tokens with stop-word removal and " "-joined n-grams, and whitespace-normalized
+# character n-grams.
+
+DEFAULT_TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+_WHITE_SPACES_RE = re.compile(r"\s\s+")
+
+
+def word_ngrams(tokens, ngram_range, stop_words=None):
+    if stop_words is not None:
+        tokens = [w for w in tokens if w not in stop_words]
+
+    min_n, max_n = ngram_range
+    if max_n == 1:
+        return tokens
+
+    original_tokens = tokens
+    if min_n == 1:
+        tokens = list(original_tokens)
+        min_n += 1
+    else:
+        tokens = []
+    n_original_tokens = len(original_tokens)
+    tokens_append = tokens.append
+    space_join = " ".join
+    for n in range(min_n, min(max_n + 1, n_original_tokens + 1)):
+        for i in range(n_original_tokens - n + 1):
+            tokens_append(space_join(original_tokens[i:i + n]))
+    return tokens
+
+
+def char_ngrams(text, ngram_range):
+    text = _WHITE_SPACES_RE.sub(" ", text)
+    text_len = len(text)
+    min_n, max_n = ngram_range
+    if min_n == 1:
+        ngrams = list(text)
+        min_n += 1
+    else:
+        ngrams = []
+    ngrams_append = ngrams.append
+    for n in range(min_n, min(max_n + 1, text_len + 1)):
+        for i in range(text_len - n + 1):
+            ngrams_append(text[i:i + n])
+    return ngrams
+
+
+def build_analyzer(analyzer='word', ngram_range=(1, 1), lowercase=True,
+                   token_pattern=DEFAULT_TOKEN_PATTERN, stop_words=None):
+    """Returns a callable text -> list of n-gram strings, as TfidfVectorizer.build_analyzer()."""
+    ngram_range = tuple(ngram_range)
+    if analyzer == 'char':
+        if lowercase:
+            return lambda text: char_ngrams(text.lower(), ngram_range)
+        return lambda text: char_ngrams(text, ngram_range)
+
+    if analyzer != 'word':
+        raise ValueError(f"Unsupported analyzer: {analyzer}")
+    find_tokens = re.compile(token_pattern).findall
+    stop_words = frozenset(stop_words) if stop_words else None
+    if lowercase:
+        return lambda text: word_ngrams(find_tokens(text.lower()), ngram_range, stop_words)
+    return lambda text: word_ngrams(find_tokens(text), ngram_range, stop_words)
+
+
+def count_vocab(ngrams, vocabulary):
+    """{column index: count} for the n-grams present in `vocabulary`."""
+    counts = {}
+    get = vocabulary.get
+    for gram in ngrams:
+        idx = get(gram)
+        if idx is not None:
+            counts[idx] = counts.get(idx, 0) + 1
+    return counts
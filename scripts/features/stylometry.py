@@ -1,123 +1,23 @@
-
-import numpy as np
-import re
-from collections import Counter
 from sklearn.base import BaseEstimator, TransformerMixin
 
-class StylometryExtractor(BaseEstimator, TransformerMixin):
+# The feature engine lives in stylometry_core (no sklearn import); names are
+# re-exported here for existing callers.
+from scripts.features.stylometry_core import (
+    BATCH_CHUNK_SIZE, CHUNK_SIZE, DEFAULT_FEATURES, FEATURE_NAMES, STOPWORDS,
+    StylometryFeaturizer, TextScan, features_from_row, finalize_features,
+    scan_text, transform_batch
+)
+
+class StylometryExtractor(StylometryFeaturizer, BaseEstimator, TransformerMixin):
     """
     Version: 1.0.0
     Extracts commercial-grade stylometric features from text.
     Handles short text robustly and captures flow dynamics.
+
+    n_jobs: processes used by `transform` for large batches (None = in-process).
     """
-    def __init__(self):
-        pass
+    def __init__(self, n_jobs=None):
+        self.n_jobs = n_jobs
 
     def fit(self, X, y=None):
         return self
-
-    def _calculate_features(self, text):
-        # 0. Edge Case Safety
-        if not isinstance(text, str) or not text.strip():
-            return {
-                'rhythm': 1.0, 'stop_ratio': 0.45, 'entropy': 0.0, 'ttr': 0.8, 'start_var': 2.0,
-                'em_dash': 0.0, 'special_chars': 0.0, 'passive': 0.0, 'adverbs': 0.0, 'complex': 0.2
-            }
-            
-        # Basic Tokenization
-        sentences = re.split(r'[.!?]+', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        words = re.findall(r'\b\w+\b', text.lower())
-        
-        n_words = len(words)
-        n_sentences = len(sentences)
-        
-        # Abort on extremely short text
-        if n_words < 5:
-            return {
-                'rhythm': 1.0, 'stop_ratio': 0.45, 'entropy': 0.0, 'ttr': 0.8, 'start_var': 2.0,
-                'em_dash': 0.0, 'special_chars': 0.0, 'passive': 0.0, 'adverbs': 0.0, 'complex': 0.2
-            }
-
-        # 1. Rhythm
-        sent_lens = [len(re.findall(r'\b\w+\b', s)) for s in sentences]
-        sent_len_var = np.var(sent_lens) if sent_lens else 0.0
-        feat_rhythm = np.log1p(sent_len_var)
-        
-        # 2. Stopword Ratio
-        stopwords = set(['the', 'and', 'of', 'to', 'a', 'in', 'is', 'that', 'for', 'it', 'as', 'was', 'with', 'on', 'at', 'by', 'an', 'be', 'this', 'which', 'or', 'from'])
-        stop_count = sum(1 for w in words if w in stopwords)
-        feat_stop_ratio = stop_count / n_words
-        
-        # 3. Local Entropy Variance
-        chunk_size = 50
-        chunks = [words[i:i + chunk_size] for i in range(0, n_words, chunk_size)]
-        chunk_entropies = []
-        for chunk in chunks:
-            if not chunk: continue
-            c = Counter(chunk)
-            probs = [cnt / len(chunk) for cnt in c.values()]
-            e = -sum(p * np.log(p) for p in probs)
-            chunk_entropies.append(e)  
-        feat_entropy_var = np.var(chunk_entropies) if chunk_entropies else 0.0
-        
-        # 4. TTR
-        ttrs = []
-        for chunk in chunks:
-            if not chunk: continue
-            ttrs.append(len(set(chunk)) / len(chunk))
-        feat_ttr = np.mean(ttrs) if ttrs else 0.0
-        
-        # 5. Sentence Start Variance
-        first_words = [s.split()[0] for s in sentences if s]
-        first_word_lens = [len(w) for w in first_words]
-        feat_start_var = np.var(first_word_lens) if first_word_lens else 0.0
-
-        # 6. Em-Dash
-        em_dash_count = text.count('—') + text.count('--')
-        feat_em_dash = np.log1p(em_dash_count)
-
-        # 7. Structural Punct
-        structural_punct = text.count(';') + text.count(':')
-        feat_special_chars = structural_punct / (n_words + 1.0)
-
-        # 8. Passive Voice
-        passives = re.findall(r'\b(am|is|are|was|were|be|been|being)\b\s+\w+ed\b', text.lower())
-        feat_passive = len(passives) / (n_sentences + 1.0)
-
-        # 9. Adverb Density
-        adverbs = [w for w in words if w.endswith('ly')]
-        feat_adverbs = len(adverbs) / (n_words + 1.0)
-
-        # 10. Complex Words
-        complex_words = [w for w in words if len(w) > 6]
-        feat_complex = len(complex_words) / (n_words + 1.0)
-
-        return {
-            'rhythm': float(feat_rhythm),
-            'stop_ratio': float(feat_stop_ratio),
-            'entropy': float(feat_entropy_var),
-            'ttr': float(feat_ttr),
-            'start_var': float(feat_start_var),
-            'em_dash': float(feat_em_dash),
-            'special_chars': float(feat_special_chars),
-            'passive': float(feat_passive),
-            'adverbs': float(feat_adverbs),
-            'complex': float(feat_complex)
-        }
-
-    def _get_metrics(self, text):
-        feats = self._calculate_features(text)
-        return [
-            feats['rhythm'], feats['stop_ratio'], feats['entropy'], feats['ttr'], 
-            feats['start_var'], feats['em_dash'], feats['special_chars'], 
-            feats['passive'], feats['adverbs'], feats['complex']
-        ]
-
-    def get_feature_dict(self, text):
-        return self._calculate_features(text)
-
-    def transform(self, X):
-        # print("Extracting Stylometric Features (v1.0.0)...")
-        # Ensure strict float return type for pipeline safety
-        return np.array([self._get_metrics(text) for text in X], dtype=np.float64)
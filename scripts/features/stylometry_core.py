@@ -0,0 +1,376 @@
+# Stylometry feature engine (v1.0.0 features) without any sklearn dependency.
+# `scripts.features.stylometry.StylometryExtractor` wraps it as a sklearn transformer;
+# inference code that only needs the numbers imports this module directly.
+
+import numpy as np
+import re
+from collections import Counter
+from itertools import chain
+from contextlib import contextmanager
+
+# Bump whenever any feature value changes; cached feature rows are keyed by it
+STYLOMETRY_VERSION = '1.0.0'
+
+# Column order of the feature matrix (fixed by the v1.0.0 artifacts)
+FEATURE_NAMES = (
+    'rhythm', 'stop_ratio', 'entropy', 'ttr', 'start_var',
+    'em_dash', 'special_chars', 'passive', 'adverbs', 'complex'
+)
+
+# Returned for empty and extremely short texts
+DEFAULT_FEATURES = {
+    'rhythm': 1.0, 'stop_ratio': 0.45, 'entropy': 0.0, 'ttr': 0.8, 'start_var': 2.0,
+    'em_dash': 0.0, 'special_chars': 0.0, 'passive': 0.0, 'adverbs': 0.0, 'complex': 0.2
+}
+
+STOPWORDS = frozenset(['the', 'and', 'of', 'to', 'a', 'in', 'is', 'that', 'for', 'it', 'as', 'was', 'with', 'on', 'at', 'by', 'an', 'be', 'this', 'which', 'or', 'from'])
+CHUNK_SIZE = 50
+BATCH_CHUNK_SIZE = 2000 # texts per unit of work in `transform_batch`
+
+_SENTENCE_SPLIT_RE = re.compile(r'[.!?]+')
+_WORD_RE = re.compile(r'\w+')
+_NONSPACE_RE = re.compile(r'\S+')
+_ADVERB_RE = re.compile(r'ly\b') # one hit per word ending in "ly"
+_PASSIVE_RE = re.compile(r'\b(am|is|are|was|were|be|been|being)\b\s+\w+ed\b')
+
+
+class TextScan:
+    """
+    Raw per-text counts gathered by `scan_text`.
+    `finalize_features` turns these into the ten v1.0.0 features.
+    """
+    __slots__ = ('words', 'sent_lens', 'first_lens', 'n_em_dash', 'n_struct_punct',
+                 'n_passive', 'n_stop', 'n_adverbs', 'n_complex')
+
+    def __init__(self):
+        self.words = []        # lowercased \w+ tokens
+        self.sent_lens = []    # words per non-empty sentence
+        self.first_lens = []   # length of each sentence's first whitespace-delimited token
+        self.n_em_dash = 0
+        self.n_struct_punct = 0
+        self.n_passive = 0
+        self.n_stop = 0
+        self.n_adverbs = 0
+        self.n_complex = 0
+
+
+def _tokenize(lower, scan):
+    # Single tokenization pass: each sentence is split off and tokenized once, and its
+    # words feed both the sentence statistics and the global word list
+    words = scan.words
+    sent_lens = scan.sent_lens
+    first_lens = scan.first_lens
+    find_words = _WORD_RE.findall
+    find_token = _NONSPACE_RE.search
+
+    for sentence in _SENTENCE_SPLIT_RE.split(lower):
+        sent_words = find_words(sentence)
+        if sent_words:
+            words += sent_words
+        elif not sentence or sentence.isspace():
+            continue # v1.0.0 drops sentences that are blank after strip()
+        sent_lens.append(len(sent_words))
+        first_lens.append(len(find_token(sentence).group()))
+
+    # C-level scans of the same lowercased string
+    scan.n_em_dash = lower.count('—') + lower.count('--')
+    scan.n_struct_punct = lower.count(';') + lower.count(':')
+    scan.n_passive = len(_PASSIVE_RE.findall(lower))
+    scan.n_adverbs = len(_ADVERB_RE.findall(lower))
+
+
+def scan_text(text):
+    """
+    Single tokenization pass over the lowercased text. Word-level counts are taken
+    from the resulting token list; punctuation counts from the same lowercased string.
+
+    Returns None when lowercasing changed the string length (e.g. 'İ'): v1.0.0 split
+    sentences on the original text, and the two only line up when the mapping is 1:1.
+    """
+    lower = text.lower()
+    if len(lower) != len(text):
+        return None
+
+    scan = TextScan()
+    _tokenize(lower, scan)
+    scan.n_stop = sum(map(STOPWORDS.__contains__, scan.words))
+    scan.n_complex = sum([len(w) > 6 for w in scan.words])
+    return scan
+
+
+def chunk_stat(chunk):
+    """(entropy, type-token ratio) of one chunk of words."""
+    c = Counter(chunk)
+    # Elementwise log over the chunk, summed left-to-right like v1.0.0's generator
+    probs = np.fromiter(c.values(), dtype=np.float64, count=len(c)) / len(chunk)
+    return -sum((probs * np.log(probs)).tolist()), len(c) / len(chunk)
+
+
+def _chunk_stats(words, stat=chunk_stat):
+    # Local entropy and type-token ratio over fixed 50-word chunks
+    n_words = len(words)
+    chunk_entropies = []
+    ttrs = []
+    for i in range(0, n_words, CHUNK_SIZE):
+        entropy, ttr = stat(words[i:i + CHUNK_SIZE])
+        chunk_entropies.append(entropy)
+        ttrs.append(ttr)
+    return chunk_entropies, ttrs
+
+
+def finalize_features(scan):
+    """Computes the v1.0.0 feature dict from a `TextScan` (same arithmetic as v1.0.0)."""
+    n_words = len(scan.words)
+    n_sentences = len(scan.sent_lens)
+
+    # Abort on extremely short text
+    if n_words < 5:
+        return dict(DEFAULT_FEATURES)
+
+    chunk_entropies, ttrs = _chunk_stats(scan.words)
+    sent_len_var = np.var(scan.sent_lens) if scan.sent_lens else 0.0
+
+    return {
+        'rhythm': float(np.log1p(sent_len_var)),
+        'stop_ratio': float(scan.n_stop / n_words),
+        'entropy': float(np.var(chunk_entropies) if chunk_entropies else 0.0),
+        'ttr': float(np.mean(ttrs) if ttrs else 0.0),
+        'start_var': float(np.var(scan.first_lens) if scan.first_lens else 0.0),
+        'em_dash': float(np.log1p(scan.n_em_dash)),
+        'special_chars': float(scan.n_struct_punct / (n_words + 1.0)),
+        'passive': float(scan.n_passive / (n_sentences + 1.0)),
+        'adverbs': float(scan.n_adverbs / (n_words + 1.0)),
+        'complex': float(scan.n_complex / (n_words + 1.0))
+    }
+
+
+def _multipass_features(text):
+    # Original v1.0.0 multi-pass implementation. Only used when lowercasing changes
+    # the text length (e.g. 'İ'), where the single-pass scanner cannot map offsets.
+    # Basic Tokenization
+    sentences = re.split(r'[.!?]+', text)
+    sentences = [s.strip() for s in sentences if s.strip()]
+    words = re.findall(r'\b\w+\b', text.lower())
+    
+    n_words = len(words)
+    n_sentences = len(sentences)
+    
+    # Abort on extremely short text
+    if n_words < 5:
+        return dict(DEFAULT_FEATURES)
+
+    # 1. Rhythm
+    sent_lens = [len(re.findall(r'\b\w+\b', s)) for s in sentences]
+    sent_len_var = np.var(sent_lens) if sent_lens else 0.0
+    feat_rhythm = np.log1p(sent_len_var)
+    
+    # 2. Stopword Ratio
+    stop_count = sum(1 for w in words if w in STOPWORDS)
+    feat_stop_ratio = stop_count / n_words
+    
+    # 3. Local Entropy Variance / 4. TTR
+    chunk_entropies, ttrs = _chunk_stats(words)
+    feat_entropy_var = np.var(chunk_entropies) if chunk_entropies else 0.0
+    feat_ttr = np.mean(ttrs) if ttrs else 0.0
+    
+    # 5. Sentence Start Variance
+    first_words = [s.split()[0] for s in sentences if s]
+    first_word_lens = [len(w) for w in first_words]
+    feat_start_var = np.var(first_word_lens) if first_word_lens else 0.0
+
+    # 6. Em-Dash
+    em_dash_count = text.count('—') + text.count('--')
+    feat_em_dash = np.log1p(em_dash_count)
+
+    # 7. Structural Punct
+    structural_punct = text.count(';') + text.count(':')
+    feat_special_chars = structural_punct / (n_words + 1.0)
+
+    # 8. Passive Voice
+    passives = re.findall(r'\b(am|is|are|was|were|be|been|being)\b\s+\w+ed\b', text.lower())
+    feat_passive = len(passives) / (n_sentences + 1.0)
+
+    # 9. Adverb Density
+    adverbs = [w for w in words if w.endswith('ly')]
+    feat_adverbs = len(adverbs) / (n_words + 1.0)
+
+    # 10. Complex Words
+    complex_words = [w for w in words if len(w) > 6]
+    feat_complex = len(complex_words) / (n_words + 1.0)
+
+    return {
+        'rhythm': float(feat_rhythm),
+        'stop_ratio': float(feat_stop_ratio),
+        'entropy': float(feat_entropy_var),
+        'ttr': float(feat_ttr),
+        'start_var': float(feat_start_var),
+        'em_dash': float(feat_em_dash),
+        'special_chars': float(feat_special_chars),
+        'passive': float(feat_passive),
+        'adverbs': float(feat_adverbs),
+        'complex': float(feat_complex)
+    }
+
+
+def features_from_row(row):
+    """Feature dict from one row of `StylometryExtractor.transform` output."""
+    return dict(zip(FEATURE_NAMES, (float(v) for v in row)))
+
+def _transform_chunk(texts):
+    """
+    Batch feature matrix for `texts`. Tokenization is per text, but the word-level
+    counts run as ragged-array operations over the whole batch (one flat array of
+    words plus per-text offsets). Integer counts are summed exactly with reduceat;
+    variances and means stay per text because numpy's pairwise summation in np.var
+    is not reproduced by reduceat, and rows must match `get_feature_dict` bit for bit.
+    """
+    out = np.empty((len(texts), len(FEATURE_NAMES)), dtype=np.float64)
+    default_row = [DEFAULT_FEATURES[name] for name in FEATURE_NAMES]
+
+    rows = []  # output row of each scanned text
+    scans = []
+    for i, text in enumerate(texts):
+        if not isinstance(text, str) or not text.strip():
+            out[i] = default_row
+            continue
+        lower = text.lower()
+        if len(lower) != len(text):
+            feats = _multipass_features(text)
+            out[i] = [feats[name] for name in FEATURE_NAMES]
+            continue
+        scan = TextScan()
+        _tokenize(lower, scan)
+        if len(scan.words) < 5:
+            out[i] = default_row
+            continue
+        rows.append(i)
+        scans.append(scan)
+
+    if scans:
+        out[rows] = scan_rows(scans)
+    return out
+
+
+def scan_rows(scans, chunk_stat=chunk_stat):
+    """
+    Feature rows (len(scans), 10) of scans that each hold at least 5 words, with the
+    batch arithmetic of `transform_batch` (so rows match it bit for bit).
+    chunk_stat: per-chunk (entropy, ttr) function, e.g. a memoized `chunk_stat`.
+    """
+    # Ragged word array: every group has >= 5 words, so reduceat never sees an empty slice
+    n_words = np.fromiter((len(sc.words) for sc in scans), dtype=np.int64, count=len(scans))
+    word_offsets = np.concatenate(([0], np.cumsum(n_words)[:-1]))
+    all_words = list(chain.from_iterable(sc.words for sc in scans))
+    word_lens = np.fromiter(map(len, all_words), dtype=np.int64, count=len(all_words))
+    is_stop = np.fromiter(map(STOPWORDS.__contains__, all_words), dtype=np.int64, count=len(all_words))
+    n_stop = np.add.reduceat(is_stop, word_offsets)
+    n_complex = np.add.reduceat((word_lens > 6).astype(np.int64), word_offsets)
+
+    # Ragged sentence arrays
+    n_sentences = np.fromiter((len(sc.sent_lens) for sc in scans), dtype=np.int64, count=len(scans))
+    sent_ends = np.cumsum(n_sentences)
+    sent_lens = np.fromiter(chain.from_iterable(sc.sent_lens for sc in scans), dtype=np.int64, count=sent_ends[-1])
+    first_lens = np.fromiter(chain.from_iterable(sc.first_lens for sc in scans), dtype=np.int64, count=sent_ends[-1])
+
+    n_em_dash = np.array([sc.n_em_dash for sc in scans], dtype=np.int64)
+    n_struct_punct = np.array([sc.n_struct_punct for sc in scans], dtype=np.int64)
+    n_passive = np.array([sc.n_passive for sc in scans], dtype=np.int64)
+    n_adverbs = np.array([sc.n_adverbs for sc in scans], dtype=np.int64)
+
+    sent_len_var = np.zeros(len(scans))
+    start_var = np.zeros(len(scans))
+    entropy_var = np.zeros(len(scans))
+    ttr_mean = np.zeros(len(scans))
+    for j, sc in enumerate(scans):
+        a, b = sent_ends[j] - n_sentences[j], sent_ends[j]
+        if b > a:
+            sent_len_var[j] = np.var(sent_lens[a:b])
+            start_var[j] = np.var(first_lens[a:b])
+        chunk_entropies, ttrs = _chunk_stats(sc.words, chunk_stat)
+        entropy_var[j] = np.var(chunk_entropies)
+        ttr_mean[j] = np.mean(ttrs)
+
+    return np.column_stack([
+        np.log1p(sent_len_var),                 # rhythm
+        n_stop / n_words,                       # stop_ratio
+        entropy_var,                            # entropy
+        ttr_mean,                               # ttr
+        start_var,                              # start_var
+        np.log1p(n_em_dash),                    # em_dash
+        n_struct_punct / (n_words + 1.0),       # special_chars
+        n_passive / (n_sentences + 1.0),        # passive
+        n_adverbs / (n_words + 1.0),            # adverbs
+        n_complex / (n_words + 1.0)             # complex
+    ])
+
+
+def transform_batch(texts, n_jobs=None, chunk_size=BATCH_CHUNK_SIZE):
+    """
+    Feature matrix for many texts; row i equals `get_feature_dict(texts[i])` exactly.
+    n_jobs > 1 (or -1 for all cores) extracts chunks of `chunk_size` texts in
+    worker processes.
+    """
+    texts = list(texts)
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    if not chunks:
+        return np.empty((0, len(FEATURE_NAMES)), dtype=np.float64)
+
+    if n_jobs in (None, 1) or len(chunks) == 1:
+        parts = [_transform_chunk(chunk) for chunk in chunks]
+    else:
+        from joblib import Parallel, delayed
+        parts = Parallel(n_jobs=n_jobs)(delayed(_transform_chunk)(chunk) for chunk in chunks)
+    return np.vstack(parts)
+
+
+class StylometryFeaturizer:
+    """
+    Feature extraction shared by the sklearn `StylometryExtractor` and the
+    sklearn-free inference path.
+
+    n_jobs: processes used by `transform` for large batches (None = in-process).
+    """
+    n_jobs = None # default for extractors pickled before the parameter existed
+
+    def __init__(self, n_jobs=None):
+        self.n_jobs = n_jobs
+
+    def _calculate_features(self, text):
+        # 0. Edge Case Safety
+        if not isinstance(text, str) or not text.strip():
+            return dict(DEFAULT_FEATURES)
+
+        scan = scan_text(text)
+        if scan is None:
+            return _multipass_features(text)
+        return finalize_features(scan)
+
+    def _get_metrics(self, text):
+        feats = self._calculate_features(text)
+        return [feats[name] for name in FEATURE_NAMES]
+
+    def get_feature_dict(self, text):
+        return self._calculate_features(text)
+
+    @contextmanager
+    def capture(self):
+        """
+        Records the feature matrices produced by `transform` while active, so callers
+        running the full pipeline can reuse the stylometry branch's features instead
+        of extracting them a second time.
+        """
+        captured = []
+        self._captured = captured
+        try:
+            yield captured
+        finally:
+            self.__dict__.pop('_captured', None)
+
+    def transform(self, X):
+        # print("Extracting Stylometric Features (v1.0.0)...")
+        # Ensure strict float return type for pipeline safety
+        rows = transform_batch(X, n_jobs=self.n_jobs)
+        captured = getattr(self, '_captured', None)
+        if captured is not None:
+            captured.append(rows)
+        return rows
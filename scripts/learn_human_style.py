@@ -2,37 +2,64 @@ import os
 import json
 import re
 import glob
-import numpy as np
+import argparse
+import hashlib
+import itertools
+import math
+import multiprocessing
+import sqlite3
 from collections import Counter
+from fractions import Fraction
 
 # CONFIG
 DATA_DIR = os.path.join(os.getcwd(), 'data/human_mass')
 OUTPUT_FILE = os.path.join(os.getcwd(), 'src/lib/human_style_profile.json')
+GENRE_OUTPUT_FILE = os.path.join(os.getcwd(), 'src/lib/human_style_genres.json')
+
+# Files are analyzed by a process pool, FILES_PER_TASK at a time, and consumed as they
+# arrive. Each file is reduced to a StyleSummary (count / mean / M2 / min / max per
+# statistic plus the opener counts) instead of raw per-sentence lists. Means and M2 are
+# exact fractions, so the Chan merge (and its reverse) gives the same numbers in any
+# order, and the profile does not depend on which files were merged or retracted when.
+# Openers with equal counts keep their order in the profile being replaced, then sort
+# alphabetically, so unchanged data rewrites it as is.
+#
+# The state is an SQLite file next to the profile (<output>.state.db): one aggregate
+# summary per genre, and a manifest row per file (path relative to the data dir, size,
+# mtime, sha256, genre) with the file's own summary, read back only to retract it. A
+# re-run analyzes only files that are new or whose content changed (size / mtime
+# mismatch and a different hash) and subtracts the contribution of changed and deleted
+# files from their genre. A genre is re-merged from its files' summaries only when a
+# retracted file held one of its minima or maxima. Memory is bounded by the genre
+# aggregates and the manifest; the profile is the same as a --full run's. The genre of
+# a file is its first directory under the data dir ('general' at the top level).
+FILES_PER_TASK = 16
+STATE_VERSION = 3
 
 def analyze_text(text):
     # Basic cleaning
     text = text.strip()
     if not text: return None
-    
+
     # Sentence Tokenization (Simple)
     sentences = re.split(r'[.!?]+', text)
     sentences = [s.strip() for s in sentences if len(s.strip()) > 1]
-    
+
     if not sentences: return None
-    
+
     # 1. Sentence Lengths (Words)
     sent_lengths = [len(s.split()) for s in sentences]
-    
+
     # 2. Sentence Openers (First word)
     openers = [s.split()[0].lower() for s in sentences if s]
-    
+
     # 3. Punctuation (Commas per sentence)
     commas = [s.count(',') for s in sentences]
-    
+
     # 4. Paragraph Analysis (Approximate by newlines)
     paragraphs = text.split('\n\n')
     para_lengths = [len(p.split('.')) for p in paragraphs if len(p) > 10]
-    
+
     return {
         'lengths': sent_lengths,
         'openers': openers,
@@ -40,68 +67,366 @@ def analyze_text(text):
         'para_lengths': para_lengths
     }
 
-def main():
-    print(f"📖 Reading Human Data from: {DATA_DIR}")
-    
-    all_lengths = []
-    all_openers = []
-    all_commas = []
-    all_para_lengths = []
-    
-    # specific structure: data/human_mass/genre/*.txt
-    files = glob.glob(os.path.join(DATA_DIR, '**/*.txt'), recursive=True)
-    
-    if not files:
-        print("❌ No files found in data/human_mass")
-        return
+class RunningStats:
+    """Count, mean, M2 (sum of squared deviations), min and max of a stream of numbers; mean and M2 are exact."""
+    def __init__(self):
+        self.n = 0
+        self.mean = Fraction(0)
+        self.m2 = Fraction(0)
+        self.min = None
+        self.max = None
 
-    print(f"Found {len(files)} files. Analyzing...")
-    
-    for f_path in files:
+    def extend(self, values):
+        if not values:
+            return
+        if not all(isinstance(v, int) for v in values):
+            values = [Fraction(v) for v in values]
+        batch = RunningStats()
+        batch.n = len(values)
+        total = sum(values)
+        batch.mean = Fraction(total) / batch.n
+        batch.m2 = sum(v * v for v in values) - batch.mean * total
+        batch.min = float(min(values))
+        batch.max = float(max(values))
+        self.merge(batch)
+
+    def to_list(self):
+        return [self.n, str(self.mean), str(self.m2), self.min, self.max]
+
+    @classmethod
+    def from_list(cls, values):
+        stats = cls()
+        stats.n, mean, m2, stats.min, stats.max = values
+        stats.mean, stats.m2 = Fraction(mean), Fraction(m2)
+        return stats
+
+    def merge(self, other):
+        # Chan et al. pairwise update of mean and M2
+        if other.n == 0:
+            return
+        if self.n == 0:
+            self.n, self.mean, self.m2 = other.n, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def subtract(self, other):
+        """
+        Removes `other` (merged in before) with the reverse Chan update. Returns False
+        when min / max may be stale: `other` held one of them, and only a re-merge of
+        what is left can tell the new value.
+        """
+        if other.n == 0:
+            return True
+        n = self.n - other.n
+        if n == 0:
+            self.__init__()
+            return True
+        mean = (self.mean * self.n - other.mean * other.n) / n
+        delta = other.mean - mean
+        self.m2 -= other.m2 + delta * delta * n * other.n / self.n
+        self.mean = mean
+        self.n = n
+        return other.min > self.min and other.max < self.max
+
+    @property
+    def average(self):
+        return float(self.mean) if self.n else float('nan')
+
+    @property
+    def std(self):
+        # Population standard deviation, as np.std
+        return math.sqrt(float(self.m2 / self.n)) if self.n else 0.0
+
+class StyleSummary:
+    """Mergeable summary of analyze_text over any number of files."""
+    def __init__(self):
+        self.lengths = RunningStats()
+        self.commas = RunningStats()
+        self.para_lengths = RunningStats()
+        self.openers = Counter()
+        self.files = 0
+
+    def add(self, data):
+        self.lengths.extend(data['lengths'])
+        self.commas.extend(data['commas'])
+        self.para_lengths.extend(data['para_lengths'])
+        self.openers.update(data['openers'])
+        self.files += 1
+
+    def merge(self, other):
+        self.lengths.merge(other.lengths)
+        self.commas.merge(other.commas)
+        self.para_lengths.merge(other.para_lengths)
+        self.openers.update(other.openers)
+        self.files += other.files
+
+    def subtract(self, other):
+        """Removes `other` (merged in before); False when a min / max may be stale (see RunningStats.subtract)."""
+        exact = all([self.lengths.subtract(other.lengths), self.commas.subtract(other.commas),
+                     self.para_lengths.subtract(other.para_lengths)])
+        for opener, count in other.openers.items():
+            left = self.openers[opener] - count
+            if left > 0:
+                self.openers[opener] = left
+            else:
+                del self.openers[opener]
+        self.files -= other.files
+        return exact
+
+    def to_dict(self):
+        return {
+            'lengths': self.lengths.to_list(),
+            'commas': self.commas.to_list(),
+            'para_lengths': self.para_lengths.to_list(),
+            'openers': dict(self.openers),
+            'files': self.files
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls()
+        summary.lengths = RunningStats.from_list(data['lengths'])
+        summary.commas = RunningStats.from_list(data['commas'])
+        summary.para_lengths = RunningStats.from_list(data['para_lengths'])
+        summary.openers = Counter(data['openers'])
+        summary.files = data['files']
+        return summary
+
+def _file_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+def analyze_files(tasks):
+    """
+    [(path, sha256, summary dict or None, error or None)] for a chunk of (path, known
+    sha256 or None) tasks; a file whose hash is the known one is not re-analyzed
+    (its summary is then returned as None).
+    """
+    out = []
+    for f_path, known in tasks:
         try:
-            with open(f_path, 'r', encoding='utf-8') as f:
-                text = f.read()
+            with open(f_path, 'rb') as f:
+                content = f.read()
+            digest = _file_hash(content)
+            summary = None
+            if digest != known:
+                # Universal newlines, as a text-mode read (the corpus has CRLF files)
+                text = content.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
                 data = analyze_text(text)
                 if data:
-                    all_lengths.extend(data['lengths'])
-                    all_openers.extend(data['openers'])
-                    all_commas.extend(data['commas'])
-                    all_para_lengths.extend(data['para_lengths'])
+                    summary = StyleSummary()
+                    summary.add(data)
+                    summary = summary.to_dict()
+            out.append((f_path, digest, summary, None))
         except Exception as e:
-            print(f"Skipping {f_path}: {e}")
+            out.append((f_path, None, None, str(e)))
+    return out
 
-    # Stat aggregation
-    if not all_lengths:
-        print("❌ No valid text data extracted.")
-        return
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
 
-    # Top 50 Openers
-    opener_counts = Counter(all_openers)
-    common_openers = opener_counts.most_common(50)
-    
-    profile = {
+def _analyzed(pending, workers):
+    # analyze_files results, one file at a time, as the pool produces them
+    tasks = _chunks(pending, FILES_PER_TASK)
+    if workers > 1 and len(pending) > FILES_PER_TASK:
+        with multiprocessing.Pool(workers) as pool:
+            for chunk in pool.imap(analyze_files, tasks):
+                yield from chunk
+    else:
+        for chunk in tasks:
+            yield from analyze_files(chunk)
+
+def _genre(rel):
+    parts = rel.split('/')
+    return parts[0] if len(parts) > 1 else 'general'
+
+def open_state(path, data_dir, full=False):
+    """SQLite state of previous runs over `data_dir`; emptied for --full, another data dir or version."""
+    db = sqlite3.connect(path)
+    db.executescript("""
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS files (rel TEXT PRIMARY KEY, size INTEGER, mtime REAL, sha256 TEXT,
+                                          genre TEXT, summary TEXT);
+        CREATE TABLE IF NOT EXISTS genres (genre TEXT PRIMARY KEY, summary TEXT);
+    """)
+    meta = dict(db.execute('SELECT key, value FROM meta'))
+    if full or meta.get('version') != str(STATE_VERSION) or meta.get('data_dir') != os.path.abspath(data_dir):
+        db.executescript('DELETE FROM meta; DELETE FROM files; DELETE FROM genres;')
+        db.executemany('INSERT INTO meta VALUES (?, ?)',
+                       [('version', str(STATE_VERSION)), ('data_dir', os.path.abspath(data_dir))])
+    return db
+
+def update_state(db, data_dir, files, workers):
+    """
+    Brings the state in `db` up to date with `files` (absolute paths) and returns
+    ({genre: StyleSummary}, analyzed, unchanged, removed, errors). Uncommitted.
+    """
+    manifest = {rel: (size, mtime, sha256) for rel, size, mtime, sha256
+                in db.execute('SELECT rel, size, mtime, sha256 FROM files')}
+    genres = {genre: StyleSummary.from_dict(json.loads(summary))
+              for genre, summary in db.execute('SELECT genre, summary FROM genres')}
+    stale = set()
+
+    def retract(rel):
+        genre, summary = db.execute('SELECT genre, summary FROM files WHERE rel = ?', (rel,)).fetchone()
+        db.execute('DELETE FROM files WHERE rel = ?', (rel,))
+        if summary is not None and not genres[genre].subtract(StyleSummary.from_dict(json.loads(summary))):
+            stale.add(genre)
+
+    pending = []
+    seen = set()
+    unchanged = 0
+    for f_path in files:
+        rel = os.path.relpath(f_path, data_dir).replace(os.sep, '/')
+        seen.add(rel)
+        st = os.stat(f_path)
+        entry = manifest.get(rel)
+        if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime:
+            unchanged += 1
+        else:
+            pending.append((f_path, entry[2] if entry is not None else None))
+    deleted = [rel for rel in manifest if rel not in seen]
+    for rel in deleted:
+        retract(rel)
+
+    analyzed = 0
+    errors = []
+    for f_path, digest, summary, error in _analyzed(pending, workers):
+        rel = os.path.relpath(f_path, data_dir).replace(os.sep, '/')
+        previous = manifest.get(rel)
+        if error is not None:
+            errors.append(f"{f_path}: {error}")
+            if previous is not None:
+                retract(rel)
+            continue
+        st = os.stat(f_path)
+        if previous is not None and previous[2] == digest:
+            # Only the mtime changed
+            db.execute('UPDATE files SET size = ?, mtime = ? WHERE rel = ?', (st.st_size, st.st_mtime, rel))
+            unchanged += 1
+            continue
+        if previous is not None:
+            retract(rel)
+        genre = _genre(rel)
+        db.execute('INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)',
+                   (rel, st.st_size, st.st_mtime, digest, genre, json.dumps(summary) if summary else None))
+        if summary is not None:
+            genres.setdefault(genre, StyleSummary()).merge(StyleSummary.from_dict(summary))
+        analyzed += 1
+
+    for genre in stale:
+        # A retracted file held a min / max: re-merge what is left of the genre
+        genres[genre] = StyleSummary()
+        for (summary,) in db.execute('SELECT summary FROM files WHERE genre = ? AND summary IS NOT NULL', (genre,)):
+            genres[genre].merge(StyleSummary.from_dict(json.loads(summary)))
+    genres = {genre: genres[genre] for genre in sorted(genres) if genres[genre].files}
+    db.execute('DELETE FROM genres')
+    db.executemany('INSERT INTO genres VALUES (?, ?)',
+                   [(genre, json.dumps(summary.to_dict())) for genre, summary in genres.items()])
+    return genres, analyzed, unchanged, len(deleted), errors
+
+def load_openers(path, genre=None):
+    """Opener order of an existing profile (or of one genre of a genre file), or []."""
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return []
+    if genre is not None:
+        profile = profile.get(genre, {})
+    return list(profile.get('common_openers', {}))
+
+def build_profile(summary, previous_openers=()):
+    # Top 50 Openers; ties in the previous order, then alphabetical
+    rank = {opener: i for i, opener in enumerate(previous_openers)}
+    ordered = sorted(summary.openers.items(), key=lambda kv: (-kv[1], rank.get(kv[0], len(rank)), kv[0]))
+    common_openers = ordered[:50]
+
+    return {
         "sentence_length": {
-            "mean": float(np.mean(all_lengths)),
-            "std": float(np.std(all_lengths)),
-            "min": int(np.min(all_lengths)),
-            "max": int(np.max(all_lengths))
+            "mean": summary.lengths.average,
+            "std": summary.lengths.std,
+            "min": int(summary.lengths.min),
+            "max": int(summary.lengths.max)
         },
         "punctuation_density": {
-            "commas_per_sentence_mean": float(np.mean(all_commas))
+            "commas_per_sentence_mean": summary.commas.average
         },
         "paragraph_structure": {
-             "sentences_per_para_mean": float(np.mean(all_para_lengths))
+             "sentences_per_para_mean": summary.para_lengths.average
         },
         "common_openers": {k: v for k, v in common_openers}
     }
-    
-    print("\n✅ Human Style Profile Generated:")
-    print(json.dumps(profile, indent=2))
-    
-    # Save
-    with open(OUTPUT_FILE, 'w') as f:
-        json.dump(profile, f, indent=2)
-    print(f"\nSaved to: {OUTPUT_FILE}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Learn the human style profile from data/human_mass')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Directory of human .txt files (searched recursively)')
+    parser.add_argument('--output', default=OUTPUT_FILE, help='Profile JSON to write')
+    parser.add_argument('--state', default=None, help='Aggregate state / manifest file (default: <output>.state.db)')
+    parser.add_argument('--full', action='store_true', help='Ignore the saved state and analyze every file')
+    parser.add_argument('--per-genre', nargs='?', const=GENRE_OUTPUT_FILE, default=None, metavar='PATH',
+                        help=f'Also write one profile per genre (default path: {GENRE_OUTPUT_FILE})')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per CPU)')
+    args = parser.parse_args()
+    state_path = args.state or os.path.splitext(args.output)[0] + '.state.db'
+
+    print(f"📖 Reading Human Data from: {args.data_dir}")
+
+    # specific structure: data/human_mass/genre/*.txt
+    files = sorted(glob.iglob(os.path.join(args.data_dir, '**/*.txt'), recursive=True))
+
+    if not files:
+        print("❌ No files found in data/human_mass")
+        return
+
+    workers = args.workers or os.cpu_count() or 1
+    db = open_state(state_path, args.data_dir, args.full)
+    try:
+        genres, analyzed, unchanged, removed, errors = update_state(db, args.data_dir, files, workers)
+        print(f"Found {len(files)} files: {analyzed} analyzed, {unchanged} unchanged, {removed} removed"
+              f" ({workers} worker(s))")
+
+        for error in errors:
+            print(f"Skipping {error}")
+
+        # Stat aggregation
+        summary = StyleSummary()
+        for genre_summary in genres.values():
+            summary.merge(genre_summary)
+        if not summary.lengths.n:
+            print("❌ No valid text data extracted.")
+            return
+
+        profile = build_profile(summary, load_openers(args.output))
+
+        print("\n✅ Human Style Profile Generated:")
+        print(json.dumps(profile, indent=2))
+
+        # Save
+        with open(args.output, 'w') as f:
+            json.dump(profile, f, indent=2)
+        db.commit()
+        print(f"\nSaved to: {args.output} (state: {state_path})")
+
+        if args.per_genre:
+            genre_profiles = {genre: build_profile(genre_summary, load_openers(args.per_genre, genre))
+                              for genre, genre_summary in genres.items() if genre_summary.lengths.n}
+            with open(args.per_genre, 'w') as f:
+                json.dump(genre_profiles, f, indent=2)
+            print(f"Saved {len(genre_profiles)} genre profiles to: {args.per_genre}")
+    finally:
+        db.close()
 
 if __name__ == "__main__":
     main()
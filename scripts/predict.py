@@ -3,7 +3,6 @@ import os
 import joblib
 import sys
 import numpy as np
-import pandas as pd
 
 # Add standard import path for shared modules
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
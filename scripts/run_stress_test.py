@@ -1,125 +1,314 @@
-import sys
-import os
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-import os
-
+import argparse
+import gc
+import json
+import math
+import multiprocessing
 import os
-import joblib
 import sys
-import numpy as np
-import pandas as pd
-from sklearn.metrics import accuracy_score
+import time
+from collections import deque
 
+import numpy as np
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+from scripts.api.predict import CommercialDetector
+from scripts.training.sampler import Source, peak_rss_mb
 
-from scripts.features_stylometry import StylometryExtractor
+# Stress tests over labeled threat sets
+# -------------------------------------
+# Threat sets are streamed from STRESS_DATA_DIR, <repo>/stress_tests and <repo>/data
+# (or the --data directories). Every directory holding documents is one threat
+# category:
+#   - *.txt files are one document each
+#   - *.csv files are read in chunks (text column as in the training loaders)
+# The expected label comes from the path: a component named 'ai' means AI, one
+# starting with 'human' means Human; CSVs elsewhere carry a `generated` column
+# (1 = AI, 0 = Human) instead.
+#
+# Documents are scored in batches by forked workers that share the loaded detector.
+# At most 2 batches per worker are outstanding, so memory stays bounded however large
+# the sets are. Per category, only streaming aggregates are kept: count, running
+# mean / variance of the human score (Welford), violations, and scoring time.
+#
+# Texts are scored by the model itself (clipped to 0-1 as in predict), without the
+# detector's 20-word minimum. Violations: a Human text scoring < --fp-threshold is a
+# false positive, an AI text scoring > --fn-threshold a false negative.
 
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 STRESS_DATA_DIR = os.path.join(os.path.dirname(__file__), 'stress_tests')
 ARTIFACTS_DIR = os.path.join(os.path.dirname(__file__), 'artifacts')
+DEFAULT_DATA_DIRS = [STRESS_DATA_DIR, os.path.join(REPO_ROOT, 'stress_tests'), os.path.join(REPO_ROOT, 'data')]
+
+HUMAN, AI = 'Human', 'AI'
+CRIMSON_FP_RATE = 0.10 # FP rate on a human category that gets flagged
+
+_detector = None # set in the parent before the workers are forked
+
+
+def _path_label(rel_path):
+    """Expected label from the path components, or None."""
+    for part in rel_path.replace('\\', '/').lower().split('/'):
+        if part == 'ai':
+            return AI
+        if part.startswith('human'):
+            return HUMAN
+    return None
+
+
+def discover_sources(roots):
+    """[(category, label or None, kind, paths)] for every directory / CSV under `roots`."""
+    sources = []
+    for root in roots:
+        if not os.path.isdir(root):
+            continue
+        prefix = os.path.basename(os.path.normpath(root))
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            rel = os.path.relpath(dirpath, root)
+            category = prefix if rel == '.' else f"{prefix}/{rel.replace(os.sep, '/')}"
+            txt = sorted(os.path.join(dirpath, f) for f in filenames if f.endswith('.txt'))
+            if txt:
+                sources.append((category, _path_label(category), 'txt', txt))
+            for name in sorted(f for f in filenames if f.endswith('.csv')):
+                csv_category = f"{category}/{os.path.splitext(name)[0]}"
+                sources.append((csv_category, _path_label(csv_category), 'csv', [os.path.join(dirpath, name)]))
+    return sources
+
+
+def iter_batches(sources, batch_size):
+    """Yields (category, [(text, label)]) batches; every batch holds one category."""
+    for category, label, kind, paths in sources:
+        batch = []
+        if kind == 'txt':
+            for path in paths:
+                with open(path, encoding='utf-8', errors='replace') as f:
+                    batch.append((f.read(), label))
+                if len(batch) == batch_size:
+                    yield category, batch
+                    batch = []
+        else:
+            source = Source(category, paths[0], label=None if label is None else float(label == AI))
+            try:
+                for texts, flags in source.iter_chunks(chunk_size=max(batch_size, 10000)):
+                    for text, flag in zip(texts, flags):
+                        batch.append((str(text), AI if flag >= 0.5 else HUMAN))
+                        if len(batch) == batch_size:
+                            yield category, batch
+                            batch = []
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Skipping {category}: {e}", file=sys.stderr)
+        if batch:
+            yield category, batch
+
+
+def synthetic_batches(batch_size):
+    """Hard-coded sanity cases, used when no threat sets are found."""
+    esl_texts = [
+        "I go to the shop. It is nice day. I like buy apple. The apple is red.",
+        "My friend name is John. He is good boy. We play football every day.",
+        "Homework is hard. But I try my best. Teacher is good.",
+        "The weather is hot. I drink water. Water is good for health.",
+        "I want to be doctor. Doctor help people. It is good job."
+    ] * 10
+    academic_texts = [
+        "In conclusion, the data suggests a significant correlation between the variables.",
+        "Moreover, the socio-economic impact cannot be overstated in this context.",
+        "However, previous studies fail to account for the stochastic nature of the system.",
+        "Furthermore, the methodology employed requires rigorous validation.",
+        "Thus, the hypothesis is supported by the empirical evidence presented."
+    ] * 10
+    ai_texts = [
+        "Furthermore, it is important to consider the various implications of this decision. Additionally, the results are promising.",
+        "In summary, the benefits of exercise are numerous. First, it improves health. Second, it boosts mood.",
+        "To begin with, renewable energy is crucial for the future. It reduces carbon emissions and saves money.",
+        "On one hand, technology is good. On the other hand, it has drawbacks. Therefore we must be careful.",
+        "Ultimately, success depends on hard work and dedication. Without these, failure is likely."
+    ] * 10
+    for category, texts, label in [('ESL Human', esl_texts, HUMAN), ('Academic Human', academic_texts, HUMAN),
+                                   ('Standard AI', ai_texts, AI)]:
+        for i in range(0, len(texts), batch_size):
+            yield category, [(text, label) for text in texts[i:i + batch_size]]
+
+
+def score_batch(texts):
+    """([(human_score, n_words)], busy seconds) for one batch, in this process."""
+    start = time.perf_counter()
+    scores = np.clip(np.asarray(_detector.pipeline.predict(texts), dtype=np.float64), 0.0, 1.0)
+    scored = [(float(score), len(text.split())) for text, score in zip(texts, scores)]
+    return scored, time.perf_counter() - start
+
+
+class CategoryStats:
+    """Streaming aggregates of one threat category."""
+    def __init__(self, name):
+        self.name = name
+        self.labels = set()
+        self.n = 0
+        self.words = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.false_positives = 0 # Human scored below fp_threshold
+        self.false_negatives = 0 # AI scored above fn_threshold
+        self.human_n = 0
+        self.ai_n = 0
+        self.busy_s = 0.0
+
+    def add(self, items, scored, busy_s, fp_threshold, fn_threshold):
+        self.busy_s += busy_s
+        for (_, label), (score, n_words) in zip(items, scored):
+            self.words += n_words
+            if label is not None:
+                self.labels.add(label)
+            self.n += 1
+            delta = score - self.mean
+            self.mean += delta / self.n
+            self.m2 += delta * (score - self.mean)
+            if label == HUMAN:
+                self.human_n += 1
+                self.false_positives += score < fp_threshold
+            elif label == AI:
+                self.ai_n += 1
+                self.false_negatives += score > fn_threshold
+
+    def summary(self):
+        return {
+            'labels': sorted(self.labels),
+            'scored': self.n,
+            'mean_human_score': self.mean if self.n else None,
+            'std_human_score': math.sqrt(self.m2 / self.n) if self.n else None,
+            'false_positives': self.false_positives,
+            'fp_rate': self.false_positives / self.human_n if self.human_n else None,
+            'false_negatives': self.false_negatives,
+            'fn_rate': self.false_negatives / self.ai_n if self.ai_n else None,
+            'scoring_s': self.busy_s,
+            # Per worker-second, so categories are comparable whatever the parallelism
+            'texts_per_s': self.n / self.busy_s if self.busy_s > 0 else None,
+            'words_per_s': self.words / self.busy_s if self.busy_s > 0 else None
+        }
+
 
 class StressTester:
-    def __init__(self):
-        self.pipeline = None
-        self.calibrator = None
-        self._load_artifacts()
+    """
+    Streams labeled threat sets through the detector.
+    workers: scoring processes (forked, sharing the loaded model); 1 scores in-process
+    """
+    def __init__(self, artifacts_dir=ARTIFACTS_DIR, workers=None, batch_size=64,
+                 fp_threshold=0.4, fn_threshold=0.6, artifact_format='auto'):
+        global _detector
+        _detector = CommercialDetector(artifacts_dir=artifacts_dir, artifact_format=artifact_format)
+        if _detector.pipeline is None:
+            print("CRITICAL: Failed to load artifacts", file=sys.stderr)
+            sys.exit(1)
+        print(f"Loaded production artifacts for stress testing ({_detector.artifact_format} format).")
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.fp_threshold = fp_threshold
+        self.fn_threshold = fn_threshold
+        self.categories = {}
+
+    def _record(self, category, items, scored, busy_s):
+        stats = self.categories.get(category)
+        if stats is None:
+            stats = self.categories[category] = CategoryStats(category)
+        stats.add(items, scored, busy_s, self.fp_threshold, self.fn_threshold)
 
-    def _load_artifacts(self):
+    def _run_serial(self, batches):
+        for category, items in batches:
+            scored, busy_s = score_batch([text for text, _ in items])
+            self._record(category, items, scored, busy_s)
+
+    def _run_parallel(self, batches):
+        # Model allocations move to the permanent generation so the children's
+        # collector leaves the shared pages alone
+        gc.collect()
+        gc.freeze()
+        pending = deque()
         try:
-            model_path = os.path.join(ARTIFACTS_DIR, 'model.joblib')
-            calib_path = os.path.join(ARTIFACTS_DIR, 'calibrator.joblib')
-            
-            if not os.path.exists(model_path):
-                raise FileNotFoundError(f"Model not found at {model_path}")
-            
-            self.pipeline = joblib.load(model_path)
-            self.calibrator = joblib.load(calib_path)
-            print("Loaded production artifacts for stress testing.")
-        except Exception as e:
-            print(f"CRITICAL: Failed to load artifacts: {e}")
-            sys.exit(1)
+            with multiprocessing.get_context('fork').Pool(self.workers) as pool:
+                for category, items in batches:
+                    if len(pending) >= 2 * self.workers:
+                        self._record(*self._collect(pending.popleft()))
+                    pending.append((category, items, pool.apply_async(score_batch, ([t for t, _ in items],))))
+                while pending:
+                    self._record(*self._collect(pending.popleft()))
+        finally:
+            gc.unfreeze()
 
-    def evaluate_threat(self, threat_name, texts, expected_label):
-        """
-        Evaluates a specific threat category.
-        expected_label: 'Human' (should be > 0.5) or 'AI' (should be < 0.5)
-        """
-        print(f"\nEvaluating Threat: {threat_name} (N={len(texts)})")
-        
-        # 1. Raw Prediction
-        raw_scores = self.pipeline.predict(texts)
-        
-        # 2. Calibration
-        probs = self.calibrator.transform(raw_scores)
-        
-        # 3. Stats
-        mean_prob = np.mean(probs)
-        std_prob = np.std(probs)
-        
-        # 4. Violation Check
-        if expected_label == 'Human':
-            # False Positive check: How many < 0.4?
-            failures = sum(1 for p in probs if p < 0.4)
-            fail_rate = failures / len(texts)
-            print(f"  -> Mean Score: {mean_prob:.3f} (±{std_prob:.3f})")
-            print(f"  -> False Positive Rate (< 0.4): {fail_rate*100:.1f}%")
-            if fail_rate > 0.10:
-                print("  -> CRIMSON FLAG: High FP rate on humans!")
+    @staticmethod
+    def _collect(job):
+        category, items, async_result = job
+        scored, busy_s = async_result.get()
+        return category, items, scored, busy_s
+
+    def run(self, batches):
+        """Scores every batch and returns the report dict."""
+        start = time.perf_counter()
+        if self.workers > 1:
+            self._run_parallel(batches)
         else:
-            # False Negative check: How many > 0.6?
-            failures = sum(1 for p in probs if p > 0.6)
-            fail_rate = failures / len(texts)
-            print(f"  -> Mean Score: {mean_prob:.3f} (±{std_prob:.3f})")
-            print(f"  -> False Negative Rate (> 0.6): {fail_rate*100:.1f}%")
-            
-        return probs
-
-    def generate_synthetic_stress_data(self):
-        """
-        Since we don't have the external CSVs yet, we generate synthetic 
-        stress cases to sanity check the logic.
-        """
-        print("\n--- Generating Synthetic Stress Data ---")
-        
-        # 1. Synthetic "ESL Human" (Simple, repetitive, but human logic)
-        esl_texts = [
-            "I go to the shop. It is nice day. I like buy apple. The apple is red.",
-            "My friend name is John. He is good boy. We play football every day.",
-            "Homework is hard. But I try my best. Teacher is good.",
-            "The weather is hot. I drink water. Water is good for health.",
-            "I want to be doctor. Doctor help people. It is good job."
-        ] * 10 
-        
-        # 2. Synthetic "Academic" (Formal, complex, specific starts)
-        academic_texts = [
-            "In conclusion, the data suggests a significant correlation between the variables.",
-            "Moreover, the socio-economic impact cannot be overstated in this context.",
-            "However, previous studies fail to account for the stochastic nature of the system.",
-            "Furthermore, the methodology employed requires rigorous validation.",
-            "Thus, the hypothesis is supported by the empirical evidence presented."
-        ] * 10
-
-        # 3. Synthetic "AI" (Robotic, perfect grammar, transition heavy)
-        ai_texts = [
-            "Furthermore, it is important to consider the various implications of this decision. Additionally, the results are promising.",
-            "In summary, the benefits of exercise are numerous. First, it improves health. Second, it boosts mood.",
-            "To begin with, renewable energy is crucial for the future. It reduces carbon emissions and saves money.",
-            "On one hand, technology is good. On the other hand, it has drawbacks. Therefore we must be careful.",
-            "Ultimately, success depends on hard work and dedication. Without these, failure is likely."
-        ] * 10
-        
+            self._run_serial(batches)
+        elapsed = time.perf_counter() - start
+
+        report = {name: stats.summary() for name, stats in self.categories.items()}
+        total = sum(s.n for s in self.categories.values())
         return {
-            'ESL Human': (esl_texts, 'Human'),
-            'Academic Human': (academic_texts, 'Human'),
-            'Standard AI': (ai_texts, 'AI')
+            'workers': self.workers,
+            'batch_size': self.batch_size,
+            'fp_threshold': self.fp_threshold,
+            'fn_threshold': self.fn_threshold,
+            'texts': total,
+            'wall_s': elapsed,
+            'texts_per_s': total / elapsed if elapsed > 0 else None,
+            'peak_rss_mb': peak_rss_mb(),
+            'categories': report
         }
 
-    def run(self):
-        data = self.generate_synthetic_stress_data()
-        
-        for threat, (texts, label) in data.items():
-            self.evaluate_threat(threat, texts, label)
+
+def print_report(report):
+    for name, s in report['categories'].items():
+        print(f"\nThreat: {name} ({'/'.join(s['labels']) or 'unlabeled'}, N={s['scored']})")
+        if s['scored']:
+            print(f"  -> Mean Score: {s['mean_human_score']:.3f} (±{s['std_human_score']:.3f})")
+        if s['fp_rate'] is not None:
+            print(f"  -> False Positive Rate (< {report['fp_threshold']}): {s['fp_rate'] * 100:.1f}%")
+            if s['fp_rate'] > CRIMSON_FP_RATE:
+                print("  -> CRIMSON FLAG: High FP rate on humans!")
+        if s['fn_rate'] is not None:
+            print(f"  -> False Negative Rate (> {report['fn_threshold']}): {s['fn_rate'] * 100:.1f}%")
+        if s['texts_per_s'] is not None:
+            print(f"  -> Throughput: {s['texts_per_s']:.1f} texts/s, {s['words_per_s']:.0f} words/s per worker")
+    print(f"\n{report['texts']} texts in {report['wall_s']:.1f}s with {report['workers']} worker(s):"
+          f" {report['texts_per_s'] or 0:.1f} texts/s, peak RSS {report['peak_rss_mb']:.0f} MB")
+
 
 if __name__ == "__main__":
-    tester = StressTester()
-    tester.run()
+    parser = argparse.ArgumentParser(description='Stress-test the detector on labeled threat sets')
+    parser.add_argument('--data', nargs='*', default=None,
+                        help='Threat set directories (default: scripts/stress_tests, stress_tests, data)')
+    parser.add_argument('--synthetic', action='store_true', help='Score the built-in synthetic cases only')
+    parser.add_argument('--artifacts', default=ARTIFACTS_DIR, help='Artifacts directory')
+    parser.add_argument('--format', default='auto', choices=['auto', 'fast', 'joblib'], help='Artifact format to load')
+    parser.add_argument('--workers', type=int, default=None, help='Scoring processes (default: one per CPU)')
+    parser.add_argument('--batch-size', type=int, default=64, help='Texts per scoring batch')
+    parser.add_argument('--fp-threshold', type=float, default=0.4, help='Human texts scoring below this are FPs')
+    parser.add_argument('--fn-threshold', type=float, default=0.6, help='AI texts scoring above this are FNs')
+    parser.add_argument('--output', default=None, help='Write the report as JSON to this path')
+    args = parser.parse_args()
+
+    if args.batch_size < 1 or (args.workers is not None and args.workers < 1):
+        parser.error('--batch-size and --workers must be >= 1')
+    sources = [] if args.synthetic else discover_sources(args.data if args.data is not None else DEFAULT_DATA_DIRS)
+    if sources:
+        print(f"Streaming {len(sources)} threat categories")
+        batches = iter_batches(sources, args.batch_size)
+    else:
+        print("\n--- No threat sets found: using synthetic stress data ---")
+        batches = synthetic_batches(args.batch_size)
+
+    tester = StressTester(args.artifacts, args.workers, args.batch_size, args.fp_threshold, args.fn_threshold, args.format)
+    report = tester.run(batches)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
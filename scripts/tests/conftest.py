@@ -0,0 +1,92 @@
+import glob
+import os
+import sys
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import SGDRegressor
+from sklearn.pipeline import FeatureUnion, Pipeline
+from sklearn.preprocessing import PowerTransformer, StandardScaler
+
+# Add standard import path for shared modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from scripts.api.artifact_store import export_fast_artifacts
+from scripts.features.stylometry import StylometryExtractor
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data'))
+
+
+def corpus_paragraphs(sub, min_words=1):
+    """Non-blank paragraphs of the bundled .txt files under data/<sub>, in path order."""
+    paragraphs = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, sub, '**', '*.txt'), recursive=True)):
+        with open(path, encoding='utf-8', errors='replace') as f:
+            paragraphs.extend(p for p in f.read().split('\n\n') if p.strip() and len(p.split()) >= min_words)
+    return paragraphs
+
+
+# Inputs the fast paths special-case: empty and blank texts, fewer than 3 characters,
+# fewer than 5 words, non-ASCII (including characters whose lowercase changes the
+# length and characters outside the BMP), whitespace runs and sentence punctuation only
+EDGE_TEXTS = [
+    '', ' ', '\n\n', 'a', 'ab', 'abc', 'Hi!', 'Two words.', 'one two three four',
+    'Café crème brûlée, naïve façade — déjà vu.',
+    'İstanbul İzmir: DİKKAT, büyük harfler.',
+    'Straße  ÜBER   alles\t\tund\n\nmehr; ja.',
+    '日本語のテキストです。これはテストです！',
+    'Emoji 😀 and 🚀 rockets, plus 𝔘𝔫𝔦𝔠𝔬𝔡𝔢 letters.',
+    'ΣΊΣΥΦΟΣ was painted... Was it? Yes -- it was finished!!!',
+    '...!!!???',
+    'word ' * 60,
+]
+
+
+@pytest.fixture(scope='session')
+def human_paragraphs():
+    return corpus_paragraphs('human_mass')
+
+
+@pytest.fixture(scope='session')
+def ai_paragraphs():
+    return corpus_paragraphs('ai')
+
+
+@pytest.fixture(scope='session')
+def edge_texts():
+    return list(EDGE_TEXTS)
+
+
+def build_pipeline():
+    """Same shape as train_super_detector.py's pipeline, sized for a test."""
+    return Pipeline([
+        ('features', FeatureUnion([
+            ('word_tfidf', TfidfVectorizer(ngram_range=(1, 2), min_df=2, max_features=3000, sublinear_tf=True,
+                                           stop_words='english')),
+            ('char_tfidf', TfidfVectorizer(analyzer='char', ngram_range=(3, 5), min_df=2, max_features=3000,
+                                           sublinear_tf=True)),
+            ('stylometry', Pipeline([
+                ('extractor', StylometryExtractor()),
+                ('scaler', StandardScaler()),
+                ('normalizer', PowerTransformer(method='yeo-johnson'))
+            ]))
+        ], transformer_weights={'word_tfidf': 1.2, 'char_tfidf': 1.5, 'stylometry': 1.5})),
+        ('regressor', SGDRegressor(loss='huber', max_iter=1000, alpha=0.001, epsilon=0.1, learning_rate='adaptive',
+                                   eta0=0.01, random_state=42))
+    ])
+
+
+@pytest.fixture(scope='session')
+def artifacts(tmp_path_factory, human_paragraphs, ai_paragraphs):
+    """Artifacts directory with model.joblib, metadata.pkl and the fast export (unchecked)."""
+    texts = human_paragraphs[:200] + ai_paragraphs[:200]
+    y = np.array([1.0] * len(human_paragraphs[:200]) + [0.0] * len(ai_paragraphs[:200]))
+    pipeline = build_pipeline().fit(texts, y)
+    metadata = {'model_version': 'test', 'stylometry_version': '1.0.0'}
+    out = str(tmp_path_factory.mktemp('artifacts'))
+    joblib.dump(pipeline, os.path.join(out, 'model.joblib'))
+    joblib.dump(metadata, os.path.join(out, 'metadata.pkl'))
+    export_fast_artifacts(pipeline, out, metadata)
+    return out
@@ -0,0 +1,134 @@
+import os
+import shutil
+
+from scripts.api.cache import ResultCache, artifact_fingerprint, normalize_text
+from scripts.api.predict import CommercialDetector
+
+
+def _key(text, domain=None, fingerprint='fp'):
+    return ResultCache.make_key(text, domain, '1.0.0', fingerprint)
+
+
+def test_lru_eviction():
+    cache = ResultCache(max_entries=3)
+    for i in range(3):
+        cache.put(_key(f"text {i}"), {'i': i})
+    assert cache.get(_key("text 0")) == {'i': 0} # now most recently used
+    cache.put(_key("text 3"), {'i': 3})
+    assert cache.get(_key("text 1")) is None # least recently used, evicted
+    assert [cache.get(_key(f"text {i}")) for i in (0, 2, 3)] == [{'i': 0}, {'i': 2}, {'i': 3}]
+    stats = cache.stats()
+    assert (stats['evictions'], stats['memory_entries'], stats['misses']) == (1, 3, 1)
+
+
+def test_disabled_memory_tier():
+    cache = ResultCache(max_entries=0)
+    cache.put(_key("text"), {'a': 1})
+    assert cache.get(_key("text")) is None
+
+
+def test_keys():
+    # Whitespace runs do not change the result; domain, version and artifacts do
+    assert normalize_text("a  b\n\nc\t d") == "a b c d"
+    assert _key("a  b\n\nc") == _key("a b c")
+    assert _key("a b") != _key("a b", domain='academic')
+    assert _key("a b") != _key("a b", fingerprint='other')
+    assert _key("a b") != ResultCache.make_key("a b", None, '2.0.0', 'fp')
+
+
+def test_sqlite_persistence(tmp_path):
+    db_path = str(tmp_path / 'cache.sqlite')
+    cache = ResultCache(max_entries=2, db_path=db_path)
+    cache.bind('fp')
+    for i in range(5):
+        cache.put(_key(f"text {i}"), {'i': i}, 'fp')
+    assert cache.get(_key("text 0")) == {'i': 0} # evicted from memory, served from disk
+    assert cache.stats()['disk_hits'] == 1
+    cache.close()
+
+    reopened = ResultCache(max_entries=2, db_path=db_path)
+    reopened.bind('fp')
+    assert [reopened.get(_key(f"text {i}")) for i in range(5)] == [{'i': i} for i in range(5)]
+    assert reopened.stats()['disk_hits'] == 5
+    reopened.close()
+
+
+def test_disk_size_eviction(tmp_path):
+    cache = ResultCache(max_entries=0, db_path=str(tmp_path / 'cache.sqlite'), max_db_bytes=1000)
+    for i in range(20):
+        cache.put(_key(f"text {i}"), {'payload': 'x' * 90, 'i': i}, 'fp')
+    stats = cache.stats()
+    assert stats['db_bytes'] <= 1000 and stats['evictions'] > 0
+    assert cache.get(_key("text 19")) is not None # most recent rows are kept
+    assert cache.get(_key("text 0")) is None
+    cache.close()
+
+
+def test_fingerprint_change_invalidates(tmp_path):
+    db_path = str(tmp_path / 'cache.sqlite')
+    cache = ResultCache(db_path=db_path)
+    cache.bind('old')
+    cache.put(_key("text", fingerprint='old'), {'a': 1}, 'old')
+    cache.close()
+
+    retrained = ResultCache(db_path=db_path)
+    retrained.bind('new') # rows of other artifacts are dropped
+    assert retrained.stats()['db_bytes'] == 0
+    assert retrained.get(_key("text", fingerprint='old')) is None
+    retrained.close()
+
+
+def test_artifact_fingerprint(tmp_path):
+    path = tmp_path / 'model.joblib'
+    path.write_bytes(b'v1')
+    first = artifact_fingerprint([str(path), str(tmp_path / 'missing.pkl')])
+    assert artifact_fingerprint([str(path), str(tmp_path / 'missing.pkl')]) == first
+    path.write_bytes(b'v2 retrained')
+    assert artifact_fingerprint([str(path), str(tmp_path / 'missing.pkl')]) != first
+
+
+def test_detector_results_follow_the_artifacts(artifacts, tmp_path, human_paragraphs):
+    model_dir = str(tmp_path / 'artifacts')
+    shutil.copytree(artifacts, model_dir)
+    db_path = str(tmp_path / 'cache.sqlite')
+    text = ' '.join(human_paragraphs[:2])
+
+    detector = CommercialDetector(artifacts_dir=model_dir, cache=ResultCache(db_path=db_path))
+    first = detector.predict(text)
+    assert detector.predict(text) == first
+    assert detector.cache.stats()['hits'] == 1
+    detector.cache.close()
+
+    # A retrain rewrites the artifacts: persisted results of the old model are dropped
+    metadata = os.path.join(model_dir, 'metadata.pkl')
+    with open(metadata, 'ab') as f:
+        f.write(b'\n') # ignored by pickle.load; changes the file's size
+    retrained = CommercialDetector(artifacts_dir=model_dir, cache=ResultCache(db_path=db_path))
+    assert retrained.fingerprint != detector.fingerprint
+    retrained.predict(text)
+    assert retrained.cache.stats()['hits'] == 0
+    retrained.cache.close()
+
+
+def test_results_are_copies():
+    cache = ResultCache()
+    result = {'classification': 'Human', 'meta': {'raw_score': 0.7}, 'segments': {'ai_sentences': []}}
+    cache.put(_key("text"), result)
+    result['meta']['raw_score'] = 0.0 # the caller keeps mutating its result
+
+    first = cache.get(_key("text"))
+    assert first['meta']['raw_score'] == 0.7
+    first['meta']['timings'] = {'total': 1.0}
+    first['segments']['ai_sentences'].append('x')
+    assert cache.get(_key("text")) == {'classification': 'Human', 'meta': {'raw_score': 0.7},
+                                       'segments': {'ai_sentences': []}}
+
+
+def test_detector_results_are_copies(artifacts, human_paragraphs):
+    detector = CommercialDetector(artifacts_dir=artifacts, cache=ResultCache())
+    text = ' '.join(human_paragraphs[2:4])
+    first = detector.predict(text, timings=True)
+    assert 'timings' in first['meta']
+    first['mlDetails'].clear()
+    second = detector.predict(text)
+    assert second['mlDetails'] and 'timings' not in second['meta']
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from scripts.features.char_ngrams import CharNgramCounter
+
+# CharNgramCounter must count exactly what the fitted TfidfVectorizer counts: the
+# matrices built from its counts are compared with TfidfVectorizer.transform entry for
+# entry (indices, indptr and data), not up to a tolerance.
+
+
+def _counter_matrix(counter, texts, n_features):
+    """CSR count matrix of `texts` from CharNgramCounter.count_arrays (columns ascending)."""
+    parts = [counter.count_arrays(text) for text in texts]
+    indptr = np.concatenate(([0], np.cumsum([len(cols) for cols, _ in parts])))
+    indices = np.concatenate([cols for cols, _ in parts]) if parts else np.empty(0, dtype=np.int64)
+    data = np.concatenate([counts for _, counts in parts]).astype(np.float64) if parts else np.empty(0)
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(texts), n_features))
+
+
+def _assert_same_csr(got, expected):
+    expected = expected.tocsr()
+    expected.sort_indices()
+    assert got.shape == expected.shape
+    assert np.array_equal(got.indptr, expected.indptr)
+    assert np.array_equal(got.indices, expected.indices)
+    assert np.array_equal(got.data, expected.data)
+
+
+@pytest.fixture(scope='module')
+def fit_texts(human_paragraphs, ai_paragraphs, edge_texts):
+    # Unicode edge texts in the fit data put non-ASCII characters into the vocabulary
+    return human_paragraphs[:150] + ai_paragraphs[:150] + edge_texts * 3
+
+
+@pytest.fixture(scope='module')
+def eval_texts(human_paragraphs, ai_paragraphs, edge_texts):
+    return edge_texts + human_paragraphs[150:190] + ai_paragraphs[150:190] + [t.upper() for t in edge_texts]
+
+
+@pytest.mark.parametrize('lowercase', [True, False])
+@pytest.mark.parametrize('ngram_range', [(3, 5), (1, 3)])
+def test_counts_match_tfidf_vectorizer(fit_texts, eval_texts, lowercase, ngram_range):
+    # use_idf=False, norm=None: TfidfVectorizer.transform returns the raw n-gram counts
+    vec = TfidfVectorizer(analyzer='char', ngram_range=ngram_range, lowercase=lowercase, min_df=2,
+                          use_idf=False, norm=None).fit(fit_texts)
+    counter = CharNgramCounter.build(vec.vocabulary_, ngram_range, lowercase)
+    assert counter is not None
+    assert any(ord(c) > 127 for term in vec.vocabulary_ for c in term)
+
+    got = _counter_matrix(counter, eval_texts, len(vec.vocabulary_))
+    _assert_same_csr(got, vec.transform(eval_texts))
+    assert got.getrow(eval_texts.index('')).nnz == 0
+
+
+def test_tfidf_from_counter_matches_transform(fit_texts, eval_texts):
+    # The detector's char branch settings; only the counting differs from transform()
+    vec = TfidfVectorizer(analyzer='char', ngram_range=(3, 5), min_df=2, max_features=6000,
+                          sublinear_tf=True).fit(fit_texts)
+    counter = CharNgramCounter.build(vec.vocabulary_, (3, 5), True)
+    counts = _counter_matrix(counter, eval_texts, len(vec.vocabulary_))
+    _assert_same_csr(vec._tfidf.transform(counts), vec.transform(eval_texts))
+
+
+def test_short_and_empty_texts(fit_texts):
+    vec = TfidfVectorizer(analyzer='char', ngram_range=(3, 5), min_df=2).fit(fit_texts)
+    counter = CharNgramCounter.build(vec.vocabulary_, (3, 5), True)
+    texts = ['', ' ', 'a', 'ab', 'é!', '😀😀']
+    for text in texts: # shorter than the smallest n-gram
+        cols, counts = counter.count_arrays(text)
+        assert len(cols) == 0 and len(counts) == 0
+        assert counter.counts(text) == {}
+    assert vec.transform(texts).nnz == 0
+
+
+def test_stored_keys_match_built_counter(fit_texts, eval_texts):
+    # Compacted artifacts rebuild the counter from its stored arrays (artifact_store._TfidfBranch)
+    vec = TfidfVectorizer(analyzer='char', ngram_range=(3, 5), min_df=2).fit(fit_texts)
+    built = CharNgramCounter.build(vec.vocabulary_, (3, 5), True)
+    stored = CharNgramCounter(built.alphabet.copy(), built.keys.copy(), built.columns.copy(), (3, 5), True)
+    for text in eval_texts:
+        a_cols, a_counts = built.count_arrays(text)
+        b_cols, b_counts = stored.count_arrays(text)
+        assert np.array_equal(a_cols, b_cols) and np.array_equal(a_counts, b_counts)
+
+
+def test_wide_alphabet_falls_back():
+    # 2^13 distinct characters: 5-grams need 70 bits, so there is no packed counter
+    vocabulary = {''.join(chr(0x4E00 + i + k) for k in range(5)): i for i in range(2 ** 13)}
+    assert CharNgramCounter.build(vocabulary, (3, 5), True) is None
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from scripts.features.minhash import shingle_hashes
+from scripts.training.dedup import BloomFilter, Deduplicator, ScalableBloomFilter, exact_key, row_keys
+
+
+def _edit(text):
+    # One word replaced in the middle: a near-duplicate at the default threshold
+    words = text.split()
+    words[len(words) // 2] = 'edited'
+    return ' '.join(words)
+
+
+@pytest.fixture(scope='module')
+def documents(human_paragraphs):
+    # Distinct paragraphs: the corpus repeats some, and quotes others almost verbatim
+    docs, shingles = [], []
+    for p in dict.fromkeys(p for p in human_paragraphs if len(p.split()) >= 100):
+        s = set(shingle_hashes(p).tolist())
+        if all(len(s & other) < 0.5 * len(s | other) for other in shingles):
+            docs.append(p)
+            shingles.append(s)
+    assert len(docs) >= 30
+    return docs
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 1e-3)
+    keys = np.arange(1000, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    bloom.add(keys)
+    assert bloom.contains(keys).all()
+    others = np.arange(1000, 101000, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    assert bloom.contains(others).mean() < 3e-3
+
+
+def test_scalable_filter_grows_with_keys():
+    bloom = ScalableBloomFilter(100, 1e-3)
+    assert len(bloom.filters) == 1
+    start_bytes = bloom.nbytes
+    keys = np.arange(10000, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    for i in range(0, len(keys), 50):
+        bloom.add(keys[i:i + 50])
+    # Stages double: 100 + 200 + ... + 6400 >= 10000 keys
+    assert len(bloom.filters) == 7
+    assert [f.capacity for f in bloom.filters] == [100 << i for i in range(7)]
+    assert all(f.count <= f.capacity for f in bloom.filters)
+    assert bloom.count == len(keys) and bloom.contains(keys).all()
+    assert bloom.nbytes > 50 * start_bytes
+    assert bloom.error_rate < 1e-3
+    others = np.arange(10000, 210000, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    # The measured rate follows the estimate, up to the sampling noise of 200000 probes
+    assert bloom.contains(others).mean() < bloom.error_rate + 4 * np.sqrt(bloom.error_rate / len(others))
+
+
+def test_filter_is_sized_by_rows_kept(documents):
+    small = Deduplicator(capacity=16)
+    assert small.summary()['filter_stages'] == 1
+    kept = small.keep(documents)
+    assert sum(kept) >= len(documents) - 1
+    assert small.summary()['filter_stages'] > 1 # grown past its first stage
+    assert small.summary()['filter_mb'] < 0.1
+    assert Deduplicator().summary()['filter_mb'] < 2.0 # not sized for millions of rows up front
+
+
+def test_near_duplicates_dropped_distinct_kept(documents):
+    dedup = Deduplicator(0.8)
+    assert dedup.keep(documents, 'a') == [True] * len(documents)
+
+    exact = [' '.join(doc.upper().split()) for doc in documents[:10]] # case / whitespace only
+    # Longest documents: one edit leaves Jaccard >= 0.94, where each is caught with
+    # probability >= 0.997 (the S-curve is still at 0.96 for 100 words, J = 0.9)
+    near = [_edit(doc) for doc in sorted(documents[10:], key=len)[-10:]]
+    fresh = ['Completely new text number %d, written for this test, with enough words to shingle.' % i
+             for i in range(10)]
+    assert dedup.keep(exact + near + fresh, 'b') == [False] * 20 + [True] * 10
+    counts = dedup.summary()['sources']['b']
+    assert counts == {'rows': 30, 'exact': 10, 'near': 10}
+    # First occurrence wins, also within one call
+    assert dedup.keep(['Same row twice here, now.', 'Same row twice here, now.'], 'c') == [True, False]
+
+
+def test_wordless_texts_use_the_exact_key_only():
+    # No \w tokens, no shingles: their MinHash signatures are all equal, so band keys
+    # would make every such text a near-duplicate of the first
+    texts = ['...', '!!!', '???', '', '—', '. . .', '...']
+    keys, shingled = row_keys(texts, 128, 5, 9, 13)
+    assert not shingled.any()
+    assert (keys[:, 1:] == keys[0, 1:]).all() # identical band keys
+    assert keys[0, 0] == exact_key('...')
+
+    dedup = Deduplicator(0.8)
+    assert dedup.keep(texts) == [True] * 6 + [False]
+    assert dedup.summary()['sources']['']['exact'] == 1
+    assert dedup.keep(['Words finally appear here.', '!!!']) == [True, False]
+
+
+def test_parallel_keys_match(documents):
+    serial = Deduplicator(0.8)
+    with Deduplicator(0.8, n_jobs=2) as parallel:
+        texts = (documents + ['...', '!!!'] + [_edit(d) for d in documents]) * 2
+        assert parallel.keep(texts) == serial.keep(texts)
@@ -0,0 +1,64 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+from scipy import stats
+
+from scripts.api.artifact_store import AGREEMENT_TOL, FAST_DIR, FastPipeline, _yeo_johnson, load_fast_pipeline
+from scripts.api.predict import CommercialDetector
+from scripts.training.compact import compact_fast_artifacts
+
+# The fast format is checked against pipeline.predict inside export_fast_artifacts only
+# when check_texts are given, and only at export time. These tests score a fixed set of
+# texts with the exported, memory-mapped artifacts as loaded for serving and with the
+# joblib pipeline (the `artifacts` fixture, see conftest.py), so drift in FastPipeline
+# or _yeo_johnson fails here.
+
+
+@pytest.fixture(scope='module')
+def check_texts(human_paragraphs, ai_paragraphs, edge_texts):
+    # Held out from the fit, plus edge cases (empty, short, non-ASCII)
+    return human_paragraphs[200:260] + ai_paragraphs[200:260] + edge_texts
+
+
+def test_loaded_fast_pipeline_matches_joblib(artifacts, check_texts):
+    metadata = joblib.load(os.path.join(artifacts, 'metadata.pkl'))
+    fast = load_fast_pipeline(artifacts, metadata)
+    assert isinstance(fast, FastPipeline)
+    assert any(isinstance(b.weights, np.memmap) for b in fast.branches) # served from the mmap'd files
+    pipeline = joblib.load(os.path.join(artifacts, 'model.joblib'))
+
+    diff = np.abs(fast.predict(check_texts) - pipeline.predict(check_texts))
+    assert diff.max() <= AGREEMENT_TOL
+
+
+def test_lossless_compaction_matches_joblib(artifacts, check_texts, tmp_path):
+    compact_dir = str(tmp_path / FAST_DIR)
+    compact_fast_artifacts(os.path.join(artifacts, FAST_DIR), compact_dir, threshold=0.0, dtype='float64')
+    pipeline = joblib.load(os.path.join(artifacts, 'model.joblib'))
+
+    diff = np.abs(FastPipeline(compact_dir).predict(check_texts) - pipeline.predict(check_texts))
+    assert diff.max() <= AGREEMENT_TOL
+
+
+def test_detector_formats_agree(artifacts, check_texts):
+    fast = CommercialDetector(artifacts_dir=artifacts, artifact_format='fast')
+    slow = CommercialDetector(artifacts_dir=artifacts, artifact_format='joblib')
+    assert (fast.artifact_format, slow.artifact_format) == ('fast', 'joblib')
+
+    for a, b in zip(fast.predict_batch(check_texts), slow.predict_batch(check_texts)):
+        assert a.keys() == b.keys()
+        if 'meta' in a:
+            assert abs(a['meta']['raw_score'] - b['meta']['raw_score']) <= AGREEMENT_TOL
+            assert (a['classification'], a['confidence']) == (b['classification'], b['confidence'])
+            # Stylometry details come from the same feature rows in both formats
+            scores = ('aiProbability', 'humanProbability')
+            assert {k: v for k, v in a['mlDetails'].items() if k not in scores} == \
+                {k: v for k, v in b['mlDetails'].items() if k not in scores}
+
+
+@pytest.mark.parametrize('lmbda', [-1.5, 0.0, 1e-20, 0.5, 1.0, 2.0, 2.0 + 1e-17, 3.2])
+def test_yeo_johnson_matches_scipy(lmbda):
+    x = np.concatenate([np.linspace(-6.0, 6.0, 241), [0.0, -1e-12, 1e-12, -40.0, 40.0]])
+    np.testing.assert_allclose(_yeo_johnson(x, lmbda), stats.yeojohnson(x, lmbda), rtol=1e-12, atol=1e-14)
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from scripts.features.stylometry import StylometryExtractor
+from scripts.tests.conftest import build_pipeline
+from scripts.training.feature_store import FeatureStore
+
+# FeatureStore.fit_transform / transform promise FeatureUnion.fit_transform / transform's
+# output, whether features are computed now or read back from disk, and must not serve
+# features of another extractor or configuration.
+
+
+@pytest.fixture(scope='module')
+def splits(human_paragraphs, ai_paragraphs):
+    texts = list(dict.fromkeys(human_paragraphs[:80] + ai_paragraphs)) # the corpus repeats some
+    return texts[::2], texts[1::2]
+
+
+def _fresh(train, test, **params):
+    union = build_pipeline().named_steps['features']
+    union.set_params(**params)
+    return union.fit_transform(train).toarray(), union.transform(test).toarray()
+
+
+def _stored(store, train, test, **params):
+    union = build_pipeline().named_steps['features']
+    union.set_params(**params)
+    return store.fit_transform(union, train).toarray(), store.transform(union, test).toarray()
+
+
+def test_stored_features_match_fresh_ones(tmp_path, splits):
+    train, test = splits
+    expected = _fresh(train, test)
+    first = FeatureStore(str(tmp_path))
+    for got, want in zip(_stored(first, train, test), expected):
+        assert np.array_equal(got, want)
+    assert first.stats()['stylometry_rows']['hits'] == 0
+
+    # A rerun (new process: a new store on the same root) reads everything back
+    rerun = FeatureStore(str(tmp_path))
+    for got, want in zip(_stored(rerun, train, test), expected):
+        assert np.array_equal(got, want)
+    assert rerun.stats() == {'stylometry_rows': {'hits': len(train) + len(test), 'misses': 0},
+                             'tfidf_blocks': {'hits': 4, 'misses': 0}}
+
+
+def test_changed_config_is_not_served(tmp_path, splits):
+    train, test = splits
+    _stored(FeatureStore(str(tmp_path)), train, test)
+    store = FeatureStore(str(tmp_path))
+    got = _stored(store, train, test, word_tfidf__max_features=50)
+    for got_block, want in zip(got, _fresh(train, test, word_tfidf__max_features=50)):
+        assert np.array_equal(got_block, want)
+    assert got[0].shape[1] < _fresh(train, test)[0].shape[1]
+    # Only the changed branch is refitted; the stylometry rows are reused
+    assert store.stats()['tfidf_blocks'] == {'hits': 2, 'misses': 2}
+    assert store.stats()['stylometry_rows']['misses'] == 0
+
+
+class _OtherExtractor(StylometryExtractor):
+    def transform(self, X):
+        return super().transform(X) * 2.0
+
+
+def test_changed_extractor_is_not_served(tmp_path, splits):
+    train, _ = splits
+    FeatureStore(str(tmp_path)).stylometry_rows(StylometryExtractor(), train)
+
+    # A new STYLOMETRY_VERSION re-extracts
+    bumped = FeatureStore(str(tmp_path), stylometry_version='test-bump')
+    bumped.stylometry_rows(StylometryExtractor(), train)
+    assert bumped.stats()['stylometry_rows'] == {'hits': 0, 'misses': len(train)}
+
+    # So does another extractor class, and it gets its own rows
+    store = FeatureStore(str(tmp_path))
+    other = store.stylometry_rows(_OtherExtractor(), train)
+    assert store.stats()['stylometry_rows'] == {'hits': 0, 'misses': len(train)}
+    assert np.array_equal(other, 2.0 * StylometryExtractor().transform(train))
+    assert np.array_equal(store.stylometry_rows(StylometryExtractor(), train), StylometryExtractor().transform(train))
+    assert store.stats()['stylometry_rows']['hits'] == len(train)
@@ -0,0 +1,70 @@
+import pytest
+
+from scripts.api.incremental import split_paragraphs
+from scripts.api.predict import CommercialDetector
+
+# predict_incremental promises the same result as predict: the paragraph contributions
+# it reuses from earlier versions of a document must aggregate to exactly the score of
+# rescanning the whole text. Each test edits a document version by version through one
+# detector (so paragraphs are served from its cache) and compares every version with
+# predict() on a fresh detector, without a tolerance.
+
+
+@pytest.fixture(scope='module')
+def detectors(artifacts):
+    incremental = CommercialDetector(artifacts_dir=artifacts, artifact_format='fast')
+    full = CommercialDetector(artifacts_dir=artifacts, artifact_format='fast')
+    assert incremental.artifact_format == 'fast'
+    return incremental, full
+
+
+@pytest.fixture(scope='module')
+def paragraphs(human_paragraphs, ai_paragraphs):
+    return [p.strip() for p in human_paragraphs[:8] + ai_paragraphs[:4]]
+
+
+def _assert_versions_match(detectors, versions):
+    incremental, full = detectors
+    hits = incremental.incremental.hits if incremental.incremental is not None else 0
+    for text in versions:
+        assert incremental.predict_incremental(text) == full.predict(text)
+    return incremental.incremental.hits - hits
+
+
+def test_paragraph_edit(detectors, paragraphs):
+    doc = paragraphs[:6]
+    edited = list(doc)
+    edited[2] = edited[2].replace(' the ', ' a ', 1) + ' One more sentence was added here.'
+    edited_again = list(edited)
+    edited_again[4] = 'Rewritten: ' + edited_again[4].lower()
+    versions = ['\n\n'.join(v) for v in (doc, edited, edited_again)]
+    assert _assert_versions_match(detectors, versions) > 0 # unchanged paragraphs were reused
+
+
+def test_paragraph_insert_delete_reorder(detectors, paragraphs):
+    doc = paragraphs[6:12]
+    inserted = doc[:3] + [paragraphs[0]] + doc[3:]
+    deleted = inserted[:1] + inserted[2:]
+    reordered = deleted[::-1]
+    swapped = reordered[1:2] + reordered[:1] + reordered[2:]
+    versions = ['\n\n'.join(v) for v in (doc, inserted, deleted, reordered, swapped)]
+    assert _assert_versions_match(detectors, versions) > 0
+
+
+def test_paragraph_separators(detectors, paragraphs):
+    # Separators are part of the paragraph before them: changing one rescans only it
+    doc = paragraphs[:4]
+    versions = ['\n\n'.join(doc), '\n\n\n'.join(doc), ' \n \n'.join(doc), '\r\n\r\n'.join(doc),
+                '\n\n'.join(doc) + '\n\n', '\n\n'.join(doc[:2]) + '\n\n  \n\n' + '\n\n'.join(doc[2:])]
+    for text in versions:
+        assert ''.join(split_paragraphs(text)) == text
+    _assert_versions_match(detectors, versions)
+
+
+def test_edge_texts(detectors, paragraphs, edge_texts):
+    doc = '\n\n'.join(paragraphs[:3])
+    versions = []
+    for edge in edge_texts:
+        # On their own (mostly too short to score), as a paragraph, and glued into one
+        versions += [edge, doc + '\n\n' + edge, edge + '\n\n' + doc, doc + ' ' + edge + '\n\n' + paragraphs[3]]
+    _assert_versions_match(detectors, versions)
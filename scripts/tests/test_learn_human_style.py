@@ -0,0 +1,206 @@
+import glob
+import os
+import random
+
+import numpy as np
+import pytest
+
+from scripts.learn_human_style import (
+    RunningStats, StyleSummary, analyze_text, build_profile, open_state, update_state
+)
+from scripts.tests.conftest import DATA_DIR
+
+# The profile is merged from per-file StyleSummary objects, in whatever order the
+# worker pool returns them. Means and M2 are exact, so any merge order and chunking
+# must give the profile of one serial pass over all the sentences, digit for digit.
+
+
+def _file_paths():
+    return sorted(glob.glob(os.path.join(DATA_DIR, 'human_mass', '**', '*.txt'), recursive=True))
+
+
+def _file_data():
+    data = []
+    for path in _file_paths():
+        with open(path, encoding='utf-8') as f:
+            result = analyze_text(f.read())
+        if result:
+            data.append(result)
+    return data
+
+
+@pytest.fixture(scope='module')
+def file_data():
+    data = _file_data()
+    assert len(data) > 10
+    return data
+
+
+def _serial(file_data):
+    # One pass: every statistic extended with all its values at once
+    summary = StyleSummary()
+    summary.add({key: [v for data in file_data for v in data[key]] for key in file_data[0]})
+    return summary
+
+
+def _file_summaries(file_data):
+    summaries = []
+    for data in file_data:
+        summary = StyleSummary()
+        summary.add(data)
+        summaries.append(summary)
+    return summaries
+
+
+def _merge(summaries):
+    merged = StyleSummary()
+    for summary in summaries:
+        merged.merge(summary)
+    return merged
+
+
+def test_merge_order_matches_serial_pass(file_data):
+    expected = build_profile(_serial(file_data))
+    rng = random.Random(0)
+    for _ in range(5):
+        summaries = _file_summaries(file_data)
+        rng.shuffle(summaries)
+        assert build_profile(_merge(summaries)) == expected
+
+
+@pytest.mark.parametrize('chunk', [1, 3, 16])
+def test_chunked_merge_matches_serial_pass(file_data, chunk):
+    # As the pool does: a summary per chunk of files, serialized, then merged
+    summaries = _file_summaries(file_data)
+    random.Random(chunk).shuffle(summaries)
+    chunks = [StyleSummary.from_dict(_merge(summaries[i:i + chunk]).to_dict())
+              for i in range(0, len(summaries), chunk)]
+    merged = _merge(chunks[::-1])
+    serial = _serial(file_data)
+    assert build_profile(merged) == build_profile(serial)
+    assert merged.to_dict()['lengths'] == serial.to_dict()['lengths']
+
+
+def test_running_stats_match_numpy(file_data):
+    values = [v for data in file_data for v in data['lengths']]
+    stats = RunningStats()
+    for i in range(0, len(values), 7):
+        stats.extend(values[i:i + 7])
+    assert stats.n == len(values)
+    assert stats.average == np.mean(values)
+    assert stats.std == pytest.approx(np.std(values), rel=1e-15)
+    assert (stats.min, stats.max) == (min(values), max(values))
+
+
+def test_subtract_reverses_merge(file_data):
+    summaries = _file_summaries(file_data)
+    merged = _merge(summaries)
+    rest = _merge(summaries[1:-1])
+    exact = [merged.subtract(summaries[0]), merged.subtract(summaries[-1])]
+    assert merged.to_dict()['openers'] == rest.to_dict()['openers']
+    assert merged.files == rest.files
+    for key in ('lengths', 'commas', 'para_lengths'):
+        assert merged.to_dict()[key][:3] == rest.to_dict()[key][:3]
+        if all(exact):
+            assert merged.to_dict()[key][3:] == rest.to_dict()[key][3:]
+
+
+def test_subtract_flags_extremes():
+    low, mid, high = RunningStats(), RunningStats(), RunningStats()
+    low.extend([1, 2])
+    mid.extend([3, 4, 5])
+    high.extend([6, 9])
+    merged = RunningStats()
+    for stats in (low, mid, high):
+        merged.merge(stats)
+    inner = RunningStats()
+    inner.extend([3, 4, 5, 4])
+    merged.merge(inner)
+    assert merged.subtract(inner) # strictly inside [min, max]
+    assert not merged.subtract(high) # held the max
+    assert (merged.n, merged.mean, merged.m2) == (5, 3, 10)
+
+
+# Incremental state: every re-run over an edited corpus must produce the profiles of
+# a --full run over the same files.
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding='utf-8')
+
+
+def _run(data_dir, state_path, full=False):
+    files = sorted(glob.glob(os.path.join(str(data_dir), '**', '*.txt'), recursive=True))
+    db = open_state(str(state_path), str(data_dir), full)
+    try:
+        genres, analyzed, unchanged, removed, errors = update_state(db, str(data_dir), files, workers=1)
+        db.commit()
+    finally:
+        db.close()
+    assert not errors
+    total = StyleSummary()
+    for summary in genres.values():
+        total.merge(summary)
+    profiles = (build_profile(total), {genre: build_profile(s) for genre, s in genres.items()})
+    return profiles, (analyzed, unchanged, removed)
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    data_dir = tmp_path / 'data'
+    sources = _file_paths()[:12]
+    for i, path in enumerate(sources):
+        genre = ('academic', 'narrative', None)[i % 3]
+        target = data_dir / genre / f'f{i}.txt' if genre else data_dir / f'f{i}.txt'
+        with open(path, encoding='utf-8') as f:
+            _write(target, f.read())
+    return data_dir
+
+
+def _assert_matches_full(corpus, tmp_path, expected_counts=None):
+    incremental, counts = _run(corpus, tmp_path / 'state.db')
+    full, _ = _run(corpus, tmp_path / 'full.db', full=True)
+    assert incremental == full
+    if expected_counts is not None:
+        assert counts == expected_counts
+    return counts
+
+
+def test_incremental_runs_match_full_run(corpus, tmp_path):
+    n = len(list(corpus.rglob('*.txt')))
+    _assert_matches_full(corpus, tmp_path, (n, 0, 0))
+    _assert_matches_full(corpus, tmp_path, (0, n, 0))
+
+    # Modify: longer sentences and new openers in one file
+    path = corpus / 'academic' / 'f0.txt'
+    path.write_text(path.read_text(encoding='utf-8') + '\n\nMeanwhile, ' + 'a very long clause ' * 30 + 'ends.',
+                    encoding='utf-8')
+    _assert_matches_full(corpus, tmp_path, (1, n - 1, 0))
+
+    # Add, in an existing genre, a new genre and at the top level
+    _write(corpus / 'narrative' / 'new.txt', 'Brand new file. It has two sentences, one comma.')
+    _write(corpus / 'poetry' / 'p.txt', 'Roses are red. Violets are blue, mostly.')
+    _write(corpus / 'top.txt', 'Top level text. Short.')
+    _assert_matches_full(corpus, tmp_path, (3, n, 0))
+
+    # Delete the file holding the academic maximum (its genre is re-merged), and a genre
+    (corpus / 'academic' / 'f0.txt').unlink()
+    (corpus / 'poetry' / 'p.txt').unlink()
+    _assert_matches_full(corpus, tmp_path, (0, n + 1, 2))
+
+    # Touch: a new mtime with the same content is not re-analyzed
+    target = corpus / 'narrative' / 'new.txt'
+    os.utime(target, (os.stat(target).st_atime, os.stat(target).st_mtime + 100))
+    _assert_matches_full(corpus, tmp_path, (0, n + 1, 0))
+
+    # Same size, other content: re-analyzed, as the hash differs
+    target.write_text('Brand new file. It has two sentences, one colon.', encoding='utf-8')
+    _assert_matches_full(corpus, tmp_path, (1, n, 0))
+
+
+def test_state_for_another_data_dir_is_ignored(corpus, tmp_path):
+    _run(corpus, tmp_path / 'state.db')
+    other = tmp_path / 'other'
+    _write(other / 'a.txt', 'Only one file here. It is tiny.')
+    (profile, genres), counts = _run(other, tmp_path / 'state.db')
+    assert counts == (1, 0, 0) and list(genres) == ['general']
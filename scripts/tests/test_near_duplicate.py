@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from scripts.api.near_duplicate import NearDuplicateIndex
+from scripts.features.minhash import MinHasher, lsh_bands, lsh_params, shingle_hashes
+
+
+def _jaccard(a, b):
+    a, b = set(shingle_hashes(a).tolist()), set(shingle_hashes(b).tolist())
+    return len(a & b) / len(a | b)
+
+
+def _candidate_probability(bands, rows, similarity):
+    return 1.0 - (1.0 - similarity ** rows) ** bands
+
+
+def _edit(text, every):
+    # Replaces every `every`-th word: about 5 / every of the shingles change per edit
+    words = text.split()
+    return ' '.join('edited' if i % every == every // 2 else w for i, w in enumerate(words))
+
+
+@pytest.fixture(scope='module')
+def documents(human_paragraphs):
+    docs = list(dict.fromkeys(p for p in human_paragraphs if len(p.split()) >= 80)) # the corpus repeats some
+    assert len(docs) >= 20
+    return docs
+
+
+@pytest.mark.parametrize('threshold', [0.5, 0.7, 0.8, 0.9])
+def test_lsh_bands(threshold):
+    bands, rows = lsh_bands(128, threshold, recall=0.99)
+    assert bands * rows == 128
+    assert _candidate_probability(bands, rows, threshold) >= 0.99
+    # The most selective split: one more row per band would miss the recall
+    assert all(_candidate_probability(128 // r, r, threshold) < 0.99
+               for r in range(rows + 1, 129) if 128 % r == 0)
+
+
+@pytest.mark.parametrize('threshold', [0.5, 0.7, 0.8, 0.9])
+def test_lsh_params_balance_around_threshold(threshold):
+    bands, rows = lsh_params(128, threshold)
+    assert bands * rows <= 128
+    # The S-curve rises around the threshold: rare candidates well below, likely well above
+    assert _candidate_probability(bands, rows, threshold - 0.15) < 0.15
+    assert _candidate_probability(bands, rows, min(threshold + 0.15, 1.0)) > 0.95
+    assert 0.2 < _candidate_probability(bands, rows, threshold) < 0.7
+
+
+def test_lsh_params_dedup_split():
+    # The split scripts/training/dedup.py uses at its default threshold
+    assert lsh_params(128, 0.8) == (9, 13)
+
+
+def test_signature_estimates_jaccard(documents):
+    hasher = MinHasher(256)
+    errors = []
+    for doc in documents[:20]:
+        for every in (4, 10, 30):
+            edited = _edit(doc, every)
+            errors.append(MinHasher.similarity(hasher.signature(doc), hasher.signature(edited)) - _jaccard(doc, edited))
+    # Standard error of a 256-permutation estimate is at most 1 / 32
+    assert np.abs(np.mean(errors)) < 0.02
+    assert np.abs(errors).max() < 0.15
+
+
+def test_lookup_finds_near_duplicates(documents):
+    index = NearDuplicateIndex(threshold=0.8)
+    index.bind('fp')
+    for i, doc in enumerate(documents):
+        index.add(index.signature(doc), None, {'i': i})
+
+    found = eligible = 0
+    for i, doc in enumerate(documents):
+        edited = _edit(doc, len(doc.split())) # one word replaced
+        if _jaccard(doc, edited) < 0.9: # clearly above the threshold
+            continue
+        eligible += 1
+        match = index.lookup(index.signature(edited), None)
+        if match is not None:
+            assert match[1] >= 0.8
+            # The original, or a paragraph the corpus nearly repeats
+            found += match[0]['i'] == i or _jaccard(documents[match[0]['i']], doc) >= 0.8
+    assert eligible >= 10 and found / eligible >= 0.95
+    assert index.lookup(index.signature(documents[0]), None) == ({'i': 0}, 1.0) # exact copy
+
+
+def test_lookup_misses_unrelated_text(documents):
+    index = NearDuplicateIndex(threshold=0.8)
+    index.bind('fp')
+    for i, doc in enumerate(documents[:-5]):
+        index.add(index.signature(doc), None, {'i': i})
+    for doc in documents[-5:]:
+        assert index.lookup(index.signature(doc), None) is None
+    # Heavily edited copies are below the threshold
+    assert index.lookup(index.signature(_edit(documents[0], 3)), None) is None
+    # Same text, other domain hint
+    assert index.lookup(index.signature(documents[0]), 'academic') is None
+
+
+def test_lookup_returns_a_copy(documents):
+    index = NearDuplicateIndex(threshold=0.8)
+    index.bind('fp')
+    result = {'classification': 'Human', 'meta': {'raw_score': 0.7}}
+    sig = index.signature(documents[0])
+    index.add(sig, None, result)
+    result['meta']['raw_score'] = 0.0
+
+    first, _ = index.lookup(sig, None)
+    first['meta']['near_duplicate'] = 1.0
+    assert index.lookup(sig, None)[0] == {'classification': 'Human', 'meta': {'raw_score': 0.7}}
+
+
+def test_bind_and_eviction(documents):
+    index = NearDuplicateIndex(threshold=0.8, max_entries=3)
+    index.bind('fp')
+    sigs = [index.signature(doc) for doc in documents[:4]]
+    for i, sig in enumerate(sigs):
+        index.add(sig, None, {'i': i})
+    assert index.lookup(sigs[0], None) is None # least recently used, evicted
+    assert index.lookup(sigs[3], None)[0] == {'i': 3}
+    assert index.stats()['entries'] == 3 and index.stats()['evictions'] == 1
+
+    index.bind('other') # new artifacts: results of the old model are dropped
+    assert index.lookup(sigs[3], None) is None and index.stats()['entries'] == 0
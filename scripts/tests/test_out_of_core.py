@@ -0,0 +1,43 @@
+import pandas as pd
+
+from scripts.training.out_of_core import _ClassStreams, iter_balanced_batches
+from scripts.training.sampler import Source
+
+
+def _csv(path, texts, generated=None):
+    columns = {'text': texts}
+    if generated is not None:
+        columns['generated'] = generated
+    pd.DataFrame(columns).to_csv(path, index=False)
+    return str(path)
+
+
+def _skewed_sources(tmp_path):
+    ai = [f'ai row {i}' for i in range(500)]
+    human = [f'human row {i}' for i in range(120)]
+    mixed = [f'mixed row {i}' for i in range(60)]
+    sources = [Source('ai', _csv(tmp_path / 'ai.csv', ai), label=1.0),
+               Source('human', _csv(tmp_path / 'human.csv', human), label=0.0),
+               Source('mixed', _csv(tmp_path / 'mixed.csv', mixed, [float(i % 2) for i in range(60)]))]
+    return sources, ai + mixed[1::2], human + mixed[::2]
+
+
+def test_leading_class_is_paused_not_dropped(tmp_path):
+    sources, ai, human = _skewed_sources(tmp_path)
+    streams = _ClassStreams(sources, (1.0, 0.0), chunk_size=10, max_pending=30)
+    human_rows = list(streams.rows(0.0))
+    assert sorted(human_rows) == sorted(human)
+    # The AI-only source stopped a chunk past the bound; mixed chunks are queued in full
+    assert sum(text.startswith('ai') for text in streams.pending[1.0]) <= 30 + 10
+    assert sorted(streams.rows(1.0)) == sorted(ai) # nothing was dropped
+
+
+def test_balanced_batches_use_every_row_of_the_smaller_class(tmp_path):
+    sources, ai, human = _skewed_sources(tmp_path)
+    seen = {0.0: [], 1.0: []}
+    for texts, targets in iter_balanced_batches(sources, 20, buffer_size=10, chunk_size=10, max_pending=30):
+        assert (targets == 1.0).sum() == (targets == 0.0).sum()
+        for text, target in zip(texts, targets):
+            seen[1.0 - target].append(text) # target 1.0 = Human
+    assert sorted(seen[0.0]) == sorted(human)
+    assert len(seen[1.0]) == len(human) and set(seen[1.0]) <= set(ai)
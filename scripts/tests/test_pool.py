@@ -0,0 +1,93 @@
+import asyncio
+import os
+import signal
+
+import pytest
+
+from scripts.api.pool import PoolBusy, WorkerPool
+from scripts.api.predict import CommercialDetector
+
+# Forked workers answer over their own sockets in whatever order they finish; the pool
+# must hand each response to the request that asked for it, bound the requests waiting
+# for a worker, and replace a worker that dies.
+
+
+@pytest.fixture(scope='module')
+def detector(artifacts):
+    return CommercialDetector(artifacts_dir=artifacts, artifact_format='fast')
+
+
+@pytest.fixture(scope='module')
+def texts(human_paragraphs, ai_paragraphs):
+    return [p for p in dict.fromkeys(human_paragraphs[:40] + ai_paragraphs) if len(p.split()) >= 30][:10]
+
+
+async def _ready(pool, timeout=10.0):
+    # Workers take requests once their parent-side stream is connected
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not all(w is not None and w.writer is not None for w in pool.workers):
+        assert loop.time() < deadline, "workers did not start"
+        await asyncio.sleep(0.01)
+
+
+def _run(pool, scenario):
+    async def run():
+        pool.start()
+        try:
+            await _ready(pool)
+            return await scenario(pool)
+        finally:
+            await pool.close()
+    return asyncio.run(run())
+
+
+def test_responses_follow_request_ids(detector, texts):
+    async def scenario(pool):
+        # A long document next to short ones: workers finish out of request order
+        requests = [{'id': 'long', 'op': 'predict_batch', 'texts': texts * 3}]
+        requests += [{'id': i, 'text': text} for i, text in enumerate(texts)]
+        finished = []
+
+        async def submit(request):
+            response = await pool.submit(request)
+            finished.append(response['id'])
+            return response
+        return await asyncio.gather(*map(submit, requests)), finished
+
+    responses, finished = _run(WorkerPool(detector, n_workers=2, max_inflight=2), scenario)
+    assert [r['id'] for r in responses] == ['long'] + list(range(len(texts)))
+    assert finished[0] != 'long' and finished != [r['id'] for r in responses] # completed out of order
+    assert responses[0]['result'] == detector.predict_batch(texts * 3)
+    for i, text in enumerate(texts):
+        assert responses[i + 1]['result'] == detector.predict(text)
+
+
+def test_max_queue_rejects_when_full(detector, texts):
+    async def scenario(pool):
+        tasks = [asyncio.ensure_future(pool.submit({'id': i, 'text': text})) for i, text in enumerate(texts[:3])]
+        await asyncio.sleep(0) # one request in flight, two waiting
+        assert pool.stats()['waiting'] == 2
+        with pytest.raises(PoolBusy):
+            await pool.submit({'id': 'rejected', 'text': texts[3]})
+        return await asyncio.gather(*tasks)
+
+    pool = WorkerPool(detector, n_workers=1, max_inflight=1, max_queue=2)
+    responses = _run(pool, scenario)
+    assert [r['id'] for r in responses] == [0, 1, 2] and all(r['ok'] for r in responses)
+    assert pool.rejected == 1
+
+
+def test_killed_worker_is_restarted(detector, texts):
+    async def scenario(pool):
+        killed = pool.workers[0].process.pid
+        os.kill(killed, signal.SIGKILL)
+        while pool.workers[0] is not None and pool.workers[0].process.pid == killed:
+            await asyncio.sleep(0.01)
+        await _ready(pool)
+        assert pool.workers[0].process.pid != killed and pool.restarts == [1, 0]
+        return [await pool.submit({'id': i, 'text': text}) for i, text in enumerate(texts[:4])]
+
+    pool = WorkerPool(detector, n_workers=2, max_inflight=1)
+    responses = _run(pool, scenario)
+    assert all(r['ok'] and r['result'] == detector.predict(text) for r, text in zip(responses, texts))
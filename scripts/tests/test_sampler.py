@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from scripts.training.sampler import Reservoir, Source, sample_balanced
+
+
+def _sample(k, seed, items, chunk):
+    reservoir = Reservoir(k, seed)
+    for i in range(0, len(items), chunk):
+        reservoir.extend(items[i:i + chunk])
+    return reservoir
+
+
+def test_seed_reproducible_across_chunk_sizes():
+    items = list(range(5000))
+    expected = _sample(50, 'seed', items, 5000).items
+    assert len(expected) == 50 and len(set(expected)) == 50
+    for chunk in (1, 7, 64, 999):
+        reservoir = _sample(50, 'seed', items, chunk)
+        assert reservoir.items == expected and reservoir.seen == len(items)
+    assert _sample(50, 'other', items, 64).items != expected
+
+
+def test_short_streams():
+    assert _sample(10, 0, list(range(6)), 4).items == list(range(6)) # fewer rows than k: all kept
+    assert _sample(0, 0, list(range(6)), 4).items == []
+
+
+def test_inclusion_is_uniform():
+    # Every item of a 100-row stream is in a k = 10 sample with probability 0.1: the
+    # inclusion counts over many seeded runs follow the uniform expectation
+    n, k, runs = 100, 10, 3000
+    counts = np.zeros(n)
+    for seed in range(runs):
+        counts[_sample(k, seed, list(range(n)), 13).items] += 1
+    assert counts.sum() == k * runs
+    assert stats.chisquare(counts).pvalue > 1e-3
+    # Later rows (only reachable through the skips) are kept as often as the first k
+    assert abs(counts[:k].mean() - counts[-k:].mean()) < 0.15 * k * runs / n
+
+
+def test_sample_balanced_is_deterministic(tmp_path):
+    path = tmp_path / 'rows.csv'
+    rng = np.random.default_rng(0)
+    labels = (rng.random(600) < 0.3).astype(float)
+    pd.DataFrame({'text': [f'row {i}' for i in range(600)], 'generated': labels}).to_csv(path, index=False)
+    sources = [Source('rows', str(path))]
+    quiet = lambda *args: None
+
+    first = sample_balanced(sources, 100, seed=1, chunk_size=600, log=quiet)
+    assert (first['generated'] == 1.0).sum() == (first['generated'] == 0.0).sum() == 100
+    for chunk_size in (1, 37):
+        assert sample_balanced(sources, 100, seed=1, chunk_size=chunk_size, log=quiet).equals(first)
+    assert not sample_balanced(sources, 100, seed=2, log=quiet).equals(first)
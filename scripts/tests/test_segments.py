@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from scripts.api.predict import CommercialDetector
+from scripts.api.segments import WindowScorer, sentence_spans, window_ranges
+
+# WindowScorer slides running n-gram counts and prefix sums over the sentences instead
+# of rescoring every window; its scores must match scoring each window's text through
+# the pipeline up to the rounding of the running sums.
+
+WINDOW_TOL = 1e-7 # WindowScorer's bound; 7.5e-10 on the corpus with the trained model
+
+
+@pytest.fixture(scope='module')
+def detector(artifacts):
+    detector = CommercialDetector(artifacts_dir=artifacts, artifact_format='fast')
+    assert detector.artifact_format == 'fast'
+    return detector
+
+
+@pytest.fixture(scope='module')
+def documents(human_paragraphs, ai_paragraphs, edge_texts):
+    docs = ['\n\n'.join(human_paragraphs[i:i + 3]) for i in range(0, 30, 3)]
+    docs += ['\n\n'.join(ai_paragraphs[:3]), ' '.join(edge_texts[9:17])]
+    return [doc for doc in docs if len(doc.lower()) == len(doc)]
+
+
+def _assert_valid_segments(result, text):
+    segments = result['segments']
+    texts = []
+    for sentence in segments['sentences']:
+        assert 0 <= sentence['start'] < sentence['end'] <= len(text)
+        assert text[sentence['start']:sentence['end']] == sentence['text']
+        assert not sentence['text'][0].isspace()
+        texts.append(sentence['text'])
+    assert [(s['start'], s['end']) for s in segments['sentences']] == sentence_spans(text)
+    assert all(sentence in texts for sentence in segments['ai_sentences'])
+
+
+@pytest.mark.parametrize('window, stride', [(3, 1), (2, 2), (1, 1), (5, 3)])
+def test_window_scores_match_pipeline(detector, documents, window, stride):
+    scorer = WindowScorer(detector.pipeline)
+    for doc in documents:
+        spans = sentence_spans(doc)
+        ranges = window_ranges(len(spans), window, stride)
+        windows = [doc[spans[a][0]:spans[b - 1][1]] for a, b in ranges]
+        expected = detector.pipeline.predict(windows)
+        assert np.abs(scorer.score(doc, spans, ranges) - expected).max() <= WINDOW_TOL
+
+
+def test_window_ranges_cover_every_sentence():
+    for n in range(0, 12):
+        for window in (1, 2, 3, 5):
+            for stride in range(1, window + 1):
+                ranges = window_ranges(n, window, stride)
+                covered = set()
+                for a, b in ranges:
+                    assert 0 <= a < b <= n and b - a == min(window, n)
+                    covered.update(range(a, b))
+                assert covered == set(range(n))
+
+
+def test_predict_segments_spans(detector, documents):
+    for doc in documents:
+        result = detector.predict_segments(doc)
+        _assert_valid_segments(result, doc)
+        assert len(result['segments']['sentences']) == len(sentence_spans(doc))
+
+
+@pytest.mark.parametrize('text', [
+    'This single sentence keeps going with plenty of words so that the detector agrees to score it at all today',
+    '  One single sentence keeps going with plenty of words, so that the detector agrees to score it at all today!!!  ',
+])
+def test_one_sentence_text(detector, text):
+    result = detector.predict_segments(text, domain='general')
+    _assert_valid_segments(result, text)
+    assert len(result['segments']['sentences']) == 1
+    sentence = result['segments']['sentences'][0]
+    assert sentence['human_score'] == pytest.approx(min(max(result['meta']['raw_score'], 0.0), 1.0))
+
+
+def test_stride_wider_than_window(detector, documents):
+    # Sentences between windows would get no score
+    with pytest.raises(ValueError):
+        detector.predict_segments(documents[0], window=2, stride=3)
+
+
+@pytest.mark.parametrize('text', ['', '   ', '\n\n', '...!!!???'])
+def test_empty_text(detector, text):
+    assert sentence_spans(text) == []
+    assert 'segments' not in detector.predict_segments(text) # not scored
+    result = detector.add_segments({'meta': {}}, text)
+    assert result['segments']['sentences'] == [] and result['segments']['ai_sentences'] == []
@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+import pytest
+
+from scripts.api.predict import CommercialDetector
+from scripts.api.service import LineServer, ScoringService
+
+# The service answers a connection's requests as they complete, not in request order:
+# clients match responses by id, so every response must carry the result of its own
+# request, whichever batch (or executor call) produced it.
+
+
+@pytest.fixture(scope='module')
+def detector(artifacts):
+    return CommercialDetector(artifacts_dir=artifacts, artifact_format='fast')
+
+
+@pytest.fixture(scope='module')
+def texts(detector, human_paragraphs, ai_paragraphs):
+    texts = [p for p in dict.fromkeys(human_paragraphs[:40] + ai_paragraphs) if len(p.split()) >= 30][:12]
+    # Distinct scores, so a response with another request's result would not pass
+    assert len({round(detector.predict(t)['human_score'], 6) for t in texts}) == len(texts)
+    return texts
+
+
+def _assert_same(result, expected):
+    # Batches of other sizes may differ from a single predict in the last digit
+    if isinstance(expected, dict):
+        assert result.keys() == expected.keys()
+        for key in expected:
+            _assert_same(result[key], expected[key])
+    elif isinstance(expected, list):
+        assert len(result) == len(expected)
+        for item, expected_item in zip(result, expected):
+            _assert_same(item, expected_item)
+    elif isinstance(expected, float):
+        assert result == pytest.approx(expected, rel=1e-12, abs=1e-12)
+    else:
+        assert result == expected
+
+
+def _serve(service, requests):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(''.join(json.dumps(r) + '\n' for r in requests).encode('utf-8'))
+        reader.feed_eof()
+        lines = []
+
+        async def write(text):
+            lines.append(json.loads(text))
+        await service.start()
+        try:
+            await service.serve_stream(reader, write)
+        finally:
+            await service.stop()
+        return lines
+
+    lines = asyncio.run(run())
+    assert lines[0]['event'] == 'ready'
+    return lines[1:]
+
+
+def test_responses_follow_request_ids(detector, texts):
+    service = ScoringService(detector, max_batch_size=4, max_wait_ms=50.0)
+    requests = [{'id': 'first', 'text': texts[0]},
+                {'id': 'batch', 'op': 'predict_batch', 'texts': texts[1:3]}]
+    requests += [{'id': i, 'text': text, 'segments': i % 3 == 0} for i, text in enumerate(texts[3:])]
+    requests += [{'id': 'bad-window', 'text': texts[4], 'segments': True, 'window': 0},
+                 {'id': 'no-text', 'op': 'predict'}]
+    responses = _serve(service, requests)
+
+    assert sorted(map(str, (r['id'] for r in responses))) == sorted(map(str, (r['id'] for r in requests)))
+    # The batch op goes to the scoring thread at once; 'first' waits in the batcher first
+    order = [r['id'] for r in responses]
+    assert order.index('batch') < order.index('first')
+    by_id = {r['id']: r for r in responses}
+    _assert_same(by_id['first']['result'], detector.predict(texts[0]))
+    _assert_same(by_id['batch']['result'], detector.predict_batch(texts[1:3]))
+    for i, text in enumerate(texts[3:]):
+        assert by_id[i]['ok']
+        _assert_same(by_id[i]['result'], detector.predict_segments(text) if i % 3 == 0 else detector.predict(text))
+    # Failures stay with their own request; the rest of the batch is answered
+    assert not by_id['bad-window']['ok'] and 'window' in by_id['bad-window']['error']
+    assert not by_id['no-text']['ok']
+
+    stats = service.batcher.stats() # batched: 'first', the texts[3:] predicts and 'bad-window'
+    assert stats['requests'] == len(texts) - 1 and stats['batches'] < stats['requests'] # coalesced
+    assert max(int(size) for size in stats['batch_sizes']) <= 4
+
+
+def test_line_server_needs_handle(detector):
+    with pytest.raises(TypeError):
+        LineServer(detector)
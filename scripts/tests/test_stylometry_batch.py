@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from scripts.features.stylometry_core import (
+    BATCH_CHUNK_SIZE, FEATURE_NAMES, StylometryFeaturizer, transform_batch
+)
+
+# transform_batch promises rows identical (bit for bit) to the per-text
+# `get_feature_dict`, however the texts are chunked and whichever process scores them.
+
+
+def _reference(texts):
+    featurizer = StylometryFeaturizer()
+    rows = [featurizer.get_feature_dict(text) for text in texts]
+    return np.array([[row[name] for name in FEATURE_NAMES] for row in rows], dtype=np.float64)
+
+
+def _assert_identical(got, expected):
+    assert got.shape == expected.shape
+    assert got.dtype == np.float64
+    assert got.tobytes() == expected.tobytes()
+
+
+@pytest.fixture(scope='module')
+def texts(human_paragraphs, ai_paragraphs, edge_texts):
+    # Edge texts interleaved with real paragraphs, so defaults, multi-pass rows and
+    # batch rows alternate inside every chunk
+    mixed = []
+    paragraphs = human_paragraphs[:60] + ai_paragraphs[:60]
+    for i, paragraph in enumerate(paragraphs):
+        mixed.append(paragraph)
+        mixed.append(edge_texts[i % len(edge_texts)])
+    return mixed + [None, 42]
+
+
+@pytest.fixture(scope='module')
+def reference(texts):
+    return _reference(texts)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, BATCH_CHUNK_SIZE])
+def test_chunked_batch_matches_per_text(texts, reference, chunk_size):
+    _assert_identical(transform_batch(texts, chunk_size=chunk_size), reference)
+
+
+@pytest.mark.parametrize('n_jobs', [2, -1])
+def test_parallel_batch_matches_per_text(texts, reference, n_jobs):
+    _assert_identical(transform_batch(texts, n_jobs=n_jobs, chunk_size=16), reference)
+
+
+def test_default_chunk_boundary(texts):
+    # One more than two default chunks: rows on both sides of each boundary
+    batch = (texts * (2 * BATCH_CHUNK_SIZE // len(texts) + 1))[:2 * BATCH_CHUNK_SIZE + 1]
+    expected = _reference(batch)
+    _assert_identical(transform_batch(batch), expected)
+    _assert_identical(transform_batch(batch, n_jobs=2), expected)
+
+
+def test_featurizer_transform(texts, reference):
+    _assert_identical(StylometryFeaturizer().transform(texts), reference)
+    _assert_identical(StylometryFeaturizer(n_jobs=2).transform(texts), reference)
+
+
+def test_empty_batch():
+    assert transform_batch([]).shape == (0, len(FEATURE_NAMES))
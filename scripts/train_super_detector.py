@@ -3,6 +3,7 @@ import numpy as np
 import os
 import joblib
 import sys
+import argparse
 
 # Add scripts to path to import local modules
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
@@ -17,90 +18,121 @@ from sklearn.metrics import r2_score
 
 # Import Modular Features
 from scripts.features.stylometry import StylometryExtractor
+from scripts.api.artifact_store import FAST_DIR, export_fast_artifacts
+from scripts.training.sampler import Source, sample_balanced
+from scripts.training.dedup import DEFAULT_CAPACITY, DEFAULT_THRESHOLD, Deduplicator
+from scripts.training.feature_store import FeatureStore
+from scripts.features.stylometry_core import STYLOMETRY_VERSION
 
 # Configuration
 BASE_PATH = '/Users/bernard/Downloads/Main_Thesis-2'
 HUMAN_TEXT_DIR = os.path.join(BASE_PATH, 'student-humanizer-plus/Human_text')
 AI_HUMAN_CSV = os.path.join(BASE_PATH, 'AI_Human.csv')
 MAX_ROWS_LARGE = 150000
+SAMPLE_SEED = 42
 
 
 
 # --- DATA LOADING ---
-def load_ai_human():
-    print("Loading AI_Human.csv (AI samples)... This may take 60 seconds.")
+# Sources are streamed chunk by chunk into per-class reservoirs (scripts/training/sampler.py),
+# so memory is bounded by the sample size rather than the size of the CSVs. Exact and
+# near-duplicate rows across all sources are dropped on the way (scripts/training/dedup.py),
+# before balancing and the train / calibration / test split.
+SOURCES = [
+    Source('AI_Human', AI_HUMAN_CSV), # mixed; label from the `generated` column
+    Source('Wikipedia', os.path.join(HUMAN_TEXT_DIR, 'Wikipedia.csv'), label=0.0),
+    Source('CNN', os.path.join(HUMAN_TEXT_DIR, 'CNN_DailyMail.csv'), label=0.0),
+    Source('Human (Large)', os.path.join(HUMAN_TEXT_DIR, 'Human.csv'), label=0.0, max_rows=MAX_ROWS_LARGE),
+    Source('Gutenberg', os.path.join(HUMAN_TEXT_DIR, 'Gutenberg.csv'), label=0.0, max_rows=MAX_ROWS_LARGE)
+]
+
+def save_artifacts(pipeline, calibrator, metadata, check_texts=None):
+    output_dir = os.path.join(os.path.dirname(__file__), 'artifacts')
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Save main model
+    joblib.dump(pipeline, os.path.join(output_dir, 'model.joblib'))
+    # Save calibrator separately (Modular design)
+    joblib.dump(calibrator, os.path.join(output_dir, 'calibrator.joblib'))
+    # Save Metadata (Version Lock)
+    joblib.dump(metadata, os.path.join(output_dir, 'metadata.pkl'))
+
+    # Fast cold-start export (compiled scoring table, checked against pipeline.predict)
     try:
-        chunk_size = 100000
-        chunks = []
-        for i, chunk in enumerate(pd.read_csv(AI_HUMAN_CSV, chunksize=chunk_size)):
-            chunk['text'] = chunk['text'].astype(str)
-            chunk['generated'] = pd.to_numeric(chunk['generated'], errors='coerce')
-            chunk = chunk.dropna()
-            chunks.append(chunk)
-            print(f" -> Loaded chunk {i+1} ({len(chunk)} rows)...")
-
-        print("Merging chunks...")
-        df = pd.concat(chunks, ignore_index=True)
-        return df
-    except Exception as e:
-        print(f"Skipping AI_Human.csv: {e}")
-        return pd.DataFrame()
-
-def load_csv_dataset(filename, source_name, label, max_rows=None):
-    path = os.path.join(HUMAN_TEXT_DIR, filename)
-    print(f"Loading {source_name} from {path}...")
-    try:
-        if not os.path.exists(path):
-            print(f"File not found: {path}")
-            return pd.DataFrame()
-            
-        df = pd.read_csv(path, nrows=max_rows)
-        
-        text_col = None
-        for col in ['Text', 'text', 'article', 'content']:
-            if col in df.columns:
-                text_col = col
-                break
-        
-        if text_col:
-            df = df[[text_col]].rename(columns={text_col: 'text'})
-            df['generated'] = float(label)
-            print(f"-> Loaded {len(df)} rows from {source_name}")
-            return df
-        else:
-            print(f"Could not find text column in {source_name}.")
-            return pd.DataFrame()
-            
-    except Exception as e:
-        print(f"Skipping {source_name}: {e}")
-        return pd.DataFrame()
+        fast_dir = export_fast_artifacts(pipeline, output_dir, metadata, check_texts=check_texts)
+        print(f"Fast artifacts saved to {fast_dir}/")
+    except ValueError as e:
+        print(f"Skipping fast artifact export: {e}")
+
+    print(f"Artifacts saved to {output_dir}/")
+
+parser = argparse.ArgumentParser(description='Train the commercial detector')
+parser.add_argument('--out-of-core', action='store_true',
+                    help='Stream all rows through hashed features and SGDRegressor.partial_fit (constant memory)')
+parser.add_argument('--batch-size', type=int, default=2000, help='Out-of-core minibatch size')
+parser.add_argument('--max-rows', type=int, default=None, help='Out-of-core: stop after this many training rows')
+parser.add_argument('--n-jobs', type=int, default=None, help='Processes for stylometry extraction')
+parser.add_argument('--feature-store', default=os.path.join(os.path.dirname(__file__), 'feature_store'),
+                    help='Directory caching stylometry rows and TF-IDF blocks across runs')
+parser.add_argument('--no-feature-store', action='store_true', help='Extract every feature from scratch')
+parser.add_argument('--compact-sweep', action='store_true',
+                    help='After saving, report pruning / quantization trade-offs on the test split')
+parser.add_argument('--compact', nargs=2, metavar=('THRESHOLD', 'DTYPE'), default=None,
+                    help='Compact the fast artifacts to this operating point (see scripts/training/compact.py)')
+parser.add_argument('--compact-eval-rows', type=int, default=5000, help='Test rows used by the compaction sweep')
+parser.add_argument('--dedup-threshold', type=float, default=DEFAULT_THRESHOLD,
+                    help='Drop rows at least this Jaccard-similar (word 5-grams) to an earlier row')
+parser.add_argument('--dedup-capacity', type=int, default=DEFAULT_CAPACITY,
+                    help='Rows the first dedup filter stage holds (the filter grows with the rows kept)')
+parser.add_argument('--no-dedup', action='store_true', help='Keep duplicate rows')
+ARGS = parser.parse_args()
+
+DEDUP = None
+if not ARGS.no_dedup:
+    DEDUP = Deduplicator(ARGS.dedup_threshold, ARGS.dedup_capacity, n_jobs=ARGS.n_jobs or os.cpu_count())
+
+# --- OUT-OF-CORE MODE ---
+if ARGS.out_of_core:
+    from sklearn.metrics import classification_report
+    from scripts.training.out_of_core import train_out_of_core
+
+    print("Training out-of-core (hashed n-grams + partial_fit)...")
+    pipeline, calibrator, stats = train_out_of_core(
+        SOURCES, batch_size=ARGS.batch_size, max_rows=ARGS.max_rows, n_jobs=ARGS.n_jobs, seed=SAMPLE_SEED,
+        dedup=DEDUP
+    )
+    if DEDUP is not None:
+        DEDUP.close()
+    r2 = None
+    if stats['test_rows']:
+        r2 = pipeline.score(stats['test_texts'], stats['test_y'])
+        print(f"\nEvaluation (Regressor R2) on {stats['test_rows']} held-out rows: {r2:.4f}")
+        final_probs = calibrator.transform(pipeline.predict(stats['test_texts']))
+        binary_preds = [1 if p > 0.5 else 0 for p in final_probs]
+        binary_targets = [1 if t > 0.5 else 0 for t in stats['test_y']]
+        print(classification_report(binary_targets, binary_preds, target_names=['AI', 'Human']))
+
+    save_artifacts(pipeline, calibrator, {
+        "model_version": "1.0.0",
+        "stylometry_version": STYLOMETRY_VERSION,
+        "trained_at": pd.Timestamp.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+        "fast_mode": False,
+        "training_mode": "out_of_core",
+        "n_samples": stats['n_samples'],
+        "r2_score": r2,
+        "dedup": stats.get('dedup')
+    })
+    sys.exit(0)
 
 # --- MAIN EXECUTION ---
-# 1. Load Data
-df_main = load_ai_human()
-ai_data = df_main[df_main['generated'] == 1.0].copy()
-human_from_main = df_main[df_main['generated'] == 0.0].copy()
-
-df_wiki = load_csv_dataset('Wikipedia.csv', 'Wikipedia', 0.0)
-df_cnn = load_csv_dataset('CNN_DailyMail.csv', 'CNN', 0.0)
-df_human_large = load_csv_dataset('Human.csv', 'Human (Large)', 0.0, max_rows=MAX_ROWS_LARGE)
-df_gutenberg = load_csv_dataset('Gutenberg.csv', 'Gutenberg', 0.0, max_rows=MAX_ROWS_LARGE)
-
-# 2. Consolidate & Balance
-human_data = pd.concat([human_from_main, df_wiki, df_cnn, df_human_large, df_gutenberg], ignore_index=True)
-human_data = human_data.dropna()
-ai_data = ai_data.dropna()
-
-print(f"\nTotal AI Samples: {len(ai_data)}")
-print(f"Total Human Samples: {len(human_data)}")
-
+# 1. Load Data & Balance
 MAX_TRAIN_SAMPLES = 50000 
-n_balance = min(len(ai_data), len(human_data), MAX_TRAIN_SAMPLES)
-
-print(f"Balancing to {n_balance} samples per class (Fast Mode)...")
-ai_subset = ai_data.sample(n_balance, random_state=42)
-human_subset = human_data.sample(n_balance, random_state=42)
-df_final = pd.concat([ai_subset, human_subset])
+print(f"Streaming training sources (reservoir of {MAX_TRAIN_SAMPLES} per class, seed {SAMPLE_SEED})...")
+df_final = sample_balanced(SOURCES, MAX_TRAIN_SAMPLES, seed=SAMPLE_SEED, dedup=DEDUP)
+if DEDUP is not None:
+    DEDUP.close()
+n_balance = len(df_final) // 2
+print(f"Balanced to {n_balance} samples per class (Fast Mode)")
 
 
 # 3. REGRESSION PIPELINE CONFIGURATION
@@ -152,7 +184,7 @@ pipeline = Pipeline([
         
         # Stylometry Model (Stats) - UPWEIGHTED 2.5x
         ('stylometry', Pipeline([
-            ('extractor', StylometryExtractor()),
+            ('extractor', StylometryExtractor(n_jobs=ARGS.n_jobs)),
             ('scaler', StandardScaler()), 
             ('normalizer', PowerTransformer(method='yeo-johnson')) 
         ]))
@@ -176,12 +208,21 @@ pipeline = Pipeline([
 
 # 4. Train Main Model (Regressor)
 print(f"Training Regressor on {len(X_train)} rows...")
-pipeline.fit(X_train, y_train)
+if ARGS.no_feature_store:
+    pipeline.fit(X_train, y_train)
+    predict_raw = pipeline.predict
+else:
+    # Same fit as pipeline.fit, with features read from / written to the feature store
+    feature_store = FeatureStore(ARGS.feature_store)
+    features = pipeline.named_steps['features']
+    regressor = pipeline.named_steps['regressor']
+    regressor.fit(feature_store.fit_transform(features, X_train.tolist()), y_train)
+    predict_raw = lambda texts: regressor.predict(feature_store.transform(features, list(texts)))
 
 # 5. Pipeline Calibration (The "Trust" Layer)
 print(f"Calibrating on {len(X_calib)} held-out rows...")
 # Get raw uncalibrated scores from the calibration set
-raw_calib_preds = pipeline.predict(X_calib)
+raw_calib_preds = predict_raw(X_calib)
 
 # Fit Isotonic Regression to map Raw Scores -> True Probabilities
 calibrator = IsotonicRegression(out_of_bounds='clip', y_min=0.0, y_max=1.0)
@@ -189,11 +230,13 @@ calibrator.fit(raw_calib_preds, y_calib)
 
 # 6. Evaluate on Test Set (Unseen by both)
 print(f"Evaluating on {len(X_test)} test rows...")
-raw_test_preds = pipeline.predict(X_test)
+raw_test_preds = predict_raw(X_test)
 final_probs = calibrator.transform(raw_test_preds)
 
-# R2 Score (Regressor Quality)
-r2 = pipeline.score(X_test, y_test)
+# R2 Score (Regressor Quality), same as pipeline.score(X_test, y_test)
+r2 = r2_score(y_test, raw_test_preds)
+if not ARGS.no_feature_store:
+    print(f"Feature store: {feature_store.stats()}")
 print(f"\nEvaluation (Regressor R2): {r2:.4f}")
 
 # Classification Metrics (at 0.5 threshold)
@@ -203,23 +246,29 @@ binary_targets = [1 if t > 0.5 else 0 for t in y_test]
 print(classification_report(binary_targets, binary_preds, target_names=['AI', 'Human']))
 
 # 7. Save Artifacts
-output_dir = os.path.join(os.path.dirname(__file__), 'artifacts')
-os.makedirs(output_dir, exist_ok=True)
-
-# Save main model
-joblib.dump(pipeline, os.path.join(output_dir, 'model.joblib'))
-# Save calibrator separately (Modular design)
-joblib.dump(calibrator, os.path.join(output_dir, 'calibrator.joblib'))
-
-# Save Metadata (Version Lock)
-metadata = {
+save_artifacts(pipeline, calibrator, {
     "model_version": "1.0.0",
-    "stylometry_version": "1.0.0",
+    "stylometry_version": STYLOMETRY_VERSION,
     "trained_at": pd.Timestamp.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
     "fast_mode": True,
     "n_samples": n_balance * 2,
-    "r2_score": r2
-}
-joblib.dump(metadata, os.path.join(output_dir, 'metadata.pkl'))
-
-print(f"Artifacts saved to {output_dir}/")
+    "r2_score": r2,
+    "dedup": DEDUP.summary() if DEDUP is not None else None
+}, check_texts=X_test.iloc[:1000].tolist())
+
+# 8. Optional Compaction (pruned / quantized fast scoring table)
+if ARGS.compact_sweep or ARGS.compact:
+    from scripts.training.compact import DEFAULT_THRESHOLDS, DEFAULT_DTYPES, apply_compaction, sweep
+    artifacts_dir = os.path.join(os.path.dirname(__file__), 'artifacts')
+    if not os.path.exists(os.path.join(artifacts_dir, FAST_DIR, 'manifest.json')):
+        print("Skipping compaction: no fast artifacts were exported")
+    else:
+        thresholds, dtypes = DEFAULT_THRESHOLDS, DEFAULT_DTYPES
+        if ARGS.compact and not ARGS.compact_sweep:
+            thresholds, dtypes = [float(ARGS.compact[0])], [ARGS.compact[1]]
+        print(f"\nCompaction trade-offs on {min(len(X_test), ARGS.compact_eval_rows)} test rows:")
+        sweep(artifacts_dir, X_test.iloc[:ARGS.compact_eval_rows].tolist(), y_test.iloc[:ARGS.compact_eval_rows],
+              thresholds, dtypes, calibrator=calibrator)
+        if ARGS.compact:
+            apply_compaction(artifacts_dir, float(ARGS.compact[0]), ARGS.compact[1])
+            print(f"Compacted fast artifacts: threshold {ARGS.compact[0]}, {ARGS.compact[1]}")
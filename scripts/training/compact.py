@@ -0,0 +1,244 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from scripts.api.artifact_store import (
+    COMPACT_FORMAT_VERSION, FAST_DIR, FastPipeline, encode_array, load_array, load_terms, save_vocabulary
+)
+from scripts.features.char_ngrams import CharNgramCounter
+
+# Post-training compaction of the fast scoring table
+# --------------------------------------------------
+# Most of the 8,000 word / 6,000 char n-grams barely move the score, but every one of
+# them costs vocabulary memory and load time. Compaction rewrites <artifacts>/fast in
+# format 3 (see artifact_store.py):
+#   - pruning: a term's expected contribution is |weight| * document frequency, with the
+#     document frequency recovered from the smoothed idf as exp(1 - idf). Terms below
+#     `threshold` times the branch's largest contribution are dropped. Dropped terms no
+#     longer count in the row norm either, so scores move by more than their weights;
+#     the sweep measures by how much.
+#   - quantization: idf and weights stored as float16 or int8 (affine, per array)
+#   - char branches also store CharNgramCounter's alphabet and sorted packed keys, so
+#     loading builds neither the vocabulary dict nor the keys
+# `sweep` scores every (threshold, dtype) variant on labeled held-out texts and prints
+# size, load time and latency savings next to the R2 / classification changes.
+
+DEFAULT_THRESHOLDS = [0.0, 0.001, 0.003, 0.01, 0.03]
+DEFAULT_DTYPES = ['float64', 'float16', 'int8']
+
+
+def term_contributions(idf, weights):
+    """Expected |score contribution| per column: |weight| * exp(1 - idf) ~ document frequency."""
+    return np.abs(np.asarray(weights)) * np.exp(1.0 - np.asarray(idf))
+
+
+def compact_fast_artifacts(fast_dir, out_dir, threshold=0.0, dtype='float64', char_keys=True):
+    """Writes a compacted copy of `fast_dir` to `out_dir`; returns its manifest."""
+    with open(os.path.join(fast_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    if manifest.get('compaction'):
+        raise ValueError(f"{fast_dir} is already compacted; re-export it from model.joblib first")
+    os.makedirs(out_dir, exist_ok=True)
+
+    tfidf_names = [spec['name'] for spec in manifest['branches'] if spec['kind'] == 'tfidf']
+    for name in os.listdir(fast_dir):
+        if name != 'manifest.json' and not any(name.startswith(b + '.') for b in tfidf_names):
+            shutil.copy2(os.path.join(fast_dir, name), os.path.join(out_dir, name))
+
+    branches = []
+    for spec in manifest['branches']:
+        if spec['kind'] != 'tfidf':
+            branches.append(spec)
+            continue
+        src = os.path.join(fast_dir, spec['name'])
+        dst = os.path.join(out_dir, spec['name'])
+        idf = np.asarray(load_array(src + '.idf.npy'))
+        weights = np.asarray(load_array(src + '.weights.npy'))
+        contribution = term_contributions(idf, weights)
+        keep = np.flatnonzero(contribution >= threshold * contribution.max()) if len(contribution) else contribution
+        terms = load_terms(src)
+        vocabulary = {terms[j]: i for i, j in enumerate(keep)}
+        save_vocabulary(vocabulary, dst)
+
+        spec = dict(spec, n_features=len(keep), pruned_from=len(terms), encoding={})
+        for array_name, values in (('idf', idf[keep]), ('weights', weights[keep])):
+            stored, encoding = encode_array(values, dtype)
+            np.save(f"{dst}.{array_name}.npy", stored)
+            if encoding is not None:
+                spec['encoding'][array_name] = encoding
+        spec['char_keys'] = False
+        if char_keys and spec['analyzer'] == 'char':
+            counter = CharNgramCounter.build(vocabulary, spec['ngram_range'], spec['lowercase'])
+            if counter is not None:
+                np.save(dst + '.char_alphabet.npy', counter.alphabet)
+                np.save(dst + '.char_keys.npy', counter.keys)
+                np.save(dst + '.char_columns.npy', counter.columns.astype(np.min_scalar_type(max(len(keep) - 1, 0))))
+                spec['char_keys'] = True
+        branches.append(spec)
+
+    manifest = dict(manifest, format_version=COMPACT_FORMAT_VERSION, branches=branches,
+                    compaction={'threshold': threshold, 'dtype': dtype})
+    manifest.pop('max_abs_diff', None)
+    manifest.pop('checked_texts', None)
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def apply_compaction(artifacts_dir, threshold, dtype, char_keys=True):
+    """Replaces <artifacts_dir>/fast with its compacted version (the full table can be
+    re-exported from model.joblib with `python3 scripts/api/artifact_store.py`)."""
+    fast_dir = os.path.join(artifacts_dir, FAST_DIR)
+    tmp_dir = fast_dir + '.compact-tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    manifest = compact_fast_artifacts(fast_dir, tmp_dir, threshold, dtype, char_keys)
+    shutil.rmtree(fast_dir)
+    os.rename(tmp_dir, fast_dir)
+    return manifest
+
+
+def _dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def evaluate_variant(fast_dir, texts, y, calibrator=None, latency_texts=200, load_repeats=5):
+    """Size, load time, per-text latency and held-out quality of one fast export."""
+    from sklearn.metrics import classification_report, r2_score
+
+    load_s = []
+    for _ in range(load_repeats):
+        start = time.perf_counter()
+        fast = FastPipeline(fast_dir)
+        load_s.append(time.perf_counter() - start)
+    raw = fast.predict(texts)
+
+    sample = texts[:latency_texts]
+    fast.predict(sample[:1])
+    latency_s = []
+    for _ in range(3):
+        start = time.perf_counter()
+        for text in sample:
+            fast.predict([text])
+        latency_s.append((time.perf_counter() - start) / max(len(sample), 1))
+
+    probs = calibrator.transform(raw) if calibrator is not None else np.clip(raw, 0.0, 1.0)
+    targets = [1 if t > 0.5 else 0 for t in y]
+    report = classification_report(targets, [1 if p > 0.5 else 0 for p in probs], labels=[0, 1],
+                                   target_names=['AI', 'Human'], output_dict=True, zero_division=0)
+    return {
+        'terms': sum(b.n_features for b in fast.branches if hasattr(b, 'idf')),
+        'bytes': _dir_bytes(fast_dir),
+        'load_ms': min(load_s) * 1000.0,
+        'latency_ms': min(latency_s) * 1000.0,
+        'r2': float(r2_score(y, raw)),
+        'accuracy': report['accuracy'],
+        'f1_ai': report['AI']['f1-score'],
+        'f1_human': report['Human']['f1-score'],
+        'raw': raw
+    }
+
+
+def _pct(new, old):
+    return (new - old) / old * 100.0 if old else 0.0
+
+
+def sweep(artifacts_dir, texts, y, thresholds=DEFAULT_THRESHOLDS, dtypes=DEFAULT_DTYPES, calibrator=None,
+          latency_texts=200, log=print):
+    """Evaluates every (threshold, dtype) compaction against the full table; returns the rows."""
+    fast_dir = os.path.join(artifacts_dir, FAST_DIR)
+    texts = list(texts)
+    y = np.asarray(y, dtype=np.float64)
+    base = evaluate_variant(fast_dir, texts, y, calibrator, latency_texts)
+    log(f"Full table: {base['terms']} terms, {base['bytes'] / 1024:.0f} KB, load {base['load_ms']:.1f} ms,"
+        f" {base['latency_ms']:.2f} ms/text, R2 {base['r2']:.4f}, accuracy {base['accuracy']:.4f},"
+        f" F1 AI {base['f1_ai']:.4f} / Human {base['f1_human']:.4f} ({len(texts)} held-out texts)")
+    log(f"{'threshold':>9} {'dtype':>7} | {'terms':>6} {'size':>7} {'load':>7} {'latency':>7} |"
+        f" {'dR2':>8} {'dAcc':>8} {'dF1 AI':>8} {'dF1 Hum':>8} {'max|ds|':>8}")
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for threshold in thresholds:
+            for dtype in dtypes:
+                out_dir = os.path.join(tmp, f"{threshold}-{dtype}")
+                compact_fast_artifacts(fast_dir, out_dir, threshold, dtype)
+                r = evaluate_variant(out_dir, texts, y, calibrator, latency_texts)
+                row = {
+                    'threshold': threshold,
+                    'dtype': dtype,
+                    'terms': r['terms'],
+                    'size_pct': _pct(r['bytes'], base['bytes']),
+                    'load_pct': _pct(r['load_ms'], base['load_ms']),
+                    'latency_pct': _pct(r['latency_ms'], base['latency_ms']),
+                    'd_r2': r['r2'] - base['r2'],
+                    'd_accuracy': r['accuracy'] - base['accuracy'],
+                    'd_f1_ai': r['f1_ai'] - base['f1_ai'],
+                    'd_f1_human': r['f1_human'] - base['f1_human'],
+                    'max_abs_score_diff': float(np.max(np.abs(r['raw'] - base['raw']), initial=0.0))
+                }
+                rows.append(row)
+                log(f"{threshold:>9g} {dtype:>7} | {row['terms']:>6} {row['size_pct']:>+6.0f}% {row['load_pct']:>+6.0f}%"
+                    f" {row['latency_pct']:>+6.0f}% | {row['d_r2']:>+8.4f} {row['d_accuracy']:>+8.4f}"
+                    f" {row['d_f1_ai']:>+8.4f} {row['d_f1_human']:>+8.4f} {row['max_abs_score_diff']:>8.4f}")
+    return rows
+
+
+def load_labeled_texts(data_dir, min_words=20):
+    """(paragraphs, human likelihood) from <data_dir>/ai/**/*.txt (0.0) and <data_dir>/human*/**/*.txt (1.0)."""
+    import glob
+    texts, y = [], []
+    for sub in sorted(os.listdir(data_dir)):
+        label = 0.0 if sub == 'ai' else 1.0 if sub.startswith('human') else None
+        if label is None:
+            continue
+        for path in sorted(glob.glob(os.path.join(data_dir, sub, '**', '*.txt'), recursive=True)):
+            with open(path, encoding='utf-8', errors='replace') as f:
+                for paragraph in f.read().split('\n\n'):
+                    if len(paragraph.split()) >= min_words:
+                        texts.append(paragraph)
+                        y.append(label)
+    return texts, y
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Prune / quantize the fast scoring table and report the trade-off')
+    parser.add_argument('artifacts_dir', nargs='?', default='scripts/artifacts')
+    parser.add_argument('--thresholds', nargs='+', type=float, default=DEFAULT_THRESHOLDS,
+                        help="Drop terms below this fraction of the branch's largest expected contribution")
+    parser.add_argument('--dtypes', nargs='+', default=DEFAULT_DTYPES, choices=DEFAULT_DTYPES)
+    parser.add_argument('--eval-csv', default=None, help='Held-out CSV (text + generated columns) to evaluate on')
+    parser.add_argument('--eval-dir', default=os.path.join(os.path.dirname(__file__), '..', '..', 'data'),
+                        help='Without --eval-csv: paragraphs of <dir>/ai and <dir>/human*')
+    parser.add_argument('--max-rows', type=int, default=5000, help='Evaluation texts used')
+    parser.add_argument('--apply', nargs=2, metavar=('THRESHOLD', 'DTYPE'), default=None,
+                        help='Replace <artifacts>/fast with this operating point after the sweep')
+    args = parser.parse_args()
+
+    if args.eval_csv:
+        from scripts.training.sampler import Source
+        texts, y = [], []
+        for chunk_texts, generated in Source('eval', args.eval_csv, max_rows=args.max_rows).iter_chunks():
+            texts.extend(chunk_texts)
+            y.extend(1.0 - g for g in generated)
+    else:
+        texts, y = load_labeled_texts(args.eval_dir)
+    texts, y = texts[:args.max_rows], y[:args.max_rows]
+    if not texts:
+        sys.exit("No evaluation texts found")
+
+    sweep(args.artifacts_dir, texts, y, args.thresholds, args.dtypes)
+    if args.apply:
+        threshold, dtype = float(args.apply[0]), args.apply[1]
+        if dtype not in DEFAULT_DTYPES:
+            parser.error(f"--apply dtype must be one of {DEFAULT_DTYPES}")
+        manifest = apply_compaction(args.artifacts_dir, threshold, dtype)
+        kept = {b['name']: f"{b['n_features']}/{b['pruned_from']}" for b in manifest['branches'] if 'pruned_from' in b}
+        print(f"Compacted {os.path.join(args.artifacts_dir, FAST_DIR)}/ (threshold {threshold}, {dtype}): {kept}")
@@ -0,0 +1,251 @@
+import hashlib
+import math
+import multiprocessing
+import re
+
+import numpy as np
+
+from scripts.features.minhash import MinHasher, lsh_params, tokens
+
+# Streaming near-duplicate removal for training corpora
+# -----------------------------------------------------
+# The training sources overlap: boilerplate, repeated news leads, the same essay in
+# several files. Duplicates waste fit time and leak across the train / calibration /
+# test split, inflating held-out metrics. The Deduplicator is applied to every row
+# before it reaches the sampling reservoirs (or the out-of-core stream), in source
+# order, so the first occurrence of a text is kept.
+#
+# Each row yields 1 + bands 64-bit keys: a hash of its normalized text (lowercased,
+# whitespace collapsed) for exact duplicates, and one hash per LSH band of its MinHash
+# signature (scripts/features/minhash.py) for near-duplicates. Rows without a single
+# word have no shingles (all their signatures are equal), so they only get the exact
+# key. Keys of kept rows go into a Bloom filter that grows with them: it starts sized
+# for `capacity` rows and adds a stage twice as large whenever the last one is full
+# (about 1.8-2.5 bytes per key at a 0.1% error rate), so memory follows the rows
+# actually kept rather than a worst-case size. A row is a duplicate when its exact
+# key, or any of its band keys, is already in the filter. There are no stored
+# signatures to verify candidates against, so the band / row split balances false
+# positives and negatives around the threshold (`lsh_params`); Bloom false positives
+# add at most error_rate per key.
+#
+# Signatures are the costly part; with n_jobs > 1 they are computed by a process pool
+# per chunk while the filter itself stays sequential (the result does not depend on
+# n_jobs).
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_CAPACITY = 65536 # rows the first filter stage holds
+MIN_ROWS_PER_JOB = 256 # smaller chunks are hashed in-process
+_WHITESPACE_RE = re.compile(r'\s+')
+_FNV_PRIME = np.uint64(0x100000001B3)
+_MASK_32 = np.uint64(0xFFFFFFFF)
+_HASHERS = {}
+
+
+def _mix(keys):
+    # splitmix64 finalizer: spreads band hashes over all 64 bits
+    with np.errstate(over='ignore'):
+        keys = (keys ^ (keys >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        keys = (keys ^ (keys >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return keys ^ (keys >> np.uint64(31))
+
+
+def exact_key(text):
+    normalized = _WHITESPACE_RE.sub(' ', text.lower()).strip()
+    return int.from_bytes(hashlib.blake2b(normalized.encode('utf-8', 'surrogatepass'), digest_size=8).digest(),
+                          'little')
+
+
+def row_keys(texts, num_perm, shingle_size, bands, rows):
+    """
+    ((len(texts), 1 + bands) uint64 array: exact key, then one key per LSH band;
+    boolean array: the text has shingles, so its band keys are meaningful).
+    """
+    hasher = _HASHERS.get((num_perm, shingle_size))
+    if hasher is None:
+        hasher = _HASHERS[(num_perm, shingle_size)] = MinHasher(num_perm, shingle_size)
+    keys = np.empty((len(texts), 1 + bands), dtype=np.uint64)
+    sigs = np.empty((len(texts), num_perm), dtype=np.uint64)
+    shingled = np.empty(len(texts), dtype=bool)
+    for i, text in enumerate(texts):
+        text = text if isinstance(text, str) else str(text)
+        keys[i, 0] = exact_key(text)
+        sigs[i] = hasher.signature(text)
+        shingled[i] = bool(tokens(text))
+    sigs = sigs[:, :bands * rows].reshape(len(texts), bands, rows)
+    band = np.broadcast_to(np.arange(1, bands + 1, dtype=np.uint64), (len(texts), bands))
+    with np.errstate(over='ignore'):
+        for j in range(rows):
+            band = (band * _FNV_PRIME) ^ sigs[:, :, j]
+    keys[:, 1:] = _mix(band)
+    return keys, shingled
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of uint64 keys (enhanced double hashing over the key halves)."""
+    def __init__(self, capacity, error_rate=1e-3):
+        self.capacity = capacity
+        self.n_bits = max(64, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.n_hashes = max(1, int(round(self.n_bits / capacity * math.log(2))))
+        self.bits = np.zeros((self.n_bits + 7) // 8, dtype=np.uint8)
+        self.count = 0
+        probes = np.arange(self.n_hashes, dtype=np.uint64)
+        # i * h2 + (i^3 - i) / 6: plain double hashing repeats positions whenever h2
+        # shares a factor with n_bits, which doubles the error rate of small stages
+        self._probes, self._offsets = probes, (probes ** 3 - probes) // np.uint64(6)
+
+    def _positions(self, keys):
+        h1 = keys[:, None] & _MASK_32
+        h2 = (keys[:, None] >> np.uint64(32)) | np.uint64(1)
+        return (h1 + self._probes * h2 + self._offsets) % np.uint64(self.n_bits)
+
+    def contains(self, keys):
+        """Boolean array: key (probably) added before."""
+        pos = self._positions(keys)
+        return ((self.bits[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1).all(axis=1)
+
+    def add(self, keys):
+        pos = self._positions(keys).ravel()
+        np.bitwise_or.at(self.bits, pos >> np.uint64(3), np.uint8(1) << (pos & np.uint64(7)).astype(np.uint8))
+        self.count += len(keys)
+
+    @property
+    def error_rate(self):
+        """Current false positive probability estimate."""
+        return (1.0 - math.exp(-self.n_hashes * self.count / self.n_bits)) ** self.n_hashes
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that grows with the keys added (Almeida et al., Scalable Bloom
+    Filters): a chain of BloomFilters, each twice the capacity of the previous one at
+    half its error rate, so the combined false positive rate stays below error_rate.
+    """
+    def __init__(self, initial_capacity, error_rate=1e-3):
+        self.initial_capacity = max(1, int(initial_capacity))
+        self.target_error_rate = error_rate
+        self.filters = []
+        self._add_stage()
+
+    def _add_stage(self):
+        i = len(self.filters)
+        # Stage error rates error_rate / 2, / 4, ... sum to less than error_rate
+        self.filters.append(BloomFilter(self.initial_capacity << i, self.target_error_rate / 2.0 ** (i + 1)))
+
+    def contains(self, keys):
+        seen = self.filters[0].contains(keys)
+        for bloom in self.filters[1:]:
+            seen |= bloom.contains(keys)
+        return seen
+
+    def add(self, keys):
+        if self.filters[-1].count + len(keys) > self.filters[-1].capacity:
+            self._add_stage()
+        self.filters[-1].add(keys)
+
+    @property
+    def count(self):
+        return sum(bloom.count for bloom in self.filters)
+
+    @property
+    def nbytes(self):
+        return sum(bloom.nbytes for bloom in self.filters)
+
+    @property
+    def error_rate(self):
+        """Current false positive probability estimate (any stage)."""
+        return 1.0 - math.prod(1.0 - bloom.error_rate for bloom in self.filters)
+
+
+class Deduplicator:
+    """
+    Streaming exact + near-duplicate filter (first occurrence wins).
+    threshold: estimated Jaccard similarity of word 5-gram sets treated as duplicate
+    capacity: rows the filter's first stage holds (it grows with the rows kept)
+    n_jobs: processes computing MinHash signatures
+    """
+    def __init__(self, threshold=DEFAULT_THRESHOLD, capacity=DEFAULT_CAPACITY, error_rate=1e-3, num_perm=128,
+                 shingle_size=5, n_jobs=1):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = lsh_params(num_perm, threshold)
+        self.bloom = ScalableBloomFilter(capacity * (1 + self.bands), error_rate)
+        self.n_jobs = n_jobs or 1
+        self.sources = {} # name -> {'rows', 'exact', 'near'}
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def _keys(self, texts):
+        args = (self.num_perm, self.shingle_size, self.bands, self.rows)
+        if self.n_jobs <= 1 or len(texts) < 2 * MIN_ROWS_PER_JOB:
+            return row_keys(texts, *args)
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.n_jobs)
+        step = max(MIN_ROWS_PER_JOB, -(-len(texts) // (4 * self.n_jobs)))
+        parts = self._pool.starmap(row_keys, [(texts[i:i + step],) + args for i in range(0, len(texts), step)])
+        return np.concatenate([keys for keys, _ in parts]), np.concatenate([shingled for _, shingled in parts])
+
+    def keep(self, texts, source=''):
+        """Mask of the rows of `texts` to keep; rows seen before (here or earlier) are dropped."""
+        counts = self.sources.setdefault(source, {'rows': 0, 'exact': 0, 'near': 0})
+        counts['rows'] += len(texts)
+        if not texts:
+            return []
+        mask = []
+        keys, shingled = self._keys(texts)
+        for row, has_shingles in zip(keys, shingled):
+            if not has_shingles:
+                row = row[:1] # no words: exact duplicates only
+            seen = self.bloom.contains(row)
+            if seen[0]:
+                counts['exact'] += 1
+                mask.append(False)
+            elif seen[1:].any():
+                counts['near'] += 1
+                mask.append(False)
+            else:
+                self.bloom.add(row)
+                mask.append(True)
+        return mask
+
+    def summary(self):
+        removed = sum(c['exact'] + c['near'] for c in self.sources.values())
+        return {
+            'threshold': self.threshold,
+            'bands': self.bands,
+            'rows_per_band': self.rows,
+            'capacity': self.capacity,
+            'filter_stages': len(self.bloom.filters),
+            'filter_mb': self.bloom.nbytes / (1024.0 * 1024.0),
+            'filter_error_rate': self.bloom.error_rate,
+            'removed': removed,
+            'sources': {name: dict(c) for name, c in self.sources.items()}
+        }
+
+    def report(self):
+        """Printable lines: rows lost per source, filter size and fill."""
+        lines = []
+        for name, c in self.sources.items():
+            removed = c['exact'] + c['near']
+            lines.append(f" -> {name}: {c['rows']} rows, {c['exact']} exact + {c['near']} near duplicates removed"
+                         f" ({100.0 * removed / c['rows'] if c['rows'] else 0.0:.1f}%)")
+        lines.append(f"Dedup filter: {self.bloom.nbytes / (1024.0 * 1024.0):.1f} MB in {len(self.bloom.filters)}"
+                     f" stage(s), {self.bands} bands x {self.rows} rows at Jaccard {self.threshold},"
+                     f" false positive rate {self.bloom.error_rate:.2g} per key")
+        return lines
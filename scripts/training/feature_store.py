@@ -0,0 +1,193 @@
+import glob
+import hashlib
+import json
+import os
+
+import joblib
+import numpy as np
+from scipy import sparse
+
+from scripts.features.stylometry_core import STYLOMETRY_VERSION
+
+# Persistent feature store for training / evaluation runs
+# ------------------------------------------------------
+# Training used to re-extract every feature four times per run (fit, predict on the
+# calibration split, predict and score on the test split) and again on every rerun.
+#
+#   <root>/stylometry/<extractor class>-v<version>/shard-NNNNN.{keys,rows}.npy
+#       raw extractor rows, content-addressed: one 16-byte blake2b digest per text.
+#       Rows are appended as new shards and read back memory-mapped.
+#   <root>/tfidf/<branch>-<fit_key>.joblib
+#       a fitted TfidfVectorizer; fit_key hashes its parameters and the training texts
+#   <root>/tfidf/<branch>-<fit_key>-<data_key>.npz
+#       that vectorizer's sparse output for one list of texts (data_key = their digests)
+#
+# `fit_transform(union, texts)` / `transform(union, texts)` return exactly what
+# FeatureUnion.fit_transform / transform would (weighted, hstacked CSR), fitting or
+# loading each branch as needed, so a retrain on unchanged data extracts nothing.
+
+
+def text_digest(text):
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+def _digest_of(digests):
+    h = hashlib.sha256()
+    for d in digests:
+        h.update(d)
+    return h.hexdigest()[:20]
+
+
+class _RowStore:
+    """Append-only, content-addressed store of fixed-width float64 rows."""
+    def __init__(self, directory, width):
+        self.directory = directory
+        self.width = width
+        os.makedirs(directory, exist_ok=True)
+        self.shards = []
+        self.index = {}
+        for keys_path in sorted(glob.glob(os.path.join(directory, 'shard-*.keys.npy'))):
+            self._open_shard(keys_path)
+
+    def _open_shard(self, keys_path):
+        rows = np.load(keys_path.replace('.keys.npy', '.rows.npy'), mmap_mode='r')
+        if rows.shape[1] != self.width:
+            raise ValueError(f"{keys_path}: rows of width {rows.shape[1]}, the extractor returns {self.width};"
+                             " bump STYLOMETRY_VERSION when the features change")
+        shard = len(self.shards)
+        self.shards.append(rows)
+        keys = np.load(keys_path).tobytes()
+        for row in range(len(rows)):
+            self.index[keys[row * 16:(row + 1) * 16]] = (shard, row)
+
+    def get_many(self, digests):
+        """(rows, missing): rows for every digest (NaN where absent), indices of the absent ones."""
+        out = np.full((len(digests), self.width), np.nan)
+        missing = []
+        for i, d in enumerate(digests):
+            loc = self.index.get(d)
+            if loc is None:
+                missing.append(i)
+            else:
+                out[i] = self.shards[loc[0]][loc[1]]
+        return out, missing
+
+    def add_many(self, digests, rows):
+        new = {}
+        for d, row in zip(digests, rows):
+            if d not in self.index:
+                new[d] = row
+        if not new:
+            return
+        prefix = os.path.join(self.directory, f"shard-{len(self.shards):05d}")
+        np.save(prefix + '.rows.npy', np.asarray(list(new.values()), dtype=np.float64))
+        # Keys last: a shard without keys is never opened
+        # (n, 16) uint8 rather than 'S16', which would strip trailing NUL bytes
+        np.save(prefix + '.keys.npy', np.frombuffer(b''.join(new), dtype=np.uint8).reshape(-1, 16))
+        self._open_shard(prefix + '.keys.npy')
+
+
+class FeatureStore:
+    def __init__(self, root, stylometry_version=STYLOMETRY_VERSION):
+        self.root = root
+        self.stylometry_version = stylometry_version
+        self.tfidf_dir = os.path.join(root, 'tfidf')
+        os.makedirs(self.tfidf_dir, exist_ok=True)
+        self._rows = {}
+        self._fit_keys = {}
+        self.row_hits = 0
+        self.row_misses = 0
+        self.block_hits = 0
+        self.block_misses = 0
+
+    # --- stylometry ---
+    def stylometry_rows(self, extractor, texts, digests=None):
+        """Raw extractor rows for `texts`, extracting (and storing) only unseen texts."""
+        if digests is None:
+            digests = [text_digest(t) for t in texts]
+        name = extractor.__class__.__name__
+        store = self._rows.get(name)
+        if store is None:
+            directory = os.path.join(self.root, 'stylometry', f"{name}-v{self.stylometry_version}")
+            store = self._rows[name] = _RowStore(directory, len(extractor.transform([''])[0]))
+        rows, missing = store.get_many(digests)
+        self.row_hits += len(texts) - len(missing)
+        self.row_misses += len(missing)
+        if missing:
+            computed = extractor.transform([texts[i] for i in missing])
+            rows[missing] = computed
+            store.add_many([digests[i] for i in missing], computed)
+        return rows
+
+    # --- tf-idf ---
+    def _fit_key(self, name, vectorizer, digests):
+        params = json.dumps(vectorizer.get_params(), sort_keys=True, default=repr)
+        return hashlib.sha256(f"{name}\x00{params}\x00{_digest_of(digests)}".encode('utf-8')).hexdigest()[:20]
+
+    def _block(self, path, compute):
+        if os.path.exists(path):
+            self.block_hits += 1
+            return sparse.load_npz(path)
+        self.block_misses += 1
+        X = sparse.csr_matrix(compute())
+        tmp = path + '.tmp.npz'
+        sparse.save_npz(tmp, X)
+        os.replace(tmp, path)
+        return X
+
+    # --- FeatureUnion ---
+    def fit_transform(self, union, texts):
+        """union.fit_transform(texts), with every branch fitted from / saved to the store."""
+        return self._union(union, list(texts), fit=True)
+
+    def transform(self, union, texts):
+        """union.transform(texts) for a union fitted by `fit_transform`."""
+        return self._union(union, list(texts), fit=False)
+
+    def _union(self, union, texts, fit):
+        digests = [text_digest(t) for t in texts]
+        data_key = _digest_of(digests)
+        weights = union.transformer_weights or {}
+        blocks = []
+        for name, trans in union.transformer_list:
+            if type(trans).__name__ == 'TfidfVectorizer':
+                if fit:
+                    fit_key = self._fit_key(name, trans, digests)
+                    fitted_path = os.path.join(self.tfidf_dir, f"{name}-{fit_key}.joblib")
+                    if os.path.exists(fitted_path):
+                        trans = joblib.load(fitted_path)
+                        union.set_params(**{name: trans})
+                        X = self._block(os.path.join(self.tfidf_dir, f"{name}-{fit_key}-{data_key}.npz"),
+                                        lambda: trans.transform(texts))
+                    else:
+                        X = sparse.csr_matrix(trans.fit_transform(texts))
+                        joblib.dump(trans, fitted_path)
+                        sparse.save_npz(os.path.join(self.tfidf_dir, f"{name}-{fit_key}-{data_key}.npz"), X)
+                        self.block_misses += 1
+                    self._fit_keys[name] = fit_key
+                else:
+                    fit_key = self._fit_keys.get(name)
+                    if fit_key is None:
+                        raise ValueError(f"{name}: transform() before fit_transform() on this store")
+                    X = self._block(os.path.join(self.tfidf_dir, f"{name}-{fit_key}-{data_key}.npz"),
+                                    lambda: trans.transform(texts))
+            elif hasattr(trans, 'steps') and trans.steps[0][0] == 'extractor':
+                raw = self.stylometry_rows(trans.steps[0][1], texts, digests)
+                # The extractor is stateless; the rest of the branch is fitted on the raw rows
+                rest = trans[1:]
+                X = rest.fit_transform(raw) if fit else rest.transform(raw)
+            else:
+                X = trans.fit_transform(texts) if fit else trans.transform(texts)
+            if weights.get(name) is not None:
+                X = X * weights[name]
+            blocks.append(X)
+        if any(sparse.issparse(X) for X in blocks):
+            return sparse.hstack(blocks).tocsr()
+        return np.hstack(blocks)
+
+    def stats(self):
+        """Stylometry rows and TF-IDF blocks served from disk vs extracted."""
+        return {
+            'stylometry_rows': {'hits': self.row_hits, 'misses': self.row_misses},
+            'tfidf_blocks': {'hits': self.block_hits, 'misses': self.block_misses}
+        }
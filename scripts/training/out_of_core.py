@@ -0,0 +1,274 @@
+import hashlib
+import random
+import time
+from collections import deque
+
+import numpy as np
+from sklearn.pipeline import Pipeline, FeatureUnion
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sklearn.linear_model import SGDRegressor
+from sklearn.preprocessing import StandardScaler, PowerTransformer
+from sklearn.isotonic import IsotonicRegression
+
+from scripts.features.stylometry import StylometryExtractor
+from scripts.training.sampler import CHUNK_SIZE, Reservoir, peak_rss_mb
+
+# Out-of-core training mode
+# -------------------------
+# The in-memory pipeline has to hold the whole corpus for TfidfVectorizer.fit, which is
+# why training is capped at MAX_TRAIN_SAMPLES. This mode streams class-balanced, shuffled
+# minibatches instead (each CSV is read and parsed once; rows are split by label):
+#   - word/char n-grams are hashed into fixed-size spaces (HashingVectorizer), so there
+#     is no vocabulary to grow; idf, the stylometry scaler and the Yeo-Johnson lambdas
+#     are fitted once on a bounded warm-up sample
+#   - the SGDRegressor is trained with partial_fit, one minibatch at a time
+#   - calibration / test rows are a hash-based holdout kept in bounded reservoirs
+# Memory is bounded by the shuffle buffers, the per-class read-ahead queues (a source
+# that only feeds the class running ahead is paused, nothing is dropped), the warm-up
+# sample and the holdout reservoirs, independent of the number of rows streamed. The
+# result is an ordinary sklearn Pipeline (same step names as the in-memory one), saved
+# as model.joblib.
+
+N_HASH_FEATURES = 2 ** 20
+TRANSFORMER_WEIGHTS = {'word_tfidf': 1.2, 'char_tfidf': 1.5, 'stylometry': 1.5}
+
+
+def build_hashed_pipeline(n_features=N_HASH_FEATURES, n_jobs=None, seed=42):
+    """Same branches, weights and regressor as the in-memory pipeline, with hashed n-grams."""
+    return Pipeline([
+        ('features', FeatureUnion([
+            ('word_tfidf', Pipeline([
+                ('hasher', HashingVectorizer(ngram_range=(1, 2), stop_words='english', n_features=n_features,
+                                             alternate_sign=False, norm=None)),
+                ('tfidf', TfidfTransformer(sublinear_tf=True))
+            ])),
+            ('char_tfidf', Pipeline([
+                ('hasher', HashingVectorizer(analyzer='char', ngram_range=(3, 5), n_features=n_features,
+                                             alternate_sign=False, norm=None)),
+                ('tfidf', TfidfTransformer(sublinear_tf=True))
+            ])),
+            ('stylometry', Pipeline([
+                ('extractor', StylometryExtractor(n_jobs=n_jobs)),
+                ('scaler', StandardScaler()),
+                ('normalizer', PowerTransformer(method='yeo-johnson'))
+            ]))
+        ], transformer_weights=TRANSFORMER_WEIGHTS)),
+        # partial_fit does not run the 'adaptive' schedule's epoch checks, so this trains
+        # at a constant eta0
+        ('regressor', SGDRegressor(
+            loss='huber',
+            alpha=0.001,
+            epsilon=0.1,
+            learning_rate='adaptive',
+            eta0=0.01,
+            random_state=seed
+        ))
+    ])
+
+
+class _ClassStreams:
+    """
+    One pass over the sources split by label: rows(label) yields one class's rows and
+    reads the next chunk only when that class has none left. Chunks are read round-robin
+    over the sources (so no source comes last), without the rows `dedup` has seen before;
+    rows of the other classes wait in per-class queues. A source whose last chunk only
+    fed queues already holding max_pending rows is paused until they drain, so on skewed
+    sources the class that runs ahead stops being read instead of losing rows. A class
+    runs out when every source left is exhausted or paused.
+    """
+    def __init__(self, sources, labels, chunk_size, dedup=None, max_pending=100000):
+        # [source, chunk iterator, labels of its last chunk]
+        self.sources = [[source, source.iter_chunks(chunk_size), set()] for source in sources]
+        self.dedup = dedup
+        self.pending = {label: deque() for label in labels}
+        self.max_pending = max_pending
+        self.turn = 0
+
+    def _paused(self, fed):
+        return bool(fed) and all(len(self.pending[label]) >= self.max_pending for label in fed)
+
+    def _read(self):
+        """Queues the next chunk of a source that is not paused; False if there is none."""
+        skipped = 0
+        while skipped < len(self.sources):
+            self.turn %= len(self.sources)
+            entry = self.sources[self.turn]
+            source, chunks, fed = entry
+            if self._paused(fed):
+                self.turn += 1
+                skipped += 1
+                continue
+            try:
+                texts, labels = next(chunks)
+            except StopIteration:
+                del self.sources[self.turn]
+                continue
+            except (OSError, ValueError) as e:
+                print(f"Skipping {source.name}: {e}")
+                del self.sources[self.turn]
+                continue
+            if self.dedup is not None:
+                keep = self.dedup.keep(texts, source.name)
+                texts = [text for text, k in zip(texts, keep) if k]
+                labels = [label for label, k in zip(labels, keep) if k]
+            entry[2] = fed = set()
+            for text, label in zip(texts, labels):
+                queue = self.pending.get(label)
+                if queue is not None:
+                    queue.append(text)
+                    fed.add(label)
+            self.turn += 1
+            return True
+        return False
+
+    def rows(self, label):
+        queue = self.pending[label]
+        while True:
+            while queue:
+                yield queue.popleft()
+            if not self._read():
+                return
+
+
+class _ShuffleBuffer:
+    """Bounded random-order view of a stream: draws a random buffered row, refills from the stream."""
+    def __init__(self, rows, size, rng):
+        self.rows = rows
+        self.size = size
+        self.rng = rng
+        self.buffer = []
+        self.exhausted = False
+
+    def take(self, n):
+        out = []
+        while len(out) < n:
+            while not self.exhausted and len(self.buffer) < self.size:
+                try:
+                    self.buffer.append(next(self.rows))
+                except StopIteration:
+                    self.exhausted = True
+            if not self.buffer:
+                break
+            i = self.rng.randrange(len(self.buffer))
+            self.buffer[i], self.buffer[-1] = self.buffer[-1], self.buffer[i]
+            out.append(self.buffer.pop())
+        return out
+
+
+def _holdout_bucket(text, holdout_pct):
+    """0 = train, 1 = calibration, 2 = test; stable per text."""
+    h = int.from_bytes(hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=8).digest(), 'little')
+    if h % 1000 >= holdout_pct * 10:
+        return 0
+    return 1 if (h // 1000) % 2 == 0 else 2
+
+
+def iter_balanced_batches(sources, batch_size, seed=42, buffer_size=20000, chunk_size=CHUNK_SIZE, dedup=None,
+                          max_pending=100000):
+    """
+    Yields (texts, targets) minibatches, half AI and half human, until either class runs out.
+    max_pending: rows of one class read ahead of the other before the sources feeding
+                 only that class are paused.
+    """
+    rng = random.Random(f"{seed}-stream")
+    streams = _ClassStreams(sources, (1.0, 0.0), chunk_size, dedup, max(max_pending, buffer_size))
+    ai = _ShuffleBuffer(streams.rows(1.0), buffer_size, rng)
+    human = _ShuffleBuffer(streams.rows(0.0), buffer_size, rng)
+    half = batch_size // 2
+    while True:
+        ai_texts = ai.take(half)
+        human_texts = human.take(len(ai_texts))
+        ai_texts = ai_texts[:len(human_texts)]
+        if not ai_texts:
+            return
+        texts = ai_texts + human_texts
+        # Same target as the in-memory script: 1.0 = Human, 0.0 = AI
+        targets = np.array([0.0] * len(ai_texts) + [1.0] * len(human_texts))
+        order = np.array(rng.sample(range(len(texts)), len(texts)))
+        yield [texts[i] for i in order], targets[order]
+
+
+def train_out_of_core(sources, batch_size=2000, warmup_rows=20000, holdout_pct=5.0, holdout_max=10000,
+                      max_rows=None, n_features=N_HASH_FEATURES, n_jobs=None, seed=42, log_every=10, dedup=None):
+    """
+    Streams `sources` once and returns (pipeline, calibrator, stats).
+    holdout_pct: percentage of rows (by text hash) kept out of training, split evenly
+                 into calibration and test reservoirs of at most holdout_max rows each.
+    max_rows: stop after this many training rows (None = until a class runs out).
+    dedup: optional Deduplicator applied to the streamed rows (both classes share it).
+    """
+    pipeline = build_hashed_pipeline(n_features, n_jobs, seed)
+    union = pipeline.named_steps['features']
+    regressor = pipeline.named_steps['regressor']
+    holdout = {1: Reservoir(holdout_max, f"{seed}-calib"), 2: Reservoir(holdout_max, f"{seed}-test")}
+
+    warmup_texts, warmup_y = [], []
+    trained = 0
+    batches = 0
+    start = time.perf_counter()
+
+    def train_batch(texts, y):
+        regressor.partial_fit(union.transform(texts), y)
+
+    for texts, y in iter_balanced_batches(sources, batch_size, seed, dedup=dedup):
+        train_texts, train_y = [], []
+        for text, target in zip(texts, y):
+            bucket = _holdout_bucket(text, holdout_pct)
+            if bucket:
+                holdout[bucket].extend([(text, target)])
+            else:
+                train_texts.append(text)
+                train_y.append(target)
+
+        if warmup_texts is not None:
+            # Fit idf / scaler / Yeo-Johnson on the first warmup_rows rows, then train on them
+            warmup_texts.extend(train_texts)
+            warmup_y.extend(train_y)
+            if len(warmup_texts) < warmup_rows:
+                continue
+            print(f"Fitting feature statistics on {len(warmup_texts)} warm-up rows...")
+            union.fit(warmup_texts)
+            train_texts, train_y = warmup_texts, warmup_y
+            warmup_texts = warmup_y = None
+
+        for i in range(0, len(train_texts), batch_size):
+            train_batch(train_texts[i:i + batch_size], np.asarray(train_y[i:i + batch_size]))
+        trained += len(train_texts)
+        batches += 1
+        if batches % log_every == 0:
+            elapsed = time.perf_counter() - start
+            print(f" -> {trained} rows trained ({trained / elapsed:.0f} rows/s, peak RSS {peak_rss_mb():.0f} MB)")
+        if max_rows is not None and trained >= max_rows:
+            break
+
+    if warmup_texts:
+        # Fewer rows than the warm-up size: fit on what there is
+        union.fit(warmup_texts)
+        train_batch(warmup_texts, np.asarray(warmup_y))
+        trained += len(warmup_texts)
+    if trained == 0:
+        raise ValueError("No training rows were streamed from the sources")
+
+    calib_texts, calib_y = zip(*holdout[1].items) if holdout[1].items else ((), ())
+    test_texts, test_y = zip(*holdout[2].items) if holdout[2].items else ((), ())
+    calibrator = IsotonicRegression(out_of_bounds='clip', y_min=0.0, y_max=1.0)
+    if calib_texts:
+        calibrator.fit(pipeline.predict(list(calib_texts)), np.asarray(calib_y))
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        'n_samples': trained,
+        'rows_per_s': trained / elapsed if elapsed > 0 else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+        'calib_rows': len(calib_texts),
+        'test_rows': len(test_texts),
+        'test_texts': list(test_texts),
+        'test_y': np.asarray(test_y)
+    }
+    print(f"Trained on {trained} rows in {elapsed:.1f}s ({stats['rows_per_s']:.0f} rows/s,"
+          f" peak RSS {stats['peak_rss_mb']:.0f} MB)")
+    if dedup is not None:
+        stats['dedup'] = dedup.summary()
+        for line in dedup.report():
+            print(line)
+    return pipeline, calibrator, stats
@@ -0,0 +1,139 @@
+import math
+import random
+import resource
+import sys
+import time
+
+import pandas as pd
+
+# Streaming, memory-bounded training-data loader.
+#
+# Every source CSV is read in chunks and each row is offered to the reservoir of its
+# class; nothing else is kept, so peak memory is bounded by the sample size instead of
+# the corpus size. Reservoirs use Algorithm L (geometric skips over the global row
+# index), which draws random numbers only for rows that are actually kept. The sample
+# therefore depends only on the seed and the row order of the sources, not on the chunk
+# size. An optional Deduplicator (scripts/training/dedup.py) drops exact and near
+# duplicate rows before they are offered.
+
+CHUNK_SIZE = 100000
+TEXT_COLUMNS = ['Text', 'text', 'article', 'content']
+
+
+class Source:
+    """
+    One CSV file of labeled texts.
+    label: class of every row (0.0 human / 1.0 AI), or None to read it from `label_column`
+    max_rows: only the first max_rows rows are read (as pd.read_csv(nrows=...))
+    """
+    def __init__(self, name, path, label=None, label_column='generated', max_rows=None):
+        self.name = name
+        self.path = path
+        self.label = label
+        self.label_column = label_column
+        self.max_rows = max_rows
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE):
+        """Yields (texts, labels) lists per chunk, cleaned like the in-memory loaders."""
+        for chunk in pd.read_csv(self.path, chunksize=chunk_size, nrows=self.max_rows):
+            text_col = next((c for c in TEXT_COLUMNS if c in chunk.columns), None)
+            if text_col is None:
+                raise ValueError(f"Could not find text column in {self.name}")
+            if self.label is None:
+                chunk = pd.DataFrame({
+                    'text': chunk[text_col].astype(str),
+                    'generated': pd.to_numeric(chunk[self.label_column], errors='coerce')
+                }).dropna()
+                yield chunk['text'].tolist(), chunk['generated'].tolist()
+            else:
+                texts = chunk[text_col].dropna().tolist()
+                yield texts, [float(self.label)] * len(texts)
+
+
+class Reservoir:
+    """Uniform sample of at most k items from a stream (Algorithm L), seeded."""
+    def __init__(self, k, seed):
+        self.k = k
+        self.rng = random.Random(seed)
+        self.items = []
+        self.seen = 0
+        self._w = math.exp(math.log(self.rng.random()) / k) if k > 0 else 0.0
+        self._next = k + self._skip() if k > 0 else math.inf
+
+    def _skip(self):
+        return int(math.floor(math.log(self.rng.random()) / math.log(1.0 - self._w)))
+
+    def extend(self, items):
+        """Offers a chunk of items; only selected items are touched."""
+        start = self.seen
+        end = start + len(items)
+        fill = min(max(self.k - start, 0), len(items))
+        if fill:
+            self.items.extend(items[:fill])
+        while self._next < end:
+            self.items[self.rng.randrange(self.k)] = items[self._next - start]
+            self._w *= math.exp(math.log(self.rng.random()) / self.k)
+            self._next += self._skip() + 1
+        self.seen = end
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return rss / (1024.0 * 1024.0) if sys.platform == 'darwin' else rss / 1024.0
+
+
+def sample_balanced(sources, n_per_class, seed=42, chunk_size=CHUNK_SIZE, log=print, dedup=None):
+    """
+    Streams `sources` and returns a DataFrame (text, generated) with the same number of
+    rows per class: min(n_per_class, rows available in the smaller class).
+    Deterministic for a given seed and source order.
+    dedup: optional Deduplicator; rows it has seen before (in any source) are skipped.
+    """
+    reservoirs = {
+        0.0: Reservoir(n_per_class, f"{seed}-human"),
+        1.0: Reservoir(n_per_class, f"{seed}-ai")
+    }
+    total_rows = 0
+    start = time.perf_counter()
+    for source in sources:
+        rows = 0
+        t0 = time.perf_counter()
+        try:
+            for texts, labels in source.iter_chunks(chunk_size):
+                rows += len(texts)
+                if dedup is not None:
+                    keep = dedup.keep(texts, source.name)
+                    texts = [t for t, k in zip(texts, keep) if k]
+                    labels = [l for l, k in zip(labels, keep) if k]
+                by_class = {0.0: [], 1.0: []}
+                for text, label in zip(texts, labels):
+                    if label in by_class:
+                        by_class[label].append(text)
+                for label, items in by_class.items():
+                    reservoirs[label].extend(items)
+        except (OSError, ValueError) as e:
+            log(f"Skipping {source.name}: {e}")
+            continue
+        elapsed = time.perf_counter() - t0
+        total_rows += rows
+        log(f" -> {source.name}: {rows} rows in {elapsed:.1f}s"
+            f" ({rows / elapsed if elapsed > 0 else 0:.0f} rows/s, peak RSS {peak_rss_mb():.0f} MB)")
+
+    elapsed = time.perf_counter() - start
+    human, ai = reservoirs[0.0], reservoirs[1.0]
+    log(f"Streamed {total_rows} rows in {elapsed:.1f}s ({total_rows / elapsed if elapsed > 0 else 0:.0f} rows/s);"
+        f" AI seen {ai.seen}, Human seen {human.seen}, peak RSS {peak_rss_mb():.0f} MB")
+    if dedup is not None:
+        for line in dedup.report():
+            log(line)
+
+    # Balance by subsampling the larger reservoir (a uniform subsample stays uniform)
+    n_balance = min(len(ai.items), len(human.items))
+    rng = random.Random(f"{seed}-balance")
+    ai_items = ai.items if len(ai.items) == n_balance else rng.sample(ai.items, n_balance)
+    human_items = human.items if len(human.items) == n_balance else rng.sample(human.items, n_balance)
+    return pd.DataFrame({
+        'text': ai_items + human_items,
+        'generated': [1.0] * n_balance + [0.0] * n_balance
+    })
@@ -4,54 +4,13 @@
  */
 
 import { detectAIHybrid } from '@/lib/hybrid-detector';
-import { spawn } from 'child_process';
+import { getPythonPrediction } from '@/lib/python-worker';
 import { NextRequest, NextResponse } from 'next/server';
-import path from 'path';
-
-// Helper to run python script
-async function getPythonPrediction(text: string): Promise<any | null> {
-  return new Promise((resolve, reject) => {
-    const scriptPath = path.join(process.cwd(), 'scripts', 'api', 'predict.py');
-    const python = spawn('python3', [scriptPath, text]);
-    
-    let output = '';
-    let error = '';
-
-    python.stdout.on('data', (data) => output += data.toString());
-    python.stderr.on('data', (data) => error += data.toString());
-
-    python.on('close', (code) => {
-      if (code !== 0) {
-        console.error('Python script error:', error);
-        resolve(null);
-        return;
-      }
-      
-      try {
-        let jsonStr = output.trim();
-        jsonStr = jsonStr.replace(/'/g, '"')
-                         .replace(/\bNone\b/g, 'null')
-                         .replace(/\bTrue\b/g, 'true')
-                         .replace(/\bFalse\b/g, 'false');
-        
-        const res = JSON.parse(jsonStr);
-        if (res && res.human_score !== undefined) {
-           resolve(res);
-        } else {
-           resolve(null);
-        }
-      } catch (e) {
-        console.error('Failed to parse python output:', e, output);
-        resolve(null);
-      }
-    });
-  });
-}
 
 export async function POST(request: NextRequest) {
   try {
     const body = await request.json();
-    let { text, forceML = false, mode = 'heuristic' } = body;
+    let { text, forceML = false, mode = 'heuristic', incremental = false } = body;
 
     // Legacy support / Interop
     if (forceML && mode === 'heuristic') mode = 'ml';
@@ -70,7 +29,7 @@ export async function POST(request: NextRequest) {
     // If forceML is true (includes 'ml' and 'hybrid' modes), run the Python ML model
     if (forceML) {
       try {
-          const mlData = await getPythonPrediction(text);
+          const mlData = await getPythonPrediction(text, undefined, { segments: true, incremental: Boolean(incremental) });
           
           if (mlData) {
             const mlProb = mlData.ai_score; // 0.0 to 1.0
@@ -130,6 +89,11 @@ export async function POST(request: NextRequest) {
                     fusionReason: fusionReason
                 };
             }
+
+            // Sentence highlights from the model's sliding-window scores
+            if (mlData.segments) {
+                result.aiSentences = mlData.segments.ai_sentences;
+            }
           }
       } catch (mlErr) {
           console.error("❌ ML Prediction Failed:", mlErr);
@@ -166,7 +130,8 @@ export async function GET() {
       method: 'POST',
       body: {
         text: 'string (required)',
-        forceML: 'boolean (optional, default: false)'
+        forceML: 'boolean (optional, default: false)',
+        incremental: 'boolean (optional, default: false) - re-check of an edited document'
       }
     }
   });
@@ -0,0 +1,29 @@
+/**
+ * API Route: /api/health
+ * Readiness and metrics of the Python scoring worker.
+ *   GET /api/health                      -> 200 once the model is loaded and warmed up, else 503
+ *   GET /api/health?metrics=json         -> counters, latency histograms, cache, RSS
+ *   GET /api/health?metrics=prometheus   -> the same in Prometheus text format
+ */
+
+import { getPythonHealth, getPythonMetrics } from '@/lib/python-worker';
+import { NextRequest, NextResponse } from 'next/server';
+
+export async function GET(request: NextRequest) {
+  const metrics = request.nextUrl.searchParams.get('metrics');
+
+  if (metrics === 'prometheus') {
+    const text = await getPythonMetrics('prometheus');
+    if (text === null) return new NextResponse('Python worker unavailable\n', { status: 503 });
+    return new NextResponse(text, { headers: { 'Content-Type': 'text/plain; version=0.0.4' } });
+  }
+  if (metrics !== null) {
+    const data = await getPythonMetrics('json');
+    if (data === null) return NextResponse.json({ error: 'Python worker unavailable' }, { status: 503 });
+    return NextResponse.json(data);
+  }
+
+  const health = await getPythonHealth();
+  if (health === null) return NextResponse.json({ ready: false, error: 'Python worker unavailable' }, { status: 503 });
+  return NextResponse.json(health, { status: health.ready ? 200 : 503 });
+}
@@ -247,7 +247,8 @@ export default function Home() {
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ 
           text: textToScan,
-          mode: scanMode // Send selected mode
+          mode: scanMode, // Send selected mode
+          incremental: true // Re-checks only rescan edited paragraphs
         }),
       });
       
@@ -0,0 +1,191 @@
+/**
+ * Resident Python inference worker.
+ *
+ * Keeps one `scripts/api/service.py` process alive so the model artifacts are loaded
+ * once instead of on every request. The service speaks the `predict.py --worker` line
+ * protocol and micro-batches concurrent requests. Requests and responses are newline-delimited
+ * JSON objects correlated by `id`. If the worker cannot be started (or dies mid-request)
+ * callers fall back to the one-shot CLI.
+ */
+
+import { ChildProcessWithoutNullStreams, spawn } from 'child_process';
+import path from 'path';
+
+type Pending = {
+  resolve: (value: any | null) => void;
+  timer: NodeJS.Timeout;
+};
+
+const SCRIPT_PATH = path.join(process.cwd(), 'scripts', 'api', 'predict.py');
+const SERVICE_PATH = path.join(process.cwd(), 'scripts', 'api', 'service.py');
+const REQUEST_TIMEOUT_MS = 30000;
+
+class PythonWorker {
+  private proc: ChildProcessWithoutNullStreams | null = null;
+  private ready: Promise<boolean> | null = null;
+  private pending = new Map<number, Pending>();
+  private nextId = 1;
+  private buffer = '';
+
+  private start(): Promise<boolean> {
+    if (this.ready) return this.ready;
+
+    this.ready = new Promise((resolveReady) => {
+      let settled = false;
+      const settle = (ok: boolean) => {
+        if (!settled) {
+          settled = true;
+          resolveReady(ok);
+        }
+      };
+
+      const proc = spawn('python3', [SERVICE_PATH]);
+      this.proc = proc;
+
+      proc.stdout.on('data', (data) => {
+        this.buffer += data.toString();
+        let newline: number;
+        while ((newline = this.buffer.indexOf('\n')) >= 0) {
+          const line = this.buffer.slice(0, newline).trim();
+          this.buffer = this.buffer.slice(newline + 1);
+          if (!line) continue;
+
+          let msg: any;
+          try {
+            msg = JSON.parse(line);
+          } catch (e) {
+            console.error('Python worker sent invalid JSON:', line);
+            continue;
+          }
+
+          if (msg.event === 'ready') {
+            if (!msg.loaded) console.error('Python worker started without a model');
+            settle(Boolean(msg.loaded));
+            continue;
+          }
+
+          const entry = this.pending.get(msg.id);
+          if (!entry) continue;
+          this.pending.delete(msg.id);
+          clearTimeout(entry.timer);
+          if (!msg.ok) console.error('Python worker error:', msg.error);
+          entry.resolve(msg.ok ? msg.result : null);
+        }
+      });
+
+      proc.stderr.on('data', (data) => console.error('Python worker:', data.toString().trim()));
+
+      const onExit = () => {
+        settle(false);
+        this.reset();
+      };
+      proc.on('error', onExit);
+      proc.on('close', onExit);
+    });
+
+    return this.ready;
+  }
+
+  private reset() {
+    this.proc = null;
+    this.ready = null;
+    this.buffer = '';
+    // Fail any in-flight requests so callers can fall back
+    for (const [id, entry] of this.pending) {
+      clearTimeout(entry.timer);
+      entry.resolve(null);
+      this.pending.delete(id);
+    }
+  }
+
+  async request(payload: Record<string, unknown>): Promise<any | null> {
+    const ok = await this.start();
+    if (!ok || !this.proc) return null;
+
+    const id = this.nextId++;
+    return new Promise((resolve) => {
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        console.error(`Python worker timed out on request ${id}`);
+        resolve(null);
+      }, REQUEST_TIMEOUT_MS);
+
+      this.pending.set(id, { resolve, timer });
+      this.proc!.stdin.write(JSON.stringify({ id, ...payload }) + '\n');
+    });
+  }
+}
+
+// One worker per server process (survives hot reloads in dev)
+const globalForWorker = globalThis as unknown as { pythonWorker?: PythonWorker };
+const worker = globalForWorker.pythonWorker ?? new PythonWorker();
+globalForWorker.pythonWorker = worker;
+
+// Legacy path: one python process per request
+function runOneShot(text: string, domain?: string): Promise<any | null> {
+  return new Promise((resolve) => {
+    // '--' keeps texts that start with a dash from being parsed as flags
+    const args = domain ? [SCRIPT_PATH, '--domain', domain, '--', text] : [SCRIPT_PATH, '--', text];
+    const python = spawn('python3', args);
+
+    let output = '';
+    let error = '';
+
+    python.stdout.on('data', (data) => output += data.toString());
+    python.stderr.on('data', (data) => error += data.toString());
+    python.on('error', (err) => {
+      console.error('Python script error:', err);
+      resolve(null);
+    });
+
+    python.on('close', (code) => {
+      if (code !== 0) {
+        console.error('Python script error:', error);
+        resolve(null);
+        return;
+      }
+      try {
+        resolve(JSON.parse(output.trim()));
+      } catch (e) {
+        console.error('Failed to parse python output:', e, output);
+        resolve(null);
+      }
+    });
+  });
+}
+
+export type PredictionOptions = {
+  // Per-sentence attribution (result.segments); the one-shot fallback does not provide it
+  segments?: boolean;
+  // Successive versions of one document (live editor): only changed paragraphs are rescanned
+  incremental?: boolean;
+};
+
+export async function getPythonPrediction(
+  text: string,
+  domain?: string,
+  options: PredictionOptions = {}
+): Promise<any | null> {
+  let res = await worker.request({
+    op: 'predict',
+    text,
+    domain: domain ?? null,
+    segments: Boolean(options.segments),
+    incremental: Boolean(options.incremental)
+  });
+  if (res === null) res = await runOneShot(text, domain);
+  if (res && res.human_score !== undefined) return res;
+  return null;
+}
+
+// Readiness of the resident worker (model loaded and warmed up); null if it is not running
+export async function getPythonHealth(): Promise<any | null> {
+  return worker.request({ op: 'health' });
+}
+
+// Scoring service counters and latency histograms: JSON, or Prometheus exposition text
+export async function getPythonMetrics(format: 'json' | 'prometheus' = 'json'): Promise<any | null> {
+  const res = await worker.request({ op: 'metrics', format });
+  if (res === null) return null;
+  return format === 'prometheus' ? res.text : res;
+}